@@ -225,6 +225,8 @@ class App(tkinter.Tk):
                     s_data["dim_c"] = math.ceil(s_data["beam"] / 2)
                     s_data["dim_d"] = s_data["beam"] - s_data["dim_c"]
                     s_data["eta_datetime"] = data["eta_datetime"]
+                    # 정적 데이터가 바뀌었으므로 미리 만들어 둔 Msg 5 문장 캐시 폐기
+                    self.editing_target["msg_5_packet"] = None
 
                     # 리스트박스 텍스트 업데이트
                     self._update_listbox_item_text(
@@ -346,6 +348,7 @@ class App(tkinter.Tk):
             "path_obj": final_ais_path_obj,         
             "sim_instance": None, 
             "ship_marker": None,
+            "msg_5_packet": None, # (Msg 5 필드 튜플, 전송용 Msg 5 bytes) 캐시
             
             "static_data": {
                 "mmsi": mmsi, 
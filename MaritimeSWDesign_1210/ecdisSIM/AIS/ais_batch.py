@@ -0,0 +1,110 @@
+# ais_batch.py
+# 다수 타겟의 AIS Message 1을 NumPy 배열 연산으로 한 번에 인코딩합니다.
+
+import time
+import numpy as np
+
+from ais_helpers import *
+
+# --- 1. 배치 인코딩 테이블 ---
+# 6비트 값 -> AIS ASCII 코드
+_ARMOR_LUT = np.array([ord(AIS_CHAR_MAP[i]) for i in range(64)], dtype=np.uint8)
+_HEX_LUT = np.frombuffer(b"0123456789ABCDEF", dtype=np.uint8)
+
+# Message 1 필드 배치 (비트 오프셋, 길이) - pack_aivdm_message_1과 동일
+_MSG_1_BITS = 168
+_MSG_1_CHARS = 28
+_MSG_1_FIELDS = {
+    "type": (0, 6), "mmsi": (8, 30), "nav_status": (38, 4), "sog": (50, 10),
+    "accuracy": (60, 1), "lon": (61, 28), "lat": (89, 27), "cog": (116, 12),
+    "hdg": (128, 9), "timestamp": (137, 6),
+}
+
+# 168비트를 42비트(= 6비트 문자 7개) uint64 워드 4개로 나누어 정수 시프트로 조립
+_WORD_BITS = 42
+_WORD_COUNT = _MSG_1_BITS // _WORD_BITS
+_WORD_MASK = np.uint64((1 << _WORD_BITS) - 1)
+_CHAR_SHIFTS = np.arange(_WORD_BITS - 6, -1, -6, dtype=np.uint64) # 워드 안 문자 7개의 시프트 (앞 문자부터)
+
+def _word_plan(offset, length):
+    """필드 [offset, offset+length)가 걸치는 워드마다 (워드 번호, 왼쪽 시프트, 오른쪽 시프트) 목록.
+    필드 값(하위 length비트)을 워드 안의 자리로 옮기는 시프트이며, 워드 경계를 넘는 필드는 두 워드로 나뉜다."""
+    plan = []
+    for word in range(offset // _WORD_BITS, (offset + length - 1) // _WORD_BITS + 1):
+        shift = (word + 1) * _WORD_BITS - (offset + length) # 필드 LSB가 워드 LSB에서 떨어진 거리 (음수면 다음 워드로 넘침)
+        plan.append((word, max(shift, 0), max(-shift, 0)))
+    return plan
+
+_MSG_1_PLAN = {name: (length, _word_plan(offset, length)) for name, (offset, length) in _MSG_1_FIELDS.items()}
+
+def _truncate_int(values):
+    """파이썬 int()와 같은 0 방향 절삭"""
+    return np.trunc(values).astype(np.int64)
+
+def encode_message_1_array(mmsi, lat, lon, sog_kn, cog_deg, heading_deg, nav_status, timestamp=None):
+    """N척의 Message 1 페이로드를 (N, 28) uint8 ASCII 배열로 반환합니다.
+    필드를 (N, 4) uint64 워드에 시프트/OR로 채운 뒤, 워드마다 6비트씩 잘라 문자로 바꿉니다."""
+    mmsi = np.atleast_1d(np.asarray(mmsi, dtype=np.int64))
+    count = mmsi.shape[0]
+    if timestamp is None:
+        timestamp = time.gmtime().tm_sec
+
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    field_values = {
+        "type": 1,
+        "mmsi": mmsi,
+        "nav_status": np.asarray(nav_status, dtype=np.int64),
+        "sog": _truncate_int(np.asarray(sog_kn, dtype=np.float64) * 10),
+        "accuracy": 1,
+        "lon": _truncate_int(lon * 60 * 10000),
+        "lat": _truncate_int(lat * 60 * 10000),
+        "cog": _truncate_int(np.asarray(cog_deg, dtype=np.float64) * 10),
+        "hdg": _truncate_int(np.asarray(heading_deg, dtype=np.float64)),
+        "timestamp": np.asarray(timestamp, dtype=np.int64),
+    }
+
+    words = np.zeros((_WORD_COUNT, count), dtype=np.uint64)
+    for name, (length, plan) in _MSG_1_PLAN.items():
+        # 음수(경도/위도)는 하위 length비트만 남겨 2의 보수로 기록
+        values = (np.asarray(field_values[name], dtype=np.int64) & ((1 << length) - 1)).astype(np.uint64)
+        for word, left, right in plan:
+            words[word] |= ((values << np.uint64(left)) >> np.uint64(right)) & _WORD_MASK
+
+    six_bit = (words.T[:, :, None] >> _CHAR_SHIFTS) & np.uint64(0x3F)
+    return _ARMOR_LUT[six_bit.reshape(count, _MSG_1_CHARS)]
+
+def pack_aivdm_message_1_batch(mmsi, lat, lon, sog_kn, cog_deg, heading_deg, nav_status, timestamp=None):
+    """N척의 Message 1 페이로드 문자열 리스트를 반환합니다 (pack_aivdm_message_1과 동일 결과)."""
+    armored = encode_message_1_array(mmsi, lat, lon, sog_kn, cog_deg, heading_deg, nav_status, timestamp)
+    flat = armored.tobytes().decode('ascii')
+    return [flat[i:i + _MSG_1_CHARS] for i in range(0, len(flat), _MSG_1_CHARS)]
+
+def frame_aivdm_message_1_batch(mmsi, lat, lon, sog_kn, cog_deg, heading_deg, nav_status, timestamp=None, channel="A"):
+    """N척의 Message 1을 체크섬이 포함된 '!AIVDM,...*hh\\r\\n' 바이트 문장 리스트로 반환합니다."""
+    armored = encode_message_1_array(mmsi, lat, lon, sog_kn, cog_deg, heading_deg, nav_status, timestamp)
+    count = armored.shape[0]
+
+    prefix = f"AIVDM,1,1,,{channel},".encode('ascii')
+    suffix = b",0"
+    # 고정 부분의 체크섬은 1회만 계산하고, 페이로드 부분만 행 단위로 XOR
+    fixed_checksum = int(calculate_checksum((prefix + suffix).decode('ascii')), 16)
+    checksum = np.bitwise_xor.reduce(armored, axis=1) ^ np.uint8(fixed_checksum)
+
+    sentence_len = 1 + len(prefix) + _MSG_1_CHARS + len(suffix) + 5
+    out = np.empty((count, sentence_len), dtype=np.uint8)
+    pos = 0
+    for chunk in (b"!", prefix):
+        out[:, pos:pos + len(chunk)] = np.frombuffer(chunk, dtype=np.uint8)
+        pos += len(chunk)
+    out[:, pos:pos + _MSG_1_CHARS] = armored
+    pos += _MSG_1_CHARS
+    out[:, pos:pos + 3] = np.frombuffer(suffix + b"*", dtype=np.uint8)
+    pos += 3
+    out[:, pos] = _HEX_LUT[checksum >> 4]
+    out[:, pos + 1] = _HEX_LUT[checksum & 0x0F]
+    out[:, pos + 2:] = np.frombuffer(b"\r\n", dtype=np.uint8)
+
+    flat = out.tobytes()
+    return [flat[i:i + sentence_len] for i in range(0, len(flat), sentence_len)]
+# --- 1. 배치 인코딩 종료 ---
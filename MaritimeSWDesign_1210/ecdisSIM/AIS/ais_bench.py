@@ -0,0 +1,221 @@
+# ais_bench.py
+# AIS 인코더 성능 비교 (기존 문자열 방식 vs 정수 비트 패킹 방식)
+# 실행: python ais_bench.py [반복 횟수] [배치 타겟 수]
+
+import sys
+import time
+import random
+import datetime
+import functools
+import operator
+
+from ais_helpers import *
+
+# --- 1. 기존 문자열 기반 인코더 (비교 기준) ---
+def _legacy_int_to_bin(value, length):
+    if value < 0:
+        value = (1 << length) + value
+    return format(value, f'0{length}b')
+
+def _legacy_str_to_bin(text, length_bits):
+    binary_payload = ""
+    max_chars = length_bits // 6
+    text = text.upper().ljust(max_chars, '@')
+    for char in text[:max_chars]:
+        binary_payload += _legacy_int_to_bin(AIS_STR_MAP.get(char, 0), 6)
+    return binary_payload
+
+def _legacy_bin_to_ascii(payload):
+    encoded_chars = []
+    for i in range(0, len(payload), 6):
+        chunk = payload[i:i+6]
+        if len(chunk) < 6:
+            chunk = chunk.ljust(6, '0')
+        encoded_chars.append(AIS_CHAR_MAP[int(chunk, 2)])
+    return "".join(encoded_chars)
+
+def legacy_pack_message_1(mmsi, lat, lon, sog_kn, cog_deg, heading_deg, nav_status, timestamp):
+    payload = ""
+    payload += _legacy_int_to_bin(1, 6)
+    payload += _legacy_int_to_bin(0, 2)
+    payload += _legacy_int_to_bin(mmsi, 30)
+    payload += _legacy_int_to_bin(nav_status, 4)
+    payload += _legacy_int_to_bin(0, 8)
+    payload += _legacy_int_to_bin(int(sog_kn * 10), 10)
+    payload += _legacy_int_to_bin(1, 1)
+    payload += _legacy_int_to_bin(int(lon * 60 * 10000), 28)
+    payload += _legacy_int_to_bin(int(lat * 60 * 10000), 27)
+    payload += _legacy_int_to_bin(int(cog_deg * 10), 12)
+    payload += _legacy_int_to_bin(int(heading_deg), 9)
+    payload += _legacy_int_to_bin(timestamp, 6)
+    payload += _legacy_int_to_bin(0, 2)
+    payload += _legacy_int_to_bin(0, 3)
+    payload += _legacy_int_to_bin(0, 1)
+    payload += _legacy_int_to_bin(0, 19)
+    return _legacy_bin_to_ascii(payload)
+
+def legacy_pack_message_5(mmsi, call_sign, ship_name, ship_type, dim_a, dim_b, dim_c, dim_d, eta, draught, destination):
+    b = ""
+    b += _legacy_int_to_bin(5, 6)
+    b += _legacy_int_to_bin(0, 2)
+    b += _legacy_int_to_bin(mmsi, 30)
+    b += _legacy_int_to_bin(0, 2)
+    b += _legacy_int_to_bin(0, 30)
+    b += _legacy_str_to_bin(call_sign, 42)
+    b += _legacy_str_to_bin(ship_name, 120)
+    b += _legacy_int_to_bin(ship_type, 8)
+    b += _legacy_int_to_bin(dim_a, 9)
+    b += _legacy_int_to_bin(dim_b, 9)
+    b += _legacy_int_to_bin(dim_c, 6)
+    b += _legacy_int_to_bin(dim_d, 6)
+    b += _legacy_int_to_bin(0, 4)
+    if eta:
+        b += _legacy_int_to_bin(eta.month, 4)
+        b += _legacy_int_to_bin(eta.day, 5)
+        b += _legacy_int_to_bin(eta.hour, 5)
+        b += _legacy_int_to_bin(eta.minute, 6)
+    else:
+        b += _legacy_int_to_bin(0, 4)
+        b += _legacy_int_to_bin(0, 5)
+        b += _legacy_int_to_bin(24, 5)
+        b += _legacy_int_to_bin(60, 6)
+    b += _legacy_int_to_bin(int(draught * 10), 8)
+    b += _legacy_str_to_bin(destination, 120)
+    b += _legacy_int_to_bin(0, 1)
+    b += _legacy_int_to_bin(0, 1)
+    ascii_payload = _legacy_bin_to_ascii(b)
+    return ascii_payload[:56], ascii_payload[56:]
+
+def legacy_xor_checksum(data):
+    return functools.reduce(operator.xor, data, 0)
+
+def legacy_calculate_checksum(sentence):
+    return f"{legacy_xor_checksum(bytes(sentence, 'utf-8')):02X}"
+# --- 1. 기존 인코더 종료 ---
+
+
+# --- 2. 벤치마크 ---
+def make_targets(count, seed=1):
+    """랜덤 타겟 (Msg 1 인자, Msg 5 인자) 목록 생성"""
+    rng = random.Random(seed)
+    targets = []
+    for _ in range(count):
+        mmsi = rng.randint(200000000, 799999999)
+        msg_1 = (
+            mmsi, rng.uniform(-89.9, 89.9), rng.uniform(-179.9, 179.9),
+            rng.uniform(0.0, 102.2), rng.uniform(0.0, 359.9), rng.uniform(0.0, 359.9),
+            rng.choice([0, 1, 5]), rng.randint(0, 59)
+        )
+        eta = None
+        if rng.random() < 0.5:
+            eta = datetime.datetime(2025, rng.randint(1, 12), rng.randint(1, 28), rng.randint(0, 23), rng.randint(0, 59))
+        name = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ 0123456789-&") for _ in range(rng.randint(1, 24)))
+        msg_5 = (
+            mmsi, "D7" + str(mmsi)[:5], name, rng.choice([70, 80, 60, 37]),
+            rng.randint(0, 511), rng.randint(0, 511), rng.randint(0, 63), rng.randint(0, 63),
+            eta, round(rng.uniform(0.0, 25.5), 1), rng.choice(["KR PUS", "JP TYO", "CN SHA", "us lax"])
+        )
+        targets.append((msg_1, msg_5))
+    return targets
+
+def _time_it(func, args_list):
+    start = time.perf_counter()
+    for args in args_list:
+        func(*args)
+    return time.perf_counter() - start
+
+def _best_times(funcs, args_list, repeat=9):
+    """funcs를 번갈아 repeat회 측정하여 각각 가장 짧은 시간 (GC/스케줄링 잡음 제거)"""
+    best = [float('inf')] * len(funcs)
+    for _ in range(repeat):
+        for i, func in enumerate(funcs):
+            best[i] = min(best[i], _time_it(func, args_list))
+    return best
+
+def run_benchmark(count=5000):
+    targets = make_targets(count)
+    msg_1_args = [t[0] for t in targets]
+    msg_5_args = [t[1] for t in targets]
+
+    # 1. 결과 동일성 검증
+    for args in msg_1_args:
+        assert pack_aivdm_message_1(*args) == legacy_pack_message_1(*args), f"Msg 1 불일치: {args}"
+    for args in msg_5_args:
+        assert pack_aivdm_message_5(*args) == legacy_pack_message_5(*args), f"Msg 5 불일치: {args}"
+    print(f"[검증] Msg 1 / Msg 5 각 {count}건 결과 동일.")
+
+    # 2. 속도 비교
+    for label, legacy_func, new_func, args_list in (
+        ("Msg 1", legacy_pack_message_1, pack_aivdm_message_1, msg_1_args),
+        ("Msg 5", legacy_pack_message_5, pack_aivdm_message_5, msg_5_args),
+    ):
+        t_legacy = _time_it(legacy_func, args_list)
+        t_new = _time_it(new_func, args_list)
+        print(f"[{label}] 기존: {count / t_legacy:10.0f} msg/s | "
+              f"비트 패킹: {count / t_new:10.0f} msg/s | {t_legacy / t_new:.1f}x")
+
+def run_batch_benchmark(count=10000):
+    """Msg 1 배치(NumPy) 인코더 vs 타겟별 인코더 (1회 보고 주기)"""
+    import numpy as np
+    from ais_batch import pack_aivdm_message_1_batch, frame_aivdm_message_1_batch
+
+    msg_1_args = [t[0] for t in make_targets(count)]
+    columns = [np.array(col) for col in zip(*msg_1_args)]
+    mmsi, lat, lon, sog, cog, hdg, status, ts = columns
+
+    scalar = [pack_aivdm_message_1(*args) for args in msg_1_args]
+    batch = pack_aivdm_message_1_batch(mmsi, lat, lon, sog, cog, hdg, status, ts)
+    framed = frame_aivdm_message_1_batch(mmsi, lat, lon, sog, cog, hdg, status, ts)
+    assert batch == scalar, "배치 인코더 결과 불일치"
+    body = f"AIVDM,1,1,,A,{scalar[0]},0"
+    assert framed[0] == f"!{body}*{calculate_checksum(body)}\r\n".encode('ascii')
+
+    t_scalar, t_batch, t_framed = _best_times((
+        lambda: [pack_aivdm_message_1(*args) for args in msg_1_args],
+        lambda: pack_aivdm_message_1_batch(mmsi, lat, lon, sog, cog, hdg, status, ts),
+        lambda: frame_aivdm_message_1_batch(mmsi, lat, lon, sog, cog, hdg, status, ts)), [()], repeat=7)
+    print(f"[Msg 1 배치 {count}척] 타겟별: {t_scalar * 1000:.1f} ms | "
+          f"배치 페이로드: {t_batch * 1000:.1f} ms ({t_scalar / t_batch:.1f}x) | "
+          f"배치 문장(체크섬 포함): {t_framed * 1000:.1f} ms")
+
+def run_framing_benchmark(count=50000):
+    """문장 조립 비교: f-string + reduce 체크섬 + encode vs NmeaSentenceBuilder (int 접기 체크섬)"""
+    payloads = [pack_aivdm_message_1(*t[0]) for t in make_targets(1000)]
+    builder = NmeaSentenceBuilder()
+
+    def legacy_frame(payload_str):
+        sentence_body = f"AIVDM,1,1,,A,{payload_str},0"
+        return f"!{sentence_body}*{legacy_calculate_checksum(sentence_body)}\r\n".encode('utf-8')
+
+    def builder_frame(payload_str):
+        return builder.frame(AIVDM_SINGLE_PREFIX, payload_str.encode('ascii'), AIVDM_SUFFIX)
+
+    for payload in payloads:
+        assert builder_frame(payload) == legacy_frame(payload)
+        assert frame_aivdm_sentence(payload) == legacy_frame(payload)
+
+    # 1. 체크섬만 (AIVDM 문장 본문 43바이트, 빌더가 XOR 하는 페이로드 28바이트, HEHDT 본문 ~11바이트)
+    bodies = [(f"AIVDM,1,1,,A,{payloads[i % len(payloads)]},0".encode('ascii'),) for i in range(count)]
+    payload_bytes = [(payloads[i % len(payloads)].encode('ascii'),) for i in range(count)]
+    hdt_bodies = [(b"HEHDT,%.1f,T" % (i % 3600 / 10.0),) for i in range(count)]
+    results = []
+    for name, data in (("체크섬 AIVDM 본문", bodies), ("체크섬 AIVDM 페이로드", payload_bytes), ("체크섬 HEHDT", hdt_bodies)):
+        for body, in data[:1000]:
+            assert xor_checksum(body) == legacy_xor_checksum(body)
+        results.append((name, *_best_times((legacy_xor_checksum, xor_checksum), data)))
+
+    # 2. 문장 조립 전체
+    args_list = [(payloads[i % len(payloads)],) for i in range(count)]
+    results.append(("문장 조립 AIVDM", *_best_times((legacy_frame, builder_frame), args_list)))
+    hdt_args = [(i % 3600 / 10.0,) for i in range(count)]
+    results.append(("문장 조립 HEHDT", *_best_times((
+        lambda hdg: (lambda body: f"{body}*{legacy_calculate_checksum(body)}\r\n".encode('utf-8'))(f"$HEHDT,{hdg:.1f},T"),
+        lambda hdg: builder.frame(b"$HEHDT,", b"%.1f" % hdg, b",T")), hdt_args)))
+
+    for name, t_legacy, t_new in results:
+        print(f"[{name}] 기존: {count / t_legacy:10.0f} /s | 신규: {count / t_new:10.0f} /s | {t_legacy / t_new:.1f}x")
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
+    run_framing_benchmark()
+    run_batch_benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 10000)
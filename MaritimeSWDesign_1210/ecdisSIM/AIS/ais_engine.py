@@ -18,6 +18,7 @@ class AisSimulator(threading.Thread):
         super().__init__(daemon=True)
         
         # [수정] target_data 딕셔너리에서 모든 정보 추출
+        self.target_data = target_data
         self.waypoints = target_data["waypoints"]
         static_data = target_data["static_data"]
         
@@ -50,6 +51,7 @@ class AisSimulator(threading.Thread):
         
         self.current_pos = self.waypoints[0]
         self.pos_lock = threading.Lock() # GUI와 위치 공유를 위한 잠금
+        self.sentence_builder = NmeaSentenceBuilder() # 전송 스레드 전용 문장 빌더
         
         # [신규] GUI가 이 객체를 직접 참조
         self.map_marker = None
@@ -91,13 +93,19 @@ class AisSimulator(threading.Thread):
 
     def _send_aivdm_packet(self, payload_str, total_parts=1, part_num=1, msg_id=""):
         """AIVDM 문장을 전송 (다중 패킷 지원)"""
+        if total_parts == 1:
+            prefix = AIVDM_SINGLE_PREFIX
+        else:
+            prefix = f"!AIVDM,{total_parts},{part_num},{msg_id},A,".encode('ascii')
+        packet = self.sentence_builder.frame(prefix, payload_str.encode('ascii'), AIVDM_SUFFIX)
+        return self._send_raw(packet)
+
+    def _send_raw(self, packet):
+        """이미 완성된 문장(bytes)을 그대로 전송"""
         if not self.sock:
             return False
         try:
-            sentence_body = f"AIVDM,{total_parts},{part_num},{msg_id},A,{payload_str},0"
-            checksum = calculate_checksum(sentence_body)
-            final_sentence = f"!{sentence_body}*{checksum}\r\n"
-            self.sock.sendall(final_sentence.encode('utf-8'))
+            self.sock.sendall(packet)
             return True
         except Exception as e:
             if self.running or self.is_holding: 
@@ -106,6 +114,25 @@ class AisSimulator(threading.Thread):
             self.is_holding = False 
             return False
 
+    def _get_msg_5_packet(self, default_eta_dt):
+        """Msg 5 (Part 1+2) 전송용 바이트를 캐시에서 꺼내거나, 없으면 생성하여 캐시에 저장.
+        ETA는 매번 static_data의 현재 값(팝업 수정 반영)을 읽고, 없으면 항로로 계산한 default_eta_dt를 사용.
+        캐시 키는 Msg 5를 이루는 필드 전체이므로 정적 데이터가 바뀌면 자동으로 다시 생성된다."""
+        s_data = self.static_data
+        eta_dt = s_data.get("eta_datetime") or default_eta_dt
+        key = (self.mmsi, s_data["call_sign"], s_data["ship_name"], s_data["ship_type"],
+               s_data["dim_a"], s_data["dim_b"], s_data["dim_c"], s_data["dim_d"],
+               eta_dt, s_data["draught"], s_data["destination"])
+        cached = self.target_data.get("msg_5_packet")
+        if cached and cached[0] == key:
+            return cached[1]
+        payload_part_1, payload_part_2 = pack_aivdm_message_5(*key)
+        msg_5_group_id = str(random.randint(0, 9)) 
+        packet = (frame_aivdm_sentence(payload_part_1, 2, 1, msg_5_group_id) +
+                  frame_aivdm_sentence(payload_part_2, 2, 2, msg_5_group_id))
+        self.target_data["msg_5_packet"] = (key, packet)
+        return packet
+
     def stop(self):
         """GUI에서 호출 시, 모든 루프를 중지하고 소켓을 닫음"""
         print(f"[AIS {self.mmsi}] 시뮬레이션 중지 신호 수신...")
@@ -154,14 +181,6 @@ class AisSimulator(threading.Thread):
         if not eta_dt and len(self.waypoints) > 1:
             eta_dt = self.calculate_eta(self.waypoints, self.max_speed_kn)
 
-        payload_part_1, payload_part_2 = pack_aivdm_message_5(
-            self.mmsi, 
-            s_data["call_sign"], s_data["ship_name"], s_data["ship_type"],
-            s_data["dim_a"], s_data["dim_b"], s_data["dim_c"], s_data["dim_d"],
-            eta_dt, s_data["draught"], s_data["destination"]
-        )
-        msg_5_group_id = str(random.randint(0, 9)) 
-        
         while self.running and self.target_idx < len(self.waypoints):
             delta_time = 1.0 
             target_pos = self.waypoints[self.target_idx]
@@ -234,9 +253,7 @@ class AisSimulator(threading.Thread):
             
             if current_time - last_static_send_time >= 30.0:
                 print(f"[AIS {self.mmsi}] 전송 (Msg 5: 정적 데이터 Part 1/2)")
-                if not self._send_aivdm_packet(payload_part_1, 2, 1, msg_5_group_id): break
-                time.sleep(0.1) 
-                if not self._send_aivdm_packet(payload_part_2, 2, 2, msg_5_group_id): break
+                if not self._send_raw(self._get_msg_5_packet(eta_dt)): break
                 last_static_send_time = current_time
                 
             time.sleep(1) 
@@ -258,9 +275,7 @@ class AisSimulator(threading.Thread):
 
             if current_time - last_static_send_time >= 30.0:
                 print(f"[AIS {self.mmsi}] 홀딩 모드. (Msg 5: 정적 데이터 Part 1/2) 전송")
-                if not self._send_aivdm_packet(payload_part_1, 2, 1, msg_5_group_id): break
-                time.sleep(0.1) 
-                if not self._send_aivdm_packet(payload_part_2, 2, 2, msg_5_group_id): break
+                if not self._send_raw(self._get_msg_5_packet(eta_dt)): break
                 last_static_send_time = current_time
 
             time.sleep(1) 
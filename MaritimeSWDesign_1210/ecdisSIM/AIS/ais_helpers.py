@@ -4,17 +4,74 @@ import functools
 import datetime
 import operator 
 import random
+import binascii
 
 # --- 1. NMEA 유틸리티 (체크섬) ---
+# 본문 길이(바이트) -> XOR 접기 시프트 (큰 것부터). NMEA 문장 길이(82자)보다 넉넉히 미리 계산
+XOR_FOLD_MAX_BYTES = 256
+_XOR_FOLD_SHIFTS = []
+for _n in range(XOR_FOLD_MAX_BYTES + 1):
+    _shifts = []
+    _s = 8
+    while _s < _n * 8:
+        _shifts.append(_s)
+        _s <<= 1
+    _XOR_FOLD_SHIFTS.append(tuple(reversed(_shifts)))
+del _n, _s, _shifts
+XOR_FOLD_MIN_BYTES = 16 # 이보다 짧은 본문(HEHDT 각도 등)은 바이트 단위 reduce가 더 빠름
+
+def xor_checksum(data):
+    """bytes의 XOR 체크섬 (정수값).
+    16바이트 이상은 바이트마다 XOR 하지 않고 int.from_bytes로 한 정수로 만든 뒤 절반씩 접어(x ^= x >> s) 하위 8비트만 남긴다."""
+    n = len(data)
+    if n < XOR_FOLD_MIN_BYTES or n > XOR_FOLD_MAX_BYTES:
+        return functools.reduce(operator.xor, data, 0)
+    x = int.from_bytes(data, 'little')
+    for s in _XOR_FOLD_SHIFTS[n]:
+        x ^= x >> s
+    return x & 0xFF
+
 def calculate_checksum(sentence):
     """NMEA 0183 문장의 체크섬을 검사합니다."""
     if '$' in sentence or '!' in sentence:
         sentence = sentence.split('$', 1)[-1].split('!', 1)[-1]
     if '*' in sentence:
         sentence = sentence.split('*', 1)[0]
-    nmeadata = bytes(sentence, 'utf-8')
-    checksum = functools.reduce(operator.xor, nmeadata, 0)
-    return f"{checksum:02X}"
+    return f"{xor_checksum(sentence.encode('utf-8')):02X}"
+
+AIVDM_SINGLE_PREFIX = b"!AIVDM,1,1,,A,"
+AIVDM_SUFFIX = b",0"
+
+def frame_aivdm_sentence(payload_str, total_parts=1, part_num=1, msg_id="", channel="A"):
+    """!AIVDM 문장을 체크섬과 CRLF까지 붙인 전송용 바이트로 만듭니다."""
+    sentence_body = f"AIVDM,{total_parts},{part_num},{msg_id},{channel},{payload_str},0"
+    return f"!{sentence_body}*{calculate_checksum(sentence_body)}\r\n".encode('ascii')
+
+# --- NMEA 문장 빌더 ---
+# 체크섬 값 -> b"*HH\r\n"
+_NMEA_TAILS = [f"*{i:02X}\r\n".encode('ascii') for i in range(256)]
+
+class NmeaSentenceBuilder:
+    """고정 머리말/꼬리말(b"$HEHDT,", b"!AIVDM,1,1,,A," 등) + 가변 본문으로 NMEA 문장을 조립합니다.
+    (머리말, 꼬리말) 쌍의 체크섬은 캐시하고, 가변 본문만 XOR 하여 체크섬을 완성합니다.
+    문장은 b"".join 한 번으로 만듭니다 (스레드마다 1개 사용)."""
+    __slots__ = ("checksums",)
+
+    def __init__(self):
+        self.checksums = {}
+
+    def _fixed_checksum(self, prefix, suffix):
+        key = (prefix, suffix)
+        checksum = self.checksums.get(key)
+        if checksum is None:
+            checksum = xor_checksum(prefix.lstrip(b"$!")) ^ xor_checksum(suffix)
+            self.checksums[key] = checksum
+        return checksum
+
+    def frame(self, prefix, body=b"", suffix=b""):
+        """prefix + body + suffix + b"*hh\r\n" 전송용 bytes 반환"""
+        checksum = self._fixed_checksum(prefix, suffix) ^ xor_checksum(body)
+        return b"".join((prefix, body, suffix, _NMEA_TAILS[checksum]))
 
 # --- 2. 좌표 계산 유틸리티 ---
 def deg_to_rad(deg):
@@ -105,88 +162,91 @@ def generate_random_mmsi(country_code="Korea"):
     suffix = str(random.randint(0, 999999)).zfill(6) # 6자리 랜덤 숫자
     return int(mid + suffix)
 
-def _int_to_bin_payload(value, length):
-    if value < 0:
-        value = (1 << length) + value
-    return format(value, f'0{length}b')
-
-def _ais_str_to_payload_bin(text, length_bits):
-    binary_payload = ""
-    max_chars = length_bits // 6
-    text = text.upper().ljust(max_chars, '@') 
-    for char in text[:max_chars]:
-        val = AIS_STR_MAP.get(char, 0) 
-        binary_payload += _int_to_bin_payload(val, 6)
-    return binary_payload
-
-def _bin_to_6bit_ascii(payload):
-    encoded_chars = []
-    for i in range(0, len(payload), 6):
-        chunk = payload[i:i+6]
-        if len(chunk) < 6:
-            chunk = chunk.ljust(6, '0') 
-        chunk_val = int(chunk, 2)
-        encoded_chars.append(AIS_CHAR_MAP[chunk_val])
-    return "".join(encoded_chars)
-
-def pack_aivdm_message_1(mmsi, lat, lon, sog_kn, cog_deg, heading_deg, nav_status): 
+# --- AIS 비트 패킹 엔진 ---
+# 6비트 아머링은 base64와 비트 배치가 같으므로, base64 결과를 AIS 문자표로 치환(translate)한다.
+_B64_ALPHABET = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+AIS_ARMOR_TABLE = bytes.maketrans(_B64_ALPHABET, bytes(ord(AIS_CHAR_MAP[i]) for i in range(64)))
+
+def _armor_bits(value, nbits):
+    """nbits 길이의 정수 비트열을 6비트 ASCII 페이로드로 변환합니다 (마지막 6비트 미만은 0 패딩)."""
+    nbytes = (nbits + 7) // 8
+    data = (value << (nbytes * 8 - nbits)).to_bytes(nbytes, 'big')
+    armored = binascii.b2a_base64(data, newline=False).translate(AIS_ARMOR_TABLE)
+    return armored[:(nbits + 5) // 6].decode('ascii')
+
+class AisBitWriter:
+    """AIS 페이로드 필드를 하나의 정수에 누적하는 비트 라이터"""
+    __slots__ = ("value", "nbits")
+
+    def __init__(self):
+        self.value = 0
+        self.nbits = 0
+
+    def put_int(self, value, length):
+        """정수 필드 추가 (음수는 length 비트 2의 보수)"""
+        self.value = (self.value << length) | (value & ((1 << length) - 1))
+        self.nbits += length
+
+    def put_str(self, text, length_bits):
+        """6비트 AIS 문자열 필드 추가 (남는 자리는 '@'로 채움)"""
+        max_chars = length_bits // 6
+        text = text.upper().ljust(max_chars, '@')
+        value = self.value
+        for char in text[:max_chars]:
+            value = (value << 6) | AIS_STR_MAP.get(char, 0)
+        self.value = value
+        self.nbits += max_chars * 6
+
+    def to_ascii(self):
+        return _armor_bits(self.value, self.nbits)
+
+def pack_aivdm_message_1(mmsi, lat, lon, sog_kn, cog_deg, heading_deg, nav_status, timestamp=None): 
     """AIS Class A 위치 보고서 (Message 1) 페이로드를 생성합니다 (168 비트)."""
-    payload = ""
-    payload += _int_to_bin_payload(1, 6)
-    payload += _int_to_bin_payload(0, 2)
-    payload += _int_to_bin_payload(mmsi, 30)
-    payload += _int_to_bin_payload(nav_status, 4)
-    payload += _int_to_bin_payload(0, 8)
-    sog_val = int(sog_kn * 10)
-    payload += _int_to_bin_payload(sog_val, 10)
-    payload += _int_to_bin_payload(1, 1)
-    lon_val = int(lon * 60 * 10000)
-    payload += _int_to_bin_payload(lon_val, 28)
-    lat_val = int(lat * 60 * 10000)
-    payload += _int_to_bin_payload(lat_val, 27)
-    cog_val = int(cog_deg * 10)
-    payload += _int_to_bin_payload(cog_val, 12)
-    hdg_val = int(heading_deg)
-    payload += _int_to_bin_payload(hdg_val, 9)
-    ts_val = time.gmtime().tm_sec
-    payload += _int_to_bin_payload(ts_val, 6)
-    payload += _int_to_bin_payload(0, 2)
-    payload += _int_to_bin_payload(0, 3)
-    payload += _int_to_bin_payload(0, 1)
-    payload += _int_to_bin_payload(0, 19)
-    return _bin_to_6bit_ascii(payload)
+    if timestamp is None:
+        timestamp = time.gmtime().tm_sec
+    # 고정 길이 필드를 한 번에 정수로 누적 (type 6, repeat 2, ..., radio 19 = 168 비트)
+    value = 1                                                     # type (6)
+    value = (value << 32) | (mmsi & 0x3FFFFFFF)                   # repeat(2) + mmsi(30)
+    value = (value << 4) | (nav_status & 0xF)
+    value = (value << 18) | (int(sog_kn * 10) & 0x3FF)            # rot(8) + sog(10)
+    value = (value << 29) | (1 << 28) | (int(lon * 60 * 10000) & 0xFFFFFFF)  # accuracy(1) + lon(28)
+    value = (value << 27) | (int(lat * 60 * 10000) & 0x7FFFFFF)
+    value = (value << 12) | (int(cog_deg * 10) & 0xFFF)
+    value = (value << 9) | (int(heading_deg) & 0x1FF)
+    value = (value << 6) | (timestamp & 0x3F)
+    value <<= 25                                                  # maneuver(2) + spare(3) + raim(1) + radio(19)
+    return _armor_bits(value, 168)
 
 def pack_aivdm_message_5(mmsi, call_sign, ship_name, ship_type, dim_a, dim_b, dim_c, dim_d, eta, draught, destination): 
     """AIS 정적/항해 데이터 (Message 5) 페이로드를 생성합니다 (424 비트)."""
-    binary_payload = ""
-    binary_payload += _int_to_bin_payload(5, 6)
-    binary_payload += _int_to_bin_payload(0, 2)
-    binary_payload += _int_to_bin_payload(mmsi, 30)
-    binary_payload += _int_to_bin_payload(0, 2)
-    binary_payload += _int_to_bin_payload(0, 30) # IMO Number
-    binary_payload += _ais_str_to_payload_bin(call_sign, 42) 
-    binary_payload += _ais_str_to_payload_bin(ship_name, 120) 
-    binary_payload += _int_to_bin_payload(ship_type, 8) 
-    binary_payload += _int_to_bin_payload(dim_a, 9) 
-    binary_payload += _int_to_bin_payload(dim_b, 9) 
-    binary_payload += _int_to_bin_payload(dim_c, 6) 
-    binary_payload += _int_to_bin_payload(dim_d, 6) 
-    binary_payload += _int_to_bin_payload(0, 4) # EPFD Type
+    w = AisBitWriter()
+    w.put_int(5, 6)
+    w.put_int(0, 2)
+    w.put_int(mmsi, 30)
+    w.put_int(0, 2)
+    w.put_int(0, 30) # IMO Number
+    w.put_str(call_sign, 42)
+    w.put_str(ship_name, 120)
+    w.put_int(ship_type, 8)
+    w.put_int(dim_a, 9)
+    w.put_int(dim_b, 9)
+    w.put_int(dim_c, 6)
+    w.put_int(dim_d, 6)
+    w.put_int(0, 4) # EPFD Type
     if eta:
-        binary_payload += _int_to_bin_payload(eta.month, 4) 
-        binary_payload += _int_to_bin_payload(eta.day, 5)   
-        binary_payload += _int_to_bin_payload(eta.hour, 5)  
-        binary_payload += _int_to_bin_payload(eta.minute, 6)
+        w.put_int(eta.month, 4)
+        w.put_int(eta.day, 5)
+        w.put_int(eta.hour, 5)
+        w.put_int(eta.minute, 6)
     else:
-        binary_payload += _int_to_bin_payload(0, 4) 
-        binary_payload += _int_to_bin_payload(0, 5) 
-        binary_payload += _int_to_bin_payload(24, 5)
-        binary_payload += _int_to_bin_payload(60, 6)
-    draught_val = int(draught * 10)
-    binary_payload += _int_to_bin_payload(draught_val, 8)
-    binary_payload += _ais_str_to_payload_bin(destination, 120) 
-    binary_payload += _int_to_bin_payload(0, 1) # DTE
-    binary_payload += _int_to_bin_payload(0, 1) # Spare
-    ascii_payload = _bin_to_6bit_ascii(binary_payload)
+        w.put_int(0, 4)
+        w.put_int(0, 5)
+        w.put_int(24, 5)
+        w.put_int(60, 6)
+    w.put_int(int(draught * 10), 8)
+    w.put_str(destination, 120)
+    w.put_int(0, 1) # DTE
+    w.put_int(0, 1) # Spare
+    ascii_payload = w.to_ascii()
     return ascii_payload[:56], ascii_payload[56:]
 # --- 3. AIS 유틸리티 종료 ---
\ No newline at end of file
@@ -0,0 +1,720 @@
+# ecdis_bench.py
+# ECDIS AIS 디코더 / 수신 루프 성능 비교
+# 실행: python ecdis_bench.py [문장 수] [수신 문장 수] [경합 스레드 수]
+
+import os
+import sys
+import io
+import time
+import math
+import operator
+import functools
+import random
+import tracemalloc
+import socket
+import threading
+import contextlib
+import tempfile
+
+import numpy as np
+
+from mini_ecdis import *
+from mini_ecdis import _dearmor_payload
+from nmea_capture import CaptureWriter, CaptureReader
+from nmea_replay import ReplaySender, open_records, replay
+
+# 테스트 문장 생성을 위해 AIS 시뮬레이터의 인코더를 사용
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "AIS"))
+from ais_helpers import pack_aivdm_message_1, pack_aivdm_message_5, frame_aivdm_sentence
+
+# --- 1. 기존 문자열 기반 디코더 (비교 기준) ---
+def _legacy_payload_to_bin(payload):
+    binary_payload = ""
+    for char in payload:
+        if char not in AIS_ASCII_MAP:
+            return None
+        binary_payload += format(AIS_ASCII_MAP[char], '06b')
+    return binary_payload
+
+def _legacy_signed_int_from_bin(bin_str):
+    value = int(bin_str, 2)
+    if bin_str.startswith('1'):
+        value -= (1 << len(bin_str))
+    return value
+
+def _legacy_bin_to_ais_str(bin_str):
+    text = ""
+    for i in range(0, len(bin_str), 6):
+        chunk = bin_str[i:i+6]
+        if len(chunk) < 6: break
+        text += AIS_BIN_TO_STR_MAP.get(int(chunk, 2), '@')
+    return text.strip('@').strip()
+
+def legacy_decode(payload):
+    """기존 방식으로 페이로드를 디코딩하여 target_data 딕셔너리 반환"""
+    b = _legacy_payload_to_bin(payload)
+    target_data = {"mmsi": int(b[8:38], 2)}
+    msg_type = int(b[0:6], 2)
+    if msg_type in (1, 2, 3):
+        target_data["lon"] = _legacy_signed_int_from_bin(b[61:89]) / 600000.0
+        target_data["lat"] = _legacy_signed_int_from_bin(b[89:116]) / 600000.0
+        sog_raw = int(b[50:60], 2)
+        target_data["sog"] = sog_raw / 10.0 if sog_raw != 1023 else None
+        cog_raw = int(b[116:128], 2)
+        target_data["cog"] = cog_raw / 10.0 if cog_raw != 3600 else None
+        hdg_raw = int(b[128:137], 2)
+        target_data["hdg"] = hdg_raw if hdg_raw != 511 else None
+        target_data["nav_status_str"] = NAV_STATUS_MAP.get(int(b[38:42], 2), "Not defined")
+        target_data["is_stopped"] = (target_data["sog"] is not None and target_data["sog"] < 0.1)
+    elif msg_type == 5:
+        target_data["call_sign"] = _legacy_bin_to_ais_str(b[70:112])
+        target_data["ship_name"] = _legacy_bin_to_ais_str(b[112:232])
+        target_data["ship_type_str"] = SHIP_TYPE_MAP.get(int(b[232:240], 2), "Unknown")
+        target_data["length"] = int(b[240:249], 2) + int(b[249:258], 2)
+        target_data["beam"] = int(b[258:264], 2) + int(b[264:270], 2)
+        eta_mon, eta_day = int(b[270:274], 2), int(b[274:279], 2)
+        eta_hr, eta_min = int(b[279:284], 2), int(b[284:290], 2)
+        if eta_mon > 0 and eta_day > 0 and eta_hr < 24 and eta_min < 60:
+            target_data["eta"] = f"{eta_day:02d}-{eta_mon:02d} {eta_hr:02d}:{eta_min:02d} UTC"
+        else:
+            target_data["eta"] = "N/A"
+        target_data["draught"] = int(b[290:298], 2) / 10.0
+        target_data["destination"] = _legacy_bin_to_ais_str(b[298:418])
+    return target_data
+# --- 1. 기존 디코더 종료 ---
+
+
+# --- 2. 벤치마크 ---
+BENCH_PROFILE = {"EPFS1": "-", "Heading": "-", "ROT": "-", "Sounder": "-", "AIS 1": "BENCH", "AIS 2": "BENCH"}
+
+def make_app_state(shard_count=AIS_STORE_SHARDS, profile_config=BENCH_PROFILE):
+    """GUI 없이 NmeaSession을 돌리기 위한 app_state"""
+    return {
+        "active_clients": [],
+        "own_ship": OwnShipStore(lat=35.10, lon=129.04, sog=0.0, cog=0.0),
+        "ais_targets": AisTargetStore(shard_count),
+        "profile_config": profile_config, "routing_table": compile_routing_table(profile_config),
+    }
+
+def make_payloads(count, msg_5_ratio=0.2, seed=1):
+    """랜덤 Msg 1 / Msg 5 페이로드 목록 생성 (Msg 5는 Part 1+2를 합친 전체 페이로드)"""
+    rng = random.Random(seed)
+    payloads = []
+    for _ in range(count):
+        mmsi = rng.randint(200000000, 799999999)
+        if rng.random() < msg_5_ratio:
+            name = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ 0123456789") for _ in range(rng.randint(1, 20)))
+            part_1, part_2 = pack_aivdm_message_5(
+                mmsi, "D7" + str(mmsi)[:5], name, rng.choice([70, 80, 60, 37]),
+                rng.randint(0, 300), rng.randint(0, 300), rng.randint(0, 30), rng.randint(0, 30),
+                None, rng.uniform(0.0, 20.0), rng.choice(["KR PUS", "JP TYO", "CN SHA"])
+            )
+            payloads.append(part_1 + part_2)
+        else:
+            payloads.append(pack_aivdm_message_1(
+                mmsi, rng.uniform(-89.9, 89.9), rng.uniform(-179.9, 179.9),
+                rng.choice([0.0, rng.uniform(0.0, 30.0)]), rng.uniform(0.0, 359.9), rng.uniform(0.0, 359.9),
+                rng.choice([0, 1, 5])
+            ))
+    return payloads
+
+def run_decoder_benchmark(count=20000):
+    payloads = make_payloads(count)
+    app_state = make_app_state()
+    store = app_state["ais_targets"]
+    handler = ClientHandler(None, ("bench", 0), "BENCH", app_state)
+
+    # 1. 결과 동일성 검증
+    with contextlib.redirect_stdout(io.StringIO()):
+        for payload in payloads:
+            handler._parse_aivdm_payload(_dearmor_payload(payload))
+            expected = legacy_decode(payload)
+            actual = store.get(expected["mmsi"])
+            store.remove(expected["mmsi"])
+            actual.pop("timestamp")
+            static = actual.pop("static", None)
+            if static is not None:
+                actual.update(static.fields())
+            assert actual == expected, f"디코딩 불일치: {payload}"
+    print(f"[검증] {count}건 디코딩 결과 동일.")
+
+    # 2. 속도 비교 (Msg 5 수신 로그 출력은 버림)
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for payload in payloads:
+            legacy_decode(payload)
+        t_legacy = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for payload in payloads:
+            handler._parse_aivdm_payload(_dearmor_payload(payload))
+        t_new = time.perf_counter() - start
+    print(f"[AIS 디코딩] 기존: {count / t_legacy:10.0f} 문장/s | 정수 방식: {count / t_new:10.0f} 문장/s | "
+          f"{t_legacy / t_new:.1f}x")
+
+    # 3. Msg 5: 1단계(비트 보관)만 vs 정적 필드까지 모두 디코딩
+    msg_5_payloads = [p for p in payloads if len(p) > 28]
+    with contextlib.redirect_stdout(io.StringIO()):
+        store.clear()
+        start = time.perf_counter()
+        for payload in msg_5_payloads:
+            handler._parse_aivdm_payload(_dearmor_payload(payload))
+        t_stage_1 = time.perf_counter() - start
+
+        store.clear()
+        start = time.perf_counter()
+        for payload in msg_5_payloads:
+            bits = _dearmor_payload(payload)
+            handler._parse_aivdm_payload(bits)
+            shard = store.shard(bits.uint(8, 38))
+            shard.static[shard.rows[bits.uint(8, 38)]].fields()
+        t_full = time.perf_counter() - start
+    count_5 = len(msg_5_payloads)
+    print(f"[Msg 5 {count_5}건] 1단계만: {count_5 / t_stage_1:10.0f} 문장/s | "
+          f"정적 필드 포함: {count_5 / t_full:10.0f} 문장/s")
+
+def legacy_validate_checksum(sentence):
+    """기존 문자열 체크섬 검사 (mini_ecdis.py에서 옮겨 옴)"""
+    try:
+        sentence_body, checksum_str = sentence.strip().split('*')
+        if sentence_body.startswith(('$', '!')):
+            sentence_body = sentence_body[1:]
+        nmeadata = bytes(sentence_body, 'utf-8')
+        calculated_checksum = functools.reduce(operator.xor, nmeadata, 0)
+        return int(checksum_str, 16) == calculated_checksum
+    except Exception:
+        return False
+
+def legacy_receive(conn):
+    """기존 수신 루프 (recv(1024) + str 버퍼 split + 문자열 체크섬). 유효 문장 수 반환"""
+    buffer = ""
+    valid = 0
+    while True:
+        data = conn.recv(1024)
+        if not data:
+            return valid
+        buffer += data.decode('ascii', errors='ignore')
+        while '\r\n' in buffer:
+            sentence, buffer = buffer.split('\r\n', 1)
+            if sentence.startswith(('$', '!')) and legacy_validate_checksum(sentence):
+                valid += 1
+
+class _FramingOnlyHandler(ClientHandler):
+    """수신 루프의 프레이밍 + 체크섬만 측정 (파서 호출 없음)"""
+    valid = 0
+    def parse_nmea_sentence(self, sentence, parsers):
+        if validate_checksum_bytes(sentence) >= 0:
+            self.valid += 1
+
+def _timed_receive(blob, receive):
+    """socketpair로 blob을 보내면서 receive(conn)을 실행하고 (결과, 소요 시간) 반환"""
+    tx, rx = socket.socketpair()
+    sender = threading.Thread(target=lambda: (tx.sendall(blob), tx.close()), daemon=True)
+    start = time.perf_counter()
+    sender.start()
+    result = receive(rx)
+    elapsed = time.perf_counter() - start
+    sender.join()
+    rx.close()
+    return result, elapsed
+
+def run_receive_benchmark(count=200000):
+    payloads = make_payloads(count, msg_5_ratio=0.0)
+    blob = b"".join(frame_aivdm_sentence(p) for p in payloads)
+    app_state = make_app_state()
+
+    # 체크섬 필드: 16진수 2자리 (대/소문자) + 뒤따르는 공백/탭 허용, 그 밖의 형식은 거부
+    sentence = next(s for s in (frame_aivdm_sentence(p).rstrip(b"\r\n") for p in payloads)
+                    if s[-2:].upper() != s[-2:].lower()) # 체크섬에 A-F가 들어간 문장
+    body, field = sentence[:-3], sentence[-2:]
+    star = len(sentence) - 3
+    for good in (field, field.lower(), field[:1].lower() + field[1:], field + b"  ", field + b"\t", field.lower() + b" \t"):
+        assert validate_checksum_bytes(body + b"*" + good) == star, good
+    for bad in (b"0x" + field[1:], b"+" + field[1:], field[1:], field + b"0", b"", b" " + field,
+                b"%02X" % (int(field, 16) ^ 1)):
+        assert validate_checksum_bytes(body + b"*" + bad) < 0, bad
+
+    def framing_only(conn):
+        handler = _FramingOnlyHandler(conn, ("bench", 0), "BENCH", app_state)
+        handler.run()
+        return handler.valid
+
+    def full_pipeline(conn):
+        handler = ClientHandler(conn, ("bench", 0), "BENCH", app_state)
+        handler.run()
+        return len(app_state["ais_targets"])
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        legacy_valid, t_legacy = _timed_receive(blob, legacy_receive)
+        new_valid, t_new = _timed_receive(blob, framing_only)
+        targets, t_full = _timed_receive(blob, full_pipeline)
+    assert legacy_valid == new_valid == count, (legacy_valid, new_valid)
+    assert targets == len({_dearmor_payload(p).uint(8, 38) for p in payloads}), targets
+    print(f"[수신 프레이밍 {count}문장, {len(blob) / 1e6:.1f} MB] 기존: {count / t_legacy:10.0f} 문장/s | "
+          f"recv_into: {count / t_new:10.0f} 문장/s | {t_legacy / t_new:.1f}x")
+    print(f"[수신 + AIS 파싱] {count / t_full:10.0f} 문장/s (프레이밍만의 {t_new / t_full * 100:.0f}%, 나머지는 AIS 파싱/저장 비용)")
+
+def run_capture_benchmark(count=200000):
+    """녹화를 켠 수신 처리량 (녹화 끔 대비)과 캡처 파일 중간 시각 탐색 시간"""
+    payloads = make_payloads(count, msg_5_ratio=0.0)
+    blob = b"".join(frame_aivdm_sentence(p) for p in payloads)
+
+    def full_pipeline(app_state):
+        def receive(conn):
+            handler = ClientHandler(conn, ("bench", 0), "BENCH", app_state)
+            handler.run()
+        return receive
+
+    with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+        _, t_plain = _timed_receive(blob, full_pipeline(make_app_state()))
+        recorder = CaptureWriter(directory)
+        recorder.start()
+        _, t_recorded = _timed_receive(blob, full_pipeline({**make_app_state(), "recorder": recorder}))
+        recorder.stop()
+        stats = recorder.stats()
+
+        reader = CaptureReader(directory)
+        records = reader.records()
+        first = next(records)[0]
+        last = first
+        for last, _, _ in records:
+            pass
+        middle = (first + last) / 2
+        start = time.perf_counter()
+        found = next(reader.records(start=middle))
+        t_seek = time.perf_counter() - start
+        capture_bytes = sum(os.path.getsize(f.path) for f in reader.files)
+    assert stats["written"] + stats["dropped"] == count and found[0] >= middle
+    print(f"[녹화 {count}문장, 캡처 {capture_bytes / 1e6:.1f} MB] 수신 + 파싱: 녹화 끔 {count / t_plain:10.0f} 문장/s | "
+          f"녹화 켬 {count / t_recorded:10.0f} 문장/s | 버림 {stats['dropped']} | 중간 시각 탐색: {t_seek * 1e3:.2f} ms")
+
+def run_replay_benchmark(count=200000):
+    """캡처 파일을 flat-out으로 재생해 localhost TCP -> ClientHandler 수신 처리량 측정 (줄 단위 읽기 vs mmap)"""
+    sentences = [frame_aivdm_sentence(p)[:-2] for p in make_payloads(count, msg_5_ratio=0.0)]
+    with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+        recorder = CaptureWriter(directory)
+        recorder.start()
+        base = time.monotonic()
+        for i in range(0, count, 100):
+            recorder.record("BENCH", sentences[i:i + 100], t=base + i / 1000.0)
+        recorder.stop()
+
+        results = []
+        for use_mmap in (False, True):
+            listener = socket.create_server(("127.0.0.1", 0))
+            app_state = make_app_state()
+            def serve():
+                conn, addr = listener.accept()
+                ClientHandler(conn, addr, "BENCH", app_state).run()
+            server = threading.Thread(target=serve, daemon=True)
+            server.start()
+            sender = ReplaySender("127.0.0.1", listener.getsockname()[1])
+            stats = replay(open_records(directory, use_mmap=use_mmap), {None: sender}, flat_out=True)
+            server.join()
+            listener.close()
+            assert stats["sentences"] == count and len(app_state["ais_targets"]) > 0
+            results.append(stats)
+    print(f"[재생 flat-out {count}문장 -> ClientHandler] 줄 단위 읽기: {results[0]['rate']:10.0f} 문장/s | "
+          f"mmap: {results[1]['rate']:10.0f} 문장/s")
+
+def run_contention_benchmark(feeders=8, per_feeder=20000, target_count=2000, snapshot_interval=0.05):
+    """N개의 수신 스레드가 동시에 AIS 타겟을 갱신하고, GUI 스레드가 주기적으로 스냅샷을 만드는 상황.
+    단일 잠금(샤드 1개, 기존 data_lock과 동일) vs MMSI 샤딩 저장소 비교.
+    파싱은 GIL 아래에서 돌기 때문에 샤딩해도 갱신 처리량은 늘지 않는다 (측정상 단일 잠금과 오차 범위 안).
+    샤딩이 줄이는 것은 잠금을 쥔 스레드가 GIL을 뺏겼을 때 같은 잠금을 기다리는 시간(최대 지연)뿐이다."""
+    pool = [_dearmor_payload(p) for p in make_payloads(target_count)]
+    rng = random.Random(7)
+    work = [[rng.choice(pool) for _ in range(per_feeder)] for _ in range(feeders)]
+
+    for label, shard_count in (("단일 잠금", 1), (f"샤딩 {AIS_STORE_SHARDS}", AIS_STORE_SHARDS)):
+        app_state = make_app_state(shard_count)
+        with contextlib.redirect_stdout(io.StringIO()):
+            sessions = [NmeaSession(("bench", i), "BENCH", app_state, recv_size=0) for i in range(feeders)]
+        latencies = [None] * feeders
+        snapshots = []
+        done = threading.Event()
+
+        def feed(index):
+            session = sessions[index]
+            samples = []
+            clock = time.perf_counter
+            for bits in work[index]:
+                start = clock()
+                session._parse_aivdm_payload(bits)
+                samples.append(clock() - start)
+            latencies[index] = samples
+
+        def gui():
+            while not done.is_set():
+                start = time.perf_counter()
+                DisplaySnapshot.build(app_state["own_ship"], app_state["ais_targets"])
+                snapshots.append(time.perf_counter() - start)
+                time.sleep(snapshot_interval)
+
+        gui_thread = threading.Thread(target=gui, daemon=True)
+        threads = [threading.Thread(target=feed, args=(i,), daemon=True) for i in range(feeders)]
+        with contextlib.redirect_stdout(io.StringIO()):
+            gui_thread.start()
+            start = time.perf_counter()
+            for t in threads: t.start()
+            for t in threads: t.join()
+            elapsed = time.perf_counter() - start
+            done.set()
+            gui_thread.join()
+
+        samples = sorted(x for per in latencies for x in per)
+        p99 = samples[int(len(samples) * 0.99)] * 1e6
+        worst = samples[-1] * 1e3
+        print(f"[경합 {feeders}스레드 x {per_feeder}건, CPU {os.cpu_count()}개, {label}] {len(samples) / elapsed:10.0f} 갱신/s | "
+              f"p99 {p99:6.1f} us | 최대 {worst:6.2f} ms | 스냅샷 {len(snapshots)}회 평균 "
+              f"{sum(snapshots) / max(len(snapshots), 1) * 1e3:.2f} ms")
+
+# 열 테이블 타겟당 메모리 상한 (항적 제외, 공간 색인/만료 힙 포함). 넘으면 run_memory_benchmark가 실패
+MEMORY_BUDGET_PER_TARGET = {"Msg 1": 360, "Msg 1 + 5": 410}
+
+def run_memory_benchmark(count=10000):
+    """타겟 count척 보관 메모리: 기존 {mmsi: dict} vs 열 기반 AisTargetStore (Msg 1만 / Msg 1 + Msg 5)"""
+    msg_1 = [_dearmor_payload(p) for p in make_payloads(count, msg_5_ratio=0.0)]
+    msg_5 = [_dearmor_payload(p) for p in make_payloads(count, msg_5_ratio=1.0)]
+    for bits_1, bits_5 in zip(msg_1, msg_5): # Msg 5의 MMSI를 Msg 1과 같게
+        shift = bits_5.nbits - 38
+        bits_5.value = bits_5.value & ~(((1 << 30) - 1) << shift) | (bits_1.uint(8, 38) << shift)
+
+    def legacy_store(messages):
+        targets = {}
+        for group in messages:
+            data = {}
+            for bits in group:
+                data.update(legacy_decode(_legacy_armor(bits)))
+            data["timestamp"] = time.time()
+            targets[data["mmsi"]] = data
+        return targets
+
+    def column_store(messages):
+        app_state = make_app_state()
+        with contextlib.redirect_stdout(io.StringIO()):
+            handler = NmeaSession(("bench", 0), "BENCH", app_state, recv_size=0)
+            for group in messages:
+                for bits in group:
+                    handler._parse_aivdm_payload(bits)
+        return app_state
+
+    for label, messages in (("Msg 1", [(b,) for b in msg_1]), ("Msg 1 + 5", list(zip(msg_1, msg_5)))):
+        used = []
+        for build in (legacy_store, column_store):
+            tracemalloc.start()
+            store = build(messages)
+            used.append(tracemalloc.get_traced_memory()[0])
+            tracemalloc.stop()
+            if build is column_store: # 항적 링 버퍼는 기존 dict에 없는 기능이므로 제외하고 비교
+                used[-1] -= sum(getattr(shard.tracks, name).nbytes for shard in store["ais_targets"].shards
+                                for name in ("lat", "lon", "time", "head", "count"))
+            del store
+        per_target = used[1] / count
+        print(f"[메모리 {count}척, {label}] 기존 dict: {used[0] / count:5.0f} B/척 | "
+              f"열 테이블(항적 제외): {per_target:5.0f} B/척 | {used[0] / used[1]:.1f}x")
+        budget = MEMORY_BUDGET_PER_TARGET[label]
+        assert per_target <= budget, f"열 테이블 메모리 회귀: {per_target:.0f} B/척 > 상한 {budget} B/척 ({label})"
+
+def run_spatial_benchmark(count=50000, queries=500, seed=3):
+    """공간 색인 조회 (최근접 / 반경 / 경계 상자) vs 전체 타겟 선형 탐색"""
+    rng = random.Random(seed)
+    app_state = make_app_state()
+    store = app_state["ais_targets"]
+    with contextlib.redirect_stdout(io.StringIO()):
+        handler = NmeaSession(("bench", 0), "BENCH", app_state, recv_size=0)
+    positions = {}
+    for i in range(count):
+        mmsi = 200000000 + i
+        lat, lon = rng.uniform(34.0, 36.0), rng.uniform(128.0, 130.5)
+        bits = _dearmor_payload(pack_aivdm_message_1(mmsi, lat, lon, 10.0, 90.0, 90.0, 0))
+        handler._parse_aivdm_payload(bits)
+        positions[mmsi] = (bits.sint(89, 116) / 600000.0, bits.sint(61, 89) / 600000.0)
+    points = [(rng.uniform(34.0, 36.0), rng.uniform(128.0, 130.5)) for _ in range(queries)]
+
+    def linear_nearest(lat, lon, max_nm):
+        best = None
+        for mmsi, pos in positions.items():
+            dist = calculate_distance((lat, lon), pos)
+            if dist <= max_nm and (best is None or dist < best[0]):
+                best = (dist, mmsi)
+        return best
+
+    # 1. 결과 동일성 (일부 지점)
+    for lat, lon in points[:20]:
+        assert store.nearest(lat, lon, 2.0) == linear_nearest(lat, lon, 2.0)
+        expected = {m for m, (a, b) in positions.items() if calculate_distance((lat, lon), (a, b)) <= 3.0}
+        assert {m for _, m, _, _ in store.radius(lat, lon, 3.0)} == expected
+    print(f"[공간 색인 검증] {count}척, 최근접/반경 결과 선형 탐색과 동일.")
+
+    # 날짜변경선(±180°) 양쪽 타겟: west > east 경계 상자와 ±180°를 넘는 반경 조회
+    dateline = make_app_state()
+    dl_store = dateline["ais_targets"]
+    with contextlib.redirect_stdout(io.StringIO()):
+        dl_handler = NmeaSession(("bench", 1), "BENCH", dateline, recv_size=0)
+    dl_positions = {}
+    for i in range(2000):
+        mmsi = 300000000 + i
+        lat, lon = rng.uniform(50.0, 52.0), rng.choice((rng.uniform(178.5, 180.0), rng.uniform(-180.0, -178.5)))
+        bits = _dearmor_payload(pack_aivdm_message_1(mmsi, lat, lon, 10.0, 90.0, 90.0, 0))
+        dl_handler._parse_aivdm_payload(bits)
+        dl_positions[mmsi] = (bits.sint(89, 116) / 600000.0, bits.sint(61, 89) / 600000.0)
+    expected = {m for m, (a, b) in dl_positions.items() if 50.5 <= a <= 51.5 and (b >= 179.5 or b <= -179.5)}
+    assert {m for m, _, _ in dl_store.bbox(50.5, 179.5, 51.5, -179.5)} == expected
+    for lat, lon in ((51.0, 179.95), (51.0, -179.95), (51.0, 180.0)):
+        expected = {m for m, pos in dl_positions.items() if calculate_distance((lat, lon), pos) <= 10.0}
+        assert expected and {m for _, m, _, _ in dl_store.radius(lat, lon, 10.0)} == expected
+    print("[공간 색인 검증] 날짜변경선을 넘는 경계 상자/반경 결과 선형 탐색과 동일.")
+
+    # 2. 속도
+    start = time.perf_counter()
+    for lat, lon in points[:20]:
+        linear_nearest(lat, lon, 0.05)
+    t_linear = (time.perf_counter() - start) / 20
+    timings = []
+    for label, query in (
+        ("클릭 최근접 0.05NM", lambda lat, lon: store.nearest(lat, lon, 0.05)),
+        ("최근접 5NM 이내", lambda lat, lon: store.nearest(lat, lon, 5.0)),
+        ("반경 3NM", lambda lat, lon: store.radius(lat, lon, 3.0)),
+        ("경계 상자 0.1°", lambda lat, lon: store.bbox(lat - 0.05, lon - 0.05, lat + 0.05, lon + 0.05)),
+    ):
+        start = time.perf_counter()
+        for lat, lon in points:
+            query(lat, lon)
+        timings.append(f"{label}: {(time.perf_counter() - start) / queries * 1e3:.3f} ms")
+    print(f"[공간 색인 {count}척] 선형 탐색(기존 클릭): {t_linear * 1e3:.1f} ms | " + " | ".join(timings))
+
+def run_expiry_benchmark(count=50000, expiring=500, ticks=20, seed=4):
+    """만료 힙으로 정리 vs 매 주기 전체 타겟 검사 (1초 주기, 대부분은 계속 수신 중인 선단)"""
+    rng = random.Random(seed)
+    now = time.time()
+
+    def fill(store):
+        for i in range(count):
+            mmsi = 200000000 + i
+            shard = store.shard(mmsi)
+            with shard.lock:
+                row = shard.row_for(mmsi)
+                shard.sog[row], shard.status[row] = rng.choice(((0.0, 1), (0.0, 15), (12.0, 0), (12.0, 5)))
+                # 앞쪽 expiring척은 이번 주기에 만료될 만큼 오래전에 수신
+                delay = ais_expiry_delay(shard.sog[row], shard.status[row])
+                age = delay + 1 if i < expiring else rng.uniform(0, AIS_LOST_SEC - ticks - 1)
+                shard.stamp(row, now - age)
+
+    def full_scan_expired(store, now):
+        removed = 0
+        for shard in store.shards:
+            with shard.lock:
+                rows = shard.occupied()
+                age = now - shard.timestamp[rows]
+                is_stationary = (shard.sog[rows] < 0.1) | np.isin(shard.status[rows], AIS_STATIONARY_NAV_STATUS)
+                expired = rows[age > np.where(is_stationary, AIS_STOPPED_LOST_SEC, AIS_LOST_SEC)]
+                shard.remove_rows(expired)
+                removed += len(expired)
+        return removed
+
+    results = {}
+    for label, remove in (("전체 검사", full_scan_expired), ("만료 힙", AisTargetStore.remove_expired)):
+        store = AisTargetStore()
+        fill(store)
+        start = time.perf_counter()
+        removed = [remove(store, now + tick) for tick in range(ticks)]
+        results[label] = ((time.perf_counter() - start) / ticks, removed, len(store))
+    assert results["전체 검사"][1:] == results["만료 힙"][1:], "만료 결과 불일치"
+    assert results["만료 힙"][2] == count - expiring
+
+    # 정박(15분 규칙) 중 예약된 타겟이 항해를 시작하면 5분 규칙으로 앞당겨져야 함
+    store = AisTargetStore()
+    shard = store.shard(200000000)
+    with shard.lock:
+        row = shard.row_for(200000000)
+        shard.sog[row], shard.status[row] = 0.0, 1
+        shard.stamp(row, now)
+        shard.sog[row], shard.status[row] = 12.0, 0
+        shard.stamp(row, now + 10)
+    assert store.remove_expired(now + 10 + AIS_LOST_SEC + 1) == 1, "항해 시작 후에도 정박 마감 유지"
+    print(f"[만료 정리 {count}척, 만료 {expiring}척] " + " | ".join(
+        f"{label}: {elapsed * 1e3:.2f} ms/주기" for label, (elapsed, _, _) in results.items()))
+
+def make_busan_targets(store, count, seed=5, area=(35.0, 35.2, 128.9, 129.2)):
+    """부산항 부근(기본 35.0~35.2N, 128.9~129.2E)에 count척 배치. 절반은 정박(SOG 0), 나머지는 임의 침로 항해"""
+    rng = random.Random(seed)
+    south, north, west, east = area
+    with contextlib.redirect_stdout(io.StringIO()):
+        handler = NmeaSession(("bench", 0), "BENCH", {**make_app_state(), "ais_targets": store}, recv_size=0)
+    for i in range(count):
+        sog = 0.0 if rng.random() < 0.5 else rng.uniform(3.0, 20.0)
+        payload = pack_aivdm_message_1(200000000 + i, rng.uniform(south, north), rng.uniform(west, east),
+                                       sog, rng.uniform(0.0, 359.9), rng.uniform(0.0, 359.9), 0 if sog else 5)
+        handler._parse_aivdm_payload(_dearmor_payload(payload))
+
+BENCH_OWN_SHIP = {"gps_status": "A", "has_fix": True, "lat": 35.08, "lon": 129.05, "sog": 12.0, "cog": 45.0}
+
+def run_cpa_benchmark(count=2000):
+    """전체 타겟 CPA/TCPA: 배열 연산 1회(CpaTcpaEngine) vs 타겟마다 AisPopup.calculate_cpa_tcpa"""
+    store = AisTargetStore()
+    make_busan_targets(store, count)
+    snapshot = DisplaySnapshot(time.time(), BENCH_OWN_SHIP, store.snapshot())
+    records = [snapshot.targets.get(mmsi) for mmsi in snapshot.targets.mmsi.tolist()]
+
+    start = time.perf_counter()
+    scalar = {record["mmsi"]: AisPopup.calculate_cpa_tcpa(None, BENCH_OWN_SHIP, record) for record in records}
+    t_scalar = time.perf_counter() - start
+
+    engine = CpaTcpaEngine(broad_phase=False)
+    start = time.perf_counter()
+    dangerous = engine.update(snapshot)
+    t_engine = time.perf_counter() - start
+
+    # 1. 팝업 계산과 같은 표시 값
+    for mmsi, (cpa_str, tcpa_str) in scalar.items():
+        cpa_nm, tcpa_min = engine.get(mmsi)
+        if math.isnan(cpa_nm):
+            assert cpa_str == "--", (mmsi, cpa_str)
+        else:
+            assert (f"{cpa_nm:.2f} NM", f"{tcpa_min:.1f} min") == (cpa_str, tcpa_str), (mmsi, cpa_str, tcpa_str)
+    expected = sorted((tcpa_min, cpa_nm, mmsi) for mmsi, (cpa_nm, tcpa_min) in ((m, engine.get(m)) for m in scalar)
+                      if cpa_nm <= CPA_LIMIT_NM and tcpa_min <= TCPA_LIMIT_MIN)
+    assert dangerous == expected, "위험 타겟 목록 불일치"
+
+    # 2. 본선 측위가 유효할 때만 경고: 첫 측위 전 'V'(초기 가상 위치), 측위를 잃은 뒤 'V'는 빈 목록
+    app_state = make_app_state()
+    with contextlib.redirect_stdout(io.StringIO()):
+        handler = NmeaSession(("bench", 0), "BENCH", app_state, recv_size=0)
+    gated = CpaTcpaEngine(broad_phase=False)
+    def alarms_after(rmc):
+        handler.parse_rmc(rmc.split(","))
+        return [mmsi for _, _, mmsi in gated.update(DisplaySnapshot(time.time(), app_state["own_ship"].snapshot(),
+                                                                   snapshot.targets))]
+    assert alarms_after("GPRMC,000000,V,,,,,,,010125,,") == []
+    assert alarms_after("GPRMC,000001,A,3504.8000,N,12903.0000,E,12.0,45.0,010125,,") == [m for _, _, m in dangerous]
+    assert alarms_after("GPRMC,000002,V,3504.8000,N,12903.0000,E,12.0,45.0,010125,,") == []
+    print(f"[CPA/TCPA 검증] {count}척, 팝업 계산과 표시 값 동일. 위험 타겟 {len(dangerous)}척.")
+    print(f"[CPA/TCPA {count}척] 타겟별 계산: {t_scalar * 1e3:.1f} ms | 배열 연산: {t_engine * 1e3:.2f} ms | "
+          f"{t_scalar / t_engine:.0f}x")
+
+def run_broad_phase_benchmark(budget_ms=100.0):
+    """CPA 선별 단계: 제외 비율과 1주기 시간 (부산항 밀집 / 대한해협 광역 / 고위도). 위험 목록은 전체 계산과 같아야 함.
+    고위도는 본선 북쪽에 타겟을 몰아 두어, 경도 축척을 본선 위도로만 잡는 평면 근사라면 거리를 크게 잡는 배치"""
+    polar_own_ship = {**BENCH_OWN_SHIP, "lat": 70.0, "lon": 20.0}
+    for label, count, area, own_ship in (
+        ("부산항 밀집", 2500, (35.0, 35.2, 128.9, 129.2), BENCH_OWN_SHIP),
+        ("대한해협 광역", 5000, (33.5, 36.0, 127.5, 131.0), BENCH_OWN_SHIP),
+        ("고위도", 2500, (70.0, 70.6, 18.5, 21.5), polar_own_ship),
+    ):
+        store = AisTargetStore()
+        make_busan_targets(store, count, area=area)
+        snapshot = DisplaySnapshot(time.time(), own_ship, store.snapshot())
+
+        full = CpaTcpaEngine(broad_phase=False)
+        pruned = CpaTcpaEngine()
+        assert pruned.update(snapshot) == full.update(snapshot), "선별 단계 적용 후 위험 목록 불일치"
+
+        # 후보만 팝업과 같은 타겟별 계산(calculate_cpa_tcpa)으로 처리해도 예산 안인지 확인
+        start = time.perf_counter()
+        mask = cpa_broad_phase(own_ship, snapshot.targets.lat, snapshot.targets.lon, snapshot.targets.sog,
+                               CPA_LIMIT_NM, TCPA_LIMIT_MIN)
+        for mmsi in snapshot.targets.mmsi[mask].tolist():
+            AisPopup.calculate_cpa_tcpa(None, own_ship, snapshot.targets.get(mmsi))
+        t_scalar_ms = (time.perf_counter() - start) * 1e3
+
+        stats = pruned.stats
+        print(f"[CPA 선별 {label} {count}척] 정밀 계산 {stats['candidates']}척 (제외 {stats['pruned_ratio']:.1%}) | "
+              f"배열 연산 1주기: {stats['elapsed_ms']:.2f} ms (전체 계산 {full.stats['elapsed_ms']:.2f} ms) | "
+              f"후보만 타겟별 계산: {t_scalar_ms:.1f} ms | 위험 {len(pruned.dangerous)}척")
+        assert stats["elapsed_ms"] < budget_ms and t_scalar_ms < budget_ms, f"{label}: {budget_ms} ms 예산 초과"
+
+def run_track_benchmark(count=10000, reports=400000, seed=6):
+    """항적 링 버퍼: 타겟 count척의 고정 메모리와 점 추가 비용 (수신 스레드와 같은 경로)"""
+    rng = random.Random(seed)
+    store = AisTargetStore()
+    for i in range(count):
+        shard = store.shard(200000000 + i)
+        with shard.lock:
+            shard.row_for(200000000 + i)
+    track_bytes = sum(shard.tracks.lat.nbytes + shard.tracks.lon.nbytes + shard.tracks.time.nbytes
+                      for shard in store.shards)
+    capacity_rows = sum(len(shard.tracks.lat) for shard in store.shards) # 샤드 용량은 2배씩 늘어남
+
+    # 1시간을 넘는 보고 (타겟마다 TRACK_MIN_INTERVAL_SEC 간격) -> 링이 한 바퀴 이상 돎
+    mmsis = [200000000 + rng.randrange(count) for _ in range(reports)]
+    start = time.perf_counter()
+    for n, mmsi in enumerate(mmsis):
+        shard = store.shard(mmsi)
+        with shard.lock:
+            shard.tracks.append(shard.rows[mmsi], 35.0, 129.0, n * (count / 40.0))
+    elapsed = time.perf_counter() - start
+
+    lat, _, times = store.track(mmsis[-1])
+    assert len(lat) <= TRACK_HISTORY_LEN and (np.diff(times) >= TRACK_MIN_INTERVAL_SEC).all()
+    print(f"[항적 링 버퍼 {count}척 x {TRACK_HISTORY_LEN}점] 메모리 {track_bytes / 2**20:.1f} MiB "
+          f"(할당 {capacity_rows}행 x {TRACK_HISTORY_LEN}점 x 16 B, 보고 수와 무관) | 추가: {elapsed / reports * 1e9:.0f} ns/회")
+
+def run_dead_reckoning_benchmark(count=10000, frames=50):
+    """추정 항법 표시: 1프레임 예측 시간(DR_FRAME_HZ 주기 예산 대비)과 새 보고 수신 시 표시 위치 연속성"""
+    store = AisTargetStore()
+    make_busan_targets(store, count)
+    now = time.time()
+    reckoner = DeadReckoner()
+    reckoner.set_snapshot(store.snapshot(), now)
+
+    start = time.perf_counter()
+    for frame in range(frames):
+        reckoner.predict(now + frame / DR_FRAME_HZ)
+    t_predict = (time.perf_counter() - start) / frames
+
+    # 6초 뒤 전 타겟이 새 보고를 보냄 -> 적용 직후 표시 위치가 직전 표시 위치와 같아야 함 (순간 이동 없음)
+    shown = reckoner.predict(now + 6.0)
+    for shard in store.shards:
+        with shard.lock:
+            for row in shard.occupied():
+                shard.stamp(row, now + 6.0)
+    start = time.perf_counter()
+    reckoner.set_snapshot(store.snapshot(), now + 6.0)
+    t_snapshot = time.perf_counter() - start
+    after = reckoner.predict(now + 6.0)
+    assert np.allclose(after.lat, shown.lat, atol=1e-9) and np.allclose(after.lon, shown.lon, atol=1e-9)
+
+    # 지도 클릭: 마커가 그려진 예측 위치를 누르면 그 타겟이 잡혀야 함 (1분 외삽 후, 보고 위치와 0.05NM 넘게 떨어진 타겟)
+    drawn = reckoner.predict(now + 66.0)
+    reported = store.snapshot()
+    moved = 0
+    t_click = 0.0
+    for index in range(0, len(drawn.mmsi), max(len(drawn.mmsi) // 200, 1)):
+        mmsi, lat, lon = int(drawn.mmsi[index]), float(drawn.lat[index]), float(drawn.lon[index])
+        row = np.flatnonzero(reported.mmsi == mmsi)[0]
+        if calculate_distance((lat, lon), (reported.lat[row], reported.lon[row])) <= 0.05:
+            continue
+        moved += 1
+        start = time.perf_counter()
+        hit = reckoner.hit_test(store, lat, lon, 0.05)
+        t_click += time.perf_counter() - start
+        assert hit[1] == mmsi
+        hit = store.nearest(lat, lon, 0.05)
+        assert hit is None or hit[1] != mmsi # 보고 위치 기준 판정으로는 이 마커를 누를 수 없음
+    assert moved
+    print(f"[추정 항법 {count}척] 프레임 예측: {t_predict * 1e3:.2f} ms "
+          f"({DR_FRAME_HZ} Hz 예산 {1000 / DR_FRAME_HZ:.0f} ms) | 스냅샷 적용(섞기 계산): {t_snapshot * 1e3:.2f} ms | "
+          f"새 보고 직후 표시 위치 연속 | 클릭 판정: 예측 위치 {moved}척 일치, "
+          f"{t_click / moved * 1e3:.2f} ms/회 (공간 색인 후보 반경 {reckoner.max_drift_nm:.2f}NM)")
+
+def _legacy_armor(bits):
+    """AisPayloadBits -> 6비트 ASCII 페이로드 (legacy_decode 입력용)"""
+    value, nbits = bits.value, bits.nbits
+    return "".join(AIS_CHAR_MAP_INV[(value >> (nbits - 6 * (i + 1))) & 0x3F] for i in range(nbits // 6))
+
+AIS_CHAR_MAP_INV = {v: k for k, v in AIS_ASCII_MAP.items()}
+
+if __name__ == "__main__":
+    run_decoder_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
+    run_receive_benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 200000)
+    run_contention_benchmark(int(sys.argv[3]) if len(sys.argv) > 3 else 8)
+    run_memory_benchmark()
+    run_spatial_benchmark()
+    run_expiry_benchmark()
+    run_cpa_benchmark()
+    run_broad_phase_benchmark()
+    run_track_benchmark()
+    run_dead_reckoning_benchmark()
+    run_capture_benchmark()
+    run_replay_benchmark()
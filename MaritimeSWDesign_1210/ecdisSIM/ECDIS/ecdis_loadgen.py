@@ -0,0 +1,367 @@
+# ecdis_loadgen.py
+# ECDIS 수신부(NmeaServer/AsyncNmeaServer + ClientHandler + parse_nmea_sentence) 부하 시험
+# GUI 없이 localhost 임시 포트에 리스너를 띄우고, 별도 프로세스의 부하 생성기가 AIS/본선 센서 문장을 보낸다.
+# 실행: python ecdis_loadgen.py [--ais-connections 4] [--ais-rate 0] [--msg5-fraction 0.1]
+#                               [--bad-checksum 0.01] [--sensor-hz 10] [--duration 10]
+#                               [--server asyncio|thread] [--out 결과.json] [--baseline 이전결과.json]
+#
+# 결과 (JSON)
+#   throughput: 보낸 문장 수, 파서에 도달한 문장 수, 첫 문장~마지막 파싱까지의 처리량 (문장/s)
+#   parse_latency_us: parse_nmea_sentence 1회 소요 시간 백분위 (체크섬 검사 + 필드 파싱 + 저장소 갱신)
+#   process: ECDIS 프로세스(부하 생성기 제외)의 CPU 시간/사용률, RSS
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import datetime
+import platform
+import threading
+import contextlib
+import io
+import multiprocessing
+
+import numpy as np
+
+try:
+    import resource # Unix 전용 (최대 RSS)
+except ImportError:
+    resource = None
+
+from mini_ecdis import *
+
+# 부하 문장 생성을 위해 AIS 시뮬레이터의 인코더를 사용
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "AIS"))
+from ais_helpers import pack_aivdm_message_1, pack_aivdm_message_5, frame_aivdm_sentence, calculate_checksum
+
+# App 기본 설정과 같은 배치: 본선 센서 -> T1, AIS -> T2
+LOADGEN_PROFILE = {"EPFS1": "T1", "Heading": "T1", "ROT": "T1", "Sounder": "T1", "AIS 1": "T2", "AIS 2": "0 (Off)"}
+LOADGEN_POOL_SIZE = 5000          # 연결마다 미리 만들어 두고 반복 전송할 AIS 메시지 수
+LOADGEN_TICK_SEC = 0.01           # 속도 제한 모드의 전송 주기
+LOADGEN_FLAT_OUT_BATCH = 500      # flat-out 모드에서 sendall 1회에 보낼 문장 수
+LOADGEN_DRAIN_IDLE_SEC = 0.5      # 부하 종료 후 파싱 수가 이 시간 동안 그대로면 처리 완료로 봄
+LOADGEN_DRAIN_TIMEOUT_SEC = 60.0
+LATENCY_PERCENTILES = (50, 90, 99, 99.9)
+
+# --- 1. 부하 문장 생성 ---
+def corrupt_checksum(sentence):
+    """'*hh\\r\\n'의 체크섬을 틀린 값으로 바꾼다"""
+    star = sentence.rindex(b"*")
+    wrong = int(sentence[star + 1:star + 3], 16) ^ 0x5A
+    return sentence[:star + 1] + b"%02X\r\n" % wrong
+
+def make_ais_sentences(connection, targets, msg5_fraction, bad_checksum, seed):
+    """AIS 연결 1개가 반복해서 보낼 문장 목록 (Msg 5는 Part 1/2 두 문장)"""
+    rng = random.Random(seed)
+    base_mmsi = 440000000 + connection * 100000
+    sentences = []
+    for i in range(LOADGEN_POOL_SIZE):
+        mmsi = base_mmsi + i % targets
+        if rng.random() < msg5_fraction:
+            part_1, part_2 = pack_aivdm_message_5(
+                mmsi, "D7" + str(mmsi)[-5:], f"LOAD {mmsi % 100000}", rng.choice([70, 80, 60, 37]),
+                rng.randint(0, 300), rng.randint(0, 300), rng.randint(0, 30), rng.randint(0, 30),
+                None, rng.uniform(0.0, 20.0), rng.choice(["KR PUS", "JP TYO", "CN SHA"])
+            )
+            group = str(i % 10)
+            framed = [frame_aivdm_sentence(part_1, 2, 1, group), frame_aivdm_sentence(part_2, 2, 2, group)]
+        else:
+            framed = [frame_aivdm_sentence(pack_aivdm_message_1(
+                mmsi, rng.uniform(34.8, 35.4), rng.uniform(128.7, 129.5),
+                rng.uniform(0.0, 25.0), rng.uniform(0.0, 359.9), rng.uniform(0.0, 359.9), rng.choice([0, 0, 0, 5])
+            ))]
+        sentences.extend(corrupt_checksum(s) if rng.random() < bad_checksum else s for s in framed)
+    return sentences
+
+def _nmea(body):
+    return f"${body}*{calculate_checksum(body)}\r\n".encode("ascii")
+
+def make_sensor_sentences(tick, bad_checksum, rng):
+    """본선 센서 1회분 (RMC, HDT, ROT, DPT)"""
+    lat = 35.10 + tick * 1e-5
+    lon = 129.04 + tick * 1e-5
+    utc = time.strftime("%H%M%S", time.gmtime())
+    lat_field = f"{int(lat):02d}{(lat % 1) * 60:07.4f}"
+    lon_field = f"{int(lon):03d}{(lon % 1) * 60:07.4f}"
+    sentences = [
+        _nmea(f"GPRMC,{utc}.00,A,{lat_field},N,{lon_field},E,12.0,45.0,{time.strftime('%d%m%y', time.gmtime())},,,A"),
+        _nmea(f"HEHDT,{45.0 + rng.uniform(-1, 1):.1f},T"),
+        _nmea(f"TIROT,{rng.uniform(-5, 5):.1f},A"),
+        _nmea(f"SDDPT,{rng.uniform(20, 40):.1f},0.5"),
+    ]
+    return [corrupt_checksum(s) if rng.random() < bad_checksum else s for s in sentences]
+# --- 1. 부하 문장 생성 종료 ---
+
+
+# --- 2. 부하 생성기 (별도 프로세스) ---
+def _send_ais(host, port, sentences, rate, deadline, result, index):
+    """AIS 연결 1개: rate 문장/s (0이면 flat-out)로 deadline까지 pool을 반복 전송"""
+    sent = 0
+    position = 0
+    total = len(sentences)
+    start = time.perf_counter()
+    try:
+        with socket.create_connection((host, port), timeout=5.0) as sock:
+            while True:
+                now = time.perf_counter()
+                if now >= deadline:
+                    break
+                if rate:
+                    count = int((now - start) * rate) - sent
+                    if count <= 0:
+                        time.sleep(LOADGEN_TICK_SEC)
+                        continue
+                else:
+                    count = LOADGEN_FLAT_OUT_BATCH
+                end = position + count
+                chunk = sentences[position:end]
+                while end > total:
+                    end -= total
+                    chunk += sentences[:end]
+                sock.sendall(b"".join(chunk))
+                position = end % total
+                sent += count
+    except OSError as e:
+        result["errors"].append(f"AIS {index}: {e}")
+    result["ais_sent"][index] = sent
+
+def _send_sensors(host, port, hz, bad_checksum, deadline, result):
+    """본선 센서 연결 1개: 초당 hz회 RMC/HDT/ROT/DPT 전송"""
+    rng = random.Random(99)
+    sent = 0
+    tick = 0
+    start = time.perf_counter()
+    try:
+        with socket.create_connection((host, port), timeout=5.0) as sock:
+            while time.perf_counter() < deadline:
+                due = start + tick / hz
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                batch = make_sensor_sentences(tick, bad_checksum, rng)
+                sock.sendall(b"".join(batch))
+                sent += len(batch)
+                tick += 1
+    except OSError as e:
+        result["errors"].append(f"Sensor: {e}")
+    result["sensor_sent"] = sent
+
+def run_load(config, ports, result_queue):
+    """부하 생성 프로세스 본체. 결과(보낸 문장 수, 오류)를 result_queue로 돌려준다."""
+    host = "127.0.0.1"
+    pools = [make_ais_sentences(i, config["targets"], config["msg5_fraction"], config["bad_checksum"], seed=i + 1)
+             for i in range(config["ais_connections"])]
+    result = {"ais_sent": [0] * len(pools), "sensor_sent": 0, "errors": []}
+    deadline = time.perf_counter() + config["duration"]
+    threads = [threading.Thread(target=_send_ais, args=(host, ports["T2"], pool, config["ais_rate"], deadline, result, i))
+               for i, pool in enumerate(pools)]
+    if config["sensor_hz"] > 0:
+        threads.append(threading.Thread(target=_send_sensors, args=(
+            host, ports["T1"], config["sensor_hz"], config["bad_checksum"], deadline, result)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    result_queue.put(result)
+# --- 2. 부하 생성기 종료 ---
+
+
+# --- 3. 측정 ---
+class ParseProbe:
+    """NmeaSession.parse_nmea_sentence를 감싸 문장별 소요 시간과 첫/마지막 파싱 시각을 기록 (시험 중에만)"""
+    def __init__(self):
+        self.samples = []
+        self.first_time = None # (perf_counter_ns, process_time) - 부하 생성기 준비 시간은 측정에서 제외
+        self.last_time = None
+        self.original = None
+
+    def install(self):
+        self.original = original = NmeaSession.parse_nmea_sentence
+        samples = self.samples
+        clock = time.perf_counter_ns
+        probe = self
+
+        def timed_parse(session, sentence, parsers):
+            start = clock()
+            if probe.first_time is None:
+                probe.first_time = (start, time.process_time())
+            original(session, sentence, parsers)
+            end = clock()
+            samples.append(end - start)
+            probe.last_time = end
+        NmeaSession.parse_nmea_sentence = timed_parse
+
+    def uninstall(self):
+        if self.original is not None:
+            NmeaSession.parse_nmea_sentence = self.original
+            self.original = None
+
+def rss_bytes():
+    """현재 RSS (Linux /proc). 알 수 없으면 None"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def peak_rss_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024 # Linux는 KB 단위
+
+def start_listeners(mode, app_state):
+    """T1/T2를 임시 포트로 열고 (리스너 목록, {이름: 실제 포트}) 반환"""
+    if mode == "asyncio":
+        server = AsyncNmeaServer({"T1": 0, "T2": 0}, app_state)
+        server.start()
+        server.ready.wait(5.0)
+        if len(server.servers) != 2:
+            raise RuntimeError("asyncio 리스너 바인딩 실패")
+        return [server], dict(server.ports)
+    servers = [NmeaServer(0, name, app_state) for name in ("T1", "T2")]
+    for server in servers:
+        server.start()
+    for server in servers:
+        server.ready.wait(5.0)
+        if server.sock is None:
+            raise RuntimeError(f"{server.config_name} 리스너 바인딩 실패")
+    return servers, {server.config_name: server.port for server in servers}
+
+def run_benchmark(config):
+    """ECDIS 리스너를 띄우고 부하를 건 뒤 결과 dict 반환"""
+    app_state = {
+        "active_clients": [],
+        "own_ship": OwnShipStore(lat=35.10, lon=129.04, sog=0.0, cog=0.0),
+        "ais_targets": AisTargetStore(),
+        "recv_size": DEFAULT_RECV_SIZE,
+        "profile_config": LOADGEN_PROFILE, "routing_table": compile_routing_table(LOADGEN_PROFILE),
+    }
+    probe = ParseProbe()
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log): # 연결/Msg 5 수신 로그는 결과에서 제외
+        servers, ports = start_listeners(config["server"], app_state)
+        probe.install()
+        result_queue = multiprocessing.Queue()
+        loader = multiprocessing.Process(target=run_load, args=(config, ports, result_queue), daemon=True)
+
+        rss_before = rss_bytes()
+        rss_max = rss_before or 0
+        loader.start()
+        load_result = None
+        while load_result is None:
+            try:
+                load_result = result_queue.get(timeout=0.5)
+            except Exception:
+                if not loader.is_alive():
+                    raise RuntimeError("부하 생성 프로세스가 결과 없이 종료됨")
+            rss_max = max(rss_max, rss_bytes() or 0)
+        loader.join()
+
+        # 보낸 문장을 모두 처리할 때까지 대기 (파싱 수가 LOADGEN_DRAIN_IDLE_SEC 동안 그대로면 완료)
+        drain_deadline = time.perf_counter() + LOADGEN_DRAIN_TIMEOUT_SEC
+        last_count = -1
+        while len(probe.samples) != last_count and time.perf_counter() < drain_deadline:
+            last_count = len(probe.samples)
+            time.sleep(LOADGEN_DRAIN_IDLE_SEC)
+            rss_max = max(rss_max, rss_bytes() or 0)
+        cpu_end = time.process_time()
+        probe.uninstall()
+        for server in servers:
+            server.stop()
+
+    samples = np.array(probe.samples, dtype=np.int64)
+    parsed = len(samples)
+    active_sec = cpu_sec = 0.0
+    if probe.first_time:
+        active_sec = (probe.last_time - probe.first_time[0]) / 1e9
+        cpu_sec = cpu_end - probe.first_time[1]
+    sent = sum(load_result["ais_sent"]) + load_result["sensor_sent"]
+    latency = {}
+    if parsed:
+        values = np.percentile(samples, LATENCY_PERCENTILES) / 1000.0
+        latency = {f"p{p:g}": round(float(v), 2) for p, v in zip(LATENCY_PERCENTILES, values)}
+        latency["mean"] = round(float(samples.mean()) / 1000.0, 2)
+        latency["max"] = round(float(samples.max()) / 1000.0, 2)
+    return {
+        "throughput": {
+            "sent": sent, "ais_sent": sum(load_result["ais_sent"]), "sensor_sent": load_result["sensor_sent"],
+            "parsed": parsed, "sentences_per_sec": round(parsed / active_sec, 1) if active_sec > 0 else 0.0,
+            "active_sec": round(active_sec, 3),
+        },
+        "parse_latency_us": latency,
+        "process": {
+            "cpu_sec": round(cpu_sec, 3), "cpu_percent": round(100.0 * cpu_sec / active_sec, 1) if active_sec > 0 else 0.0,
+            "rss_before_mb": round(rss_before / 2 ** 20, 1) if rss_before else None,
+            "rss_max_mb": round(rss_max / 2 ** 20, 1) if rss_max else None,
+            "peak_rss_mb": round(peak_rss_bytes() / 2 ** 20, 1) if resource else None,
+        },
+        "state": {"ais_targets": len(app_state["ais_targets"]), "own_ship_gps": app_state["own_ship"].snapshot().get("gps_status")},
+        "errors": load_result["errors"],
+    }
+# --- 3. 측정 종료 ---
+
+
+def compare(result, baseline):
+    """이전 결과 대비 주요 지표 변화 출력"""
+    for section, key in (("throughput", "sentences_per_sec"), ("parse_latency_us", "p50"),
+                         ("parse_latency_us", "p99"), ("process", "cpu_percent"), ("process", "rss_max_mb")):
+        new = result["results"][section].get(key)
+        old = baseline.get("results", {}).get(section, {}).get(key)
+        if new is None or not old:
+            continue
+        print(f"  {section}.{key}: {old} -> {new} ({(new - old) / old:+.1%})")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ECDIS 수신 부하 시험 (GUI 없음)")
+    parser.add_argument("--ais-connections", type=int, default=4, help="AIS 연결 수 (T2)")
+    parser.add_argument("--ais-rate", type=float, default=0.0, help="AIS 연결당 문장/s (0 = flat-out)")
+    parser.add_argument("--targets", type=int, default=1000, help="AIS 연결당 MMSI 수")
+    parser.add_argument("--msg5-fraction", type=float, default=0.1, help="AIS 메시지 중 Msg 5 비율")
+    parser.add_argument("--bad-checksum", type=float, default=0.01, help="체크섬을 틀리게 보낼 문장 비율")
+    parser.add_argument("--sensor-hz", type=float, default=10.0, help="본선 센서(RMC/HDT/ROT/DPT) 초당 전송 횟수 (T1, 0 = 끔)")
+    parser.add_argument("--duration", type=float, default=10.0, help="부하 시간 (초)")
+    parser.add_argument("--server", choices=("asyncio", "thread"), default="asyncio", help="ECDIS 리스너 방식")
+    parser.add_argument("--out", help="결과 JSON 경로 (기본: ecdis_load_<시각>.json)")
+    parser.add_argument("--baseline", help="비교할 이전 결과 JSON")
+    args = parser.parse_args(argv)
+
+    config = {
+        "ais_connections": args.ais_connections, "ais_rate": args.ais_rate, "targets": args.targets,
+        "msg5_fraction": args.msg5_fraction, "bad_checksum": args.bad_checksum,
+        "sensor_hz": args.sensor_hz, "duration": args.duration, "server": args.server,
+    }
+    print(f"[부하] 설정: {config}")
+    results = run_benchmark(config)
+    report = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "config": config,
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "numpy": np.__version__, "cpu_count": os.cpu_count()},
+        "results": results,
+    }
+    t, lat, proc = results["throughput"], results["parse_latency_us"], results["process"]
+    print(f"[부하] 보냄 {t['sent']} | 파싱 {t['parsed']} | {t['sentences_per_sec']:.0f} 문장/s")
+    if lat:
+        print(f"[부하] 파싱 지연 (us): p50 {lat['p50']} | p90 {lat['p90']} | p99 {lat['p99']} | p99.9 {lat['p99.9']} | max {lat['max']}")
+    print(f"[부하] CPU {proc['cpu_sec']} s ({proc['cpu_percent']}%) | RSS 최대 {proc['rss_max_mb']} MB | "
+          f"타겟 {results['state']['ais_targets']}척")
+    for error in results["errors"]:
+        print(f"[부하] 오류: {error}")
+
+    out = args.out or f"ecdis_load_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"[부하] 결과 저장: {out}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"[부하] {args.baseline} 대비:")
+        compare(report, baseline)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
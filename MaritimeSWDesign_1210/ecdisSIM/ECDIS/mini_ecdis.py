@@ -2,27 +2,51 @@ import tkinter
 import tkinter.font as tkFont
 from tkinter import ttk
 import tkintermapview
+import os
 import socket
+import select
 import time
 import threading
 import math
-import operator
-import functools
 import datetime
+import sys
+import binascii
+import asyncio
+import heapq
+from collections import OrderedDict
+from types import MappingProxyType
+
+import numpy as np
+
+from nmea_capture import CaptureWriter
+
+# NMEA XOR 체크섬은 AIS 시뮬레이터(AIS/ais_helpers.py)와 같은 구현을 함께 사용
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "AIS"))
+from ais_helpers import xor_checksum
 
 # --- 1. NMEA 파서 및 유틸리티 ---
 
-def validate_checksum(sentence):
-    """NMEA 0183 문장의 체크섬을 검사합니다."""
-    try:
-        sentence_body, checksum_str = sentence.strip().split('*')
-        if sentence_body.startswith(('$', '!')):
-            sentence_body = sentence_body[1:]
-        nmeadata = bytes(sentence_body, 'utf-8')
-        calculated_checksum = functools.reduce(operator.xor, nmeadata, 0)
-        return int(checksum_str, 16) == calculated_checksum
-    except Exception:
-        return False
+# 체크섬 필드(16진수 2자리, 대/소문자 모두) -> 값. 이 표에 없는 필드('0x1', '+1', '1', 'A5F')는 모두 거부
+NMEA_CHECKSUM_FIELDS = {
+    (hi + lo).encode('ascii'): i
+    for i in range(256)
+    for hi in {f"{i >> 4:X}", f"{i >> 4:x}"}
+    for lo in {f"{i & 0xF:X}", f"{i & 0xF:x}"}
+}
+
+def validate_checksum_bytes(sentence):
+    """bytes NMEA 문장('$...*hh', CRLF 제외)의 체크섬을 디코딩 없이 검사합니다.
+    '*' 뒤는 정확히 16진수 2자리 ('A5', 'a5', 'aF' 모두 허용)이고, 그 뒤의 공백/탭은 무시합니다.
+    통과하면 '*'의 위치를, 실패하면 -1을 반환합니다."""
+    if sentence[-1:].isspace():
+        sentence = sentence.rstrip()
+    star = len(sentence) - 3
+    if star < 1 or sentence[star] != 0x2A: # '*'
+        return -1
+    expected = NMEA_CHECKSUM_FIELDS.get(sentence[star + 1:])
+    if expected is None or xor_checksum(sentence[1:star]) != expected:
+        return -1
+    return star
 
 def safe_float(s, default=0.0):
     try: return float(s)
@@ -63,6 +87,20 @@ def calculate_distance(p1, p2): # p1=(lat, lon), p2=(lat, lon)
     c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
     distance = R_NM * c
     return distance
+
+def tile_to_latlon(tile_x, tile_y, zoom):
+    """지도 타일 좌표(웹 메르카토르, 소수 허용) -> (lat, lon)"""
+    n = 2.0 ** zoom
+    lon = tile_x / n * 360.0 - 180.0
+    lat = rad_to_deg(math.atan(math.sinh(math.pi * (1.0 - 2.0 * tile_y / n))))
+    return lat, lon
+
+def latlon_to_tile(lat, lon, zoom):
+    """(lat, lon) -> 지도 타일 좌표 (tile_to_latlon의 역변환). 256을 곱하면 화면 픽셀 좌표"""
+    n = 2.0 ** zoom
+    tile_x = (lon + 180.0) / 360.0 * n
+    tile_y = (1.0 - math.asinh(math.tan(deg_to_rad(lat))) / math.pi) / 2.0 * n
+    return tile_x, tile_y
 # --- 좌표 계산 유틸리티 종료 ---
 
 
@@ -90,100 +128,837 @@ NAV_STATUS_MAP = {
     15: "Not defined"
 }
 
-def _payload_to_bin(payload):
-    binary_payload = ""
-    for char in payload:
-        if char not in AIS_ASCII_MAP:
-            return None 
-        binary_payload += format(AIS_ASCII_MAP[char], '06b')
-    return binary_payload
-
-def _signed_int_from_bin(bin_str):
-    value = int(bin_str, 2)
-    if bin_str.startswith('1'): 
-        value -= (1 << len(bin_str))
-    return value
-
-def _bin_to_ais_str(bin_str):
-    text = ""
-    for i in range(0, len(bin_str), 6):
-        chunk = bin_str[i:i+6]
-        if len(chunk) < 6: break
-        val = int(chunk, 2)
-        text += AIS_BIN_TO_STR_MAP.get(val, '@')
-    return text.strip('@').strip() 
+# 페이로드 문자 -> base64 문자 (6비트 값이 같도록). 유효하지 않은 문자는 b'!'로 표시.
+_B64_ALPHABET = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+_AIS_DEARMOR_TABLE = bytearray(b"!" * 256)
+for _char, _val in AIS_ASCII_MAP.items():
+    if _val < 64:
+        _AIS_DEARMOR_TABLE[ord(_char)] = _B64_ALPHABET[_val]
+_AIS_DEARMOR_TABLE = bytes(_AIS_DEARMOR_TABLE)
+# 6비트 값(base64 문자) -> AIS 문자열 문자
+_AIS_TEXT_TABLE = bytes.maketrans(_B64_ALPHABET, "".join(AIS_BIN_TO_STR_MAP[i] for i in range(64)).encode('ascii'))
+
+class AisPayloadBits:
+    """역아머링된 AIS 페이로드 (하나의 큰 정수 + 비트 길이). 필드는 시프트/마스크로 추출."""
+    __slots__ = ("value", "nbits")
+
+    def __init__(self, value, nbits):
+        self.value = value
+        self.nbits = nbits
+
+    def uint(self, start, end):
+        """[start, end) 비트 구간의 부호 없는 정수"""
+        return (self.value >> (self.nbits - end)) & ((1 << (end - start)) - 1)
+
+    def sint(self, start, end):
+        """[start, end) 비트 구간의 2의 보수 정수"""
+        value = self.uint(start, end)
+        if value >> (end - start - 1):
+            value -= 1 << (end - start)
+        return value
+
+    def text(self, start, end):
+        """[start, end) 비트 구간의 6비트 AIS 문자열 (끝의 '@'/공백 제거)"""
+        nchars = (end - start) // 6
+        nbits = nchars * 6
+        pad = -nbits % 24
+        data = (self.uint(start, start + nbits) << pad).to_bytes((nbits + pad) // 8, 'big')
+        text = binascii.b2a_base64(data, newline=False).translate(_AIS_TEXT_TABLE)[:nchars]
+        return text.decode('ascii').strip('@').strip()
+
+def _dearmor_payload(payload):
+    """6비트 ASCII 페이로드(str/bytes)를 AisPayloadBits로 변환. 유효하지 않은 문자가 있으면 None."""
+    if isinstance(payload, str):
+        payload = payload.encode('ascii', errors='replace')
+    b64 = payload.translate(_AIS_DEARMOR_TABLE)
+    if b'!' in b64:
+        return None
+    nchars = len(b64)
+    if nchars == 0:
+        return None
+    pad_chars = -nchars % 4
+    data = binascii.a2b_base64(b64 + b"A" * pad_chars)
+    return AisPayloadBits(int.from_bytes(data, 'big') >> (pad_chars * 6), nchars * 6)
+
+class AisStaticData:
+    """Msg 5 정적/항해 데이터 (2단계 디코딩).
+    수신 시에는 역아머링된 비트만 보관하고, 팝업/지도 라벨이 처음 읽을 때 필드를 디코딩하여 기억한다."""
+    __slots__ = ("bits", "_fields")
+
+    def __init__(self, bits):
+        self.bits = bits
+        self._fields = None
+
+    def fields(self):
+        if self._fields is None:
+            try:
+                self._fields = self._decode(self.bits) if self.bits else {}
+            except (ValueError, OverflowError) as e:
+                # 비정상 페이로드라도 GUI(지도 라벨/팝업) 갱신을 멈추지 않도록 빈 값으로 처리
+                print(f"[AIS] Msg 5 디코딩 오류: {e}")
+                self._fields = {}
+        return self._fields
+
+    def get(self, key, default=None):
+        return self.fields().get(key, default)
+
+    @staticmethod
+    def _decode(bits):
+        fields = {
+            # 같은 선명/호출부호/목적지는 타겟 간에 문자열 객체 1개를 공유
+            "call_sign": sys.intern(bits.text(70, 112)),
+            "ship_name": sys.intern(bits.text(112, 232)),
+            "ship_type_str": SHIP_TYPE_MAP.get(bits.uint(232, 240), "Unknown"),
+        }
+        # Dimensions
+        dim_a = bits.uint(240, 249)
+        dim_b = bits.uint(249, 258)
+        dim_c = bits.uint(258, 264)
+        dim_d = bits.uint(264, 270)
+        fields["length"] = dim_a + dim_b
+        fields["beam"] = dim_c + dim_d
+        # ETA
+        eta_mon = bits.uint(270, 274)
+        eta_day = bits.uint(274, 279)
+        eta_hr = bits.uint(279, 284)
+        eta_min = bits.uint(284, 290)
+        if eta_mon > 0 and eta_day > 0 and eta_hr < 24 and eta_min < 60:
+            fields["eta"] = f"{eta_day:02d}-{eta_mon:02d} {eta_hr:02d}:{eta_min:02d} UTC"
+        else:
+            fields["eta"] = "N/A"
+        fields["draught"] = bits.uint(290, 298) / 10.0 # 1/10 m
+        fields["destination"] = sys.intern(bits.text(298, 418))
+        return fields
+
+EMPTY_STATIC_DATA = AisStaticData(None)
+# 메시지 타입별 최소 비트 수. 이보다 짧은 페이로드는 저장소에 행을 만들기 전에 버림
+AIS_MSG_MIN_BITS = {1: 168, 2: 168, 3: 168, 5: 424}
+AIS_MSG_HEADER_BITS = 38 # type + repeat + MMSI
+
+class AivdmReassembler:
+    """AIVDM 다중 fragment 재조립 버퍼.
+    키는 (채널, 순번 ID, fragment 수)이며, 크기 상한(max_entries)과 TTL(ttl_sec)을 넘은
+    미완성 메시지는 버리고 카운터에 기록한다. 3개 이상의 fragment도 지원."""
+    def __init__(self, max_entries=256, ttl_sec=10.0, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self.clock = clock
+        self.entries = OrderedDict() # key -> (수신 시각, [payload, ...]) / 오래된 순서
+        self.completed = 0 # 재조립 완료
+        self.orphaned = 0  # 나머지 fragment가 오지 않아 버려진 메시지 (TTL 만료/순서 깨짐/덮어씀)
+        self.evicted = 0   # 크기 상한 때문에 밀려난 메시지
+        self.dropped = 0   # 앞 fragment 없이 도착하여 버려진 fragment
+
+    def add(self, channel, seq_id, total_parts, part_num, payload):
+        """fragment를 추가하고, 메시지가 완성되면 전체 페이로드를 반환 (아니면 None)"""
+        if total_parts == 1:
+            return payload
+        now = self.clock()
+        self._expire(now)
+        key = (channel, seq_id, total_parts)
+        entry = self.entries.get(key)
+
+        if part_num == 1:
+            if entry is not None:
+                del self.entries[key]
+                self.orphaned += 1
+            self.entries[key] = (now, [payload])
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evicted += 1
+            return None
+
+        if entry is None or len(entry[1]) != part_num - 1:
+            self.dropped += 1
+            if entry is not None:
+                del self.entries[key]
+                self.orphaned += 1
+            return None
+
+        entry[1].append(payload)
+        if part_num < total_parts:
+            return None
+        del self.entries[key]
+        self.completed += 1
+        return "".join(entry[1])
+
+    def _expire(self, now):
+        entries = self.entries
+        deadline = now - self.ttl_sec
+        while entries:
+            first_key = next(iter(entries))
+            if entries[first_key][0] >= deadline:
+                break
+            del entries[first_key]
+            self.orphaned += 1
+
+    def stats(self):
+        return {
+            "pending": len(self.entries), "completed": self.completed, "orphaned": self.orphaned,
+            "evicted": self.evicted, "dropped": self.dropped,
+        }
+
 # --- AIS 디코딩 유틸리티 종료 ---
 
 
-# --- 2. NMEA TCP 서버 스레드 ---
+# --- 공유 데이터 저장소 ---
+AIS_LOST_SEC = 300 # 항해 중 타겟은 이 시간 동안 수신이 없으면 삭제 (보고 주기 2~10초)
+AIS_STOPPED_LOST_SEC = 900 # 정지/정박/계류 타겟은 보고 주기가 3분이므로 5회 누락(15분) 후 삭제
+AIS_STATIONARY_NAV_STATUS = (1, 5) # At anchor, Moored
+AIS_STORE_SHARDS = 16
+
+def ais_expiry_delay(sog, status):
+    """마지막 수신 후 삭제까지의 시간(초). 정지(SOG < 0.1)이거나 항해 상태가 정박/계류이면 AIS_STOPPED_LOST_SEC.
+    Class B(Msg 18/19)는 디코딩하지 않으므로 클래스 구분은 없음"""
+    if sog < 0.1 or status in AIS_STATIONARY_NAV_STATUS: # NaN(SOG 없음)은 False
+        return AIS_STOPPED_LOST_SEC
+    return AIS_LOST_SEC
+
+TRACK_HISTORY_LEN = 360          # 타겟당 항적 점 수
+TRACK_MIN_INTERVAL_SEC = 10.0    # 이보다 짧은 간격의 보고는 항적에 넣지 않음 (360점 = 최근 1시간)
+OWN_SHIP_TRACK_LEN = 3600        # 본선 항적 점 수 (1초 간격 = 최근 1시간)
+OWN_SHIP_TRACK_INTERVAL_SEC = 1.0
+
+class TrackHistory:
+    """행(슬롯)마다 최근 length개의 위치/시각을 담는 고정 크기 링 버퍼 묶음 (행 x length NumPy 배열).
+    추가는 O(1), 메모리는 행 수 x length x 16바이트로 고정. 모든 메서드는 소유자의 잠금 안에서 호출"""
+    def __init__(self, capacity, length=TRACK_HISTORY_LEN, min_interval=TRACK_MIN_INTERVAL_SEC):
+        self.length = length
+        self.min_interval = min_interval
+        self.lat = np.zeros((capacity, length), dtype=np.float32) # float32: 약 1m 해상도로 항적 표시에 충분
+        self.lon = np.zeros((capacity, length), dtype=np.float32)
+        self.time = np.zeros((capacity, length), dtype=np.float64)
+        self.head = np.zeros(capacity, dtype=np.int32)  # 다음에 쓸 칸
+        self.count = np.zeros(capacity, dtype=np.int32) # 저장된 점 수 (최대 length)
+
+    def grow(self, capacity):
+        for name in ("lat", "lon", "time", "head", "count"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def reset(self, row):
+        self.head[row] = 0
+        self.count[row] = 0
+
+    def append(self, row, lat, lon, t):
+        """점 1개 추가 (가장 오래된 점을 덮어씀). 직전 점과 min_interval 미만이면 생략하고 False"""
+        head = int(self.head[row])
+        count = int(self.count[row])
+        if count and t - self.time[row, head - 1] < self.min_interval: # head - 1 = -1이면 마지막 칸
+            return False
+        self.lat[row, head] = lat
+        self.lon[row, head] = lon
+        self.time[row, head] = t
+        self.head[row] = (head + 1) % self.length
+        if count < self.length:
+            self.count[row] = count + 1
+        return True
+
+    def segments(self, row):
+        """오래된 순서의 (lat, lon, time) 뷰 1~2개 (복사 없음, 링이 한 바퀴 돌았으면 2개).
+        뷰는 잠금을 잡은 동안만 유효 -> 잠금 밖에서 쓰려면 copy()"""
+        head = int(self.head[row])
+        start = head - int(self.count[row])
+        if start >= 0:
+            spans = (slice(start, head),)
+        else:
+            spans = (slice(self.length + start, self.length), slice(0, head))
+        return [(self.lat[row, span], self.lon[row, span], self.time[row, span])
+                for span in spans if span.stop > span.start]
+
+    def copy(self, row):
+        """오래된 순서의 (lat, lon, time) 배열 복사본"""
+        segments = self.segments(row)
+        if len(segments) == 1:
+            return tuple(array.copy() for array in segments[0])
+        if not segments:
+            return np.empty(0, np.float32), np.empty(0, np.float32), np.empty(0)
+        return tuple(np.concatenate(arrays) for arrays in zip(*segments))
+
+class OwnShipStore:
+    """본선 센서 raw 값 (숫자/원본 문자열만). AIS 타겟 저장소와는 별도의 잠금으로 보호.
+    표시용 문자열 변환은 GUI 스레드(App.refresh_own_ship_display)에서만 수행.
+    has_fix는 유효한 측위(RMC 상태 'A' + 위도/경도)를 받았을 때만 True. 그 전이나 'V' 수신 후의 lat/lon은
+    초기값 또는 마지막 측위이므로 CPA/TCPA 경고에 쓰지 않는다."""
+    def __init__(self, **initial):
+        self.lock = threading.Lock()
+        self.values = dict(initial)
+        self.version = 0 # 갱신될 때마다 증가 (GUI는 바뀌지 않았으면 변환을 생략)
+        self.track = TrackHistory(1, OWN_SHIP_TRACK_LEN, OWN_SHIP_TRACK_INTERVAL_SEC)
+
+    def update(self, **fields):
+        with self.lock:
+            self.values.update(fields)
+            self.version += 1
+
+    def snapshot(self):
+        with self.lock:
+            return MappingProxyType(dict(self.values))
+
+    def append_track(self, lat, lon, t):
+        with self.lock:
+            self.track.append(0, lat, lon, t)
+
+    def track_copy(self):
+        """본선 항적 (lat, lon, time) 복사본 (오래된 순)"""
+        with self.lock:
+            return self.track.copy(0)
+
+SPATIAL_CELL_DEG = 0.02 # 공간 색인 격자 크기 (위도 기준 약 1.2 NM)
+NO_CELL = -1 << 63      # 격자에 없는 행의 셀 키
+
+class SpatialGrid:
+    """균일 격자 공간 색인. 셀 = SPATIAL_CELL_DEG x SPATIAL_CELL_DEG.
+    셀에는 행 번호만 두고 위치는 소유 샤드의 lat/lon 열에서 읽는다. 타겟이 1척뿐인 셀(먼 바다에서 대부분)은
+    집합 대신 행 번호 정수 하나만 저장하여, 타겟당 추가 메모리는 셀 열 8바이트 + dict 항목 정도로 유지한다.
+    타겟이 움직일 때 update()로 증분 갱신하고, 조회는 겹치는 셀만 확인한다 (잠금은 호출 측 책임)."""
+    __slots__ = ("cell_deg", "span", "columns", "cells", "cell")
+
+    def __init__(self, columns, capacity, cell_deg=SPATIAL_CELL_DEG):
+        self.cell_deg = cell_deg
+        self.span = int(360.0 / cell_deg) + 2 # 셀 키 = 위도 칸 x span + (경도 칸 + span // 2)
+        self.columns = columns # 소유 샤드의 열 dict (용량이 늘면 샤드가 배열을 교체)
+        self.cells = {}        # 셀 키 -> 행 번호 또는 {행 번호, ...}
+        self.cell = np.full(capacity, NO_CELL, dtype=np.int64) # 행 -> 셀 키
+
+    def grow(self, capacity):
+        new = np.full(capacity, NO_CELL, dtype=np.int64)
+        new[:len(self.cell)] = self.cell
+        self.cell = new
+
+    def _cell(self, lat, lon):
+        return math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+
+    def _key(self, lat, lon):
+        row, col = self._cell(lat, lon)
+        return row * self.span + col + self.span // 2
+
+    def _unkey(self, key):
+        row, col = divmod(key, self.span)
+        return row, col - self.span // 2
+
+    def update(self, row, lat, lon):
+        key = self._key(lat, lon)
+        old = int(self.cell[row])
+        if old == key:
+            return
+        if old != NO_CELL:
+            self._discard(row, old)
+        self.cell[row] = key
+        members = self.cells.get(key)
+        if members is None:
+            self.cells[key] = row
+        elif type(members) is set:
+            members.add(row)
+        else:
+            self.cells[key] = {members, row}
+
+    def remove(self, row):
+        old = int(self.cell[row])
+        if old != NO_CELL:
+            self._discard(row, old)
+            self.cell[row] = NO_CELL
+
+    def _discard(self, row, key):
+        members = self.cells[key]
+        if type(members) is not set:
+            del self.cells[key]
+            return
+        members.discard(row)
+        if len(members) == 1:
+            self.cells[key] = members.pop()
+
+    def bbox(self, south, west, north, east):
+        """경계 상자 안의 [(mmsi, lat, lon), ...].
+        west > east이면 날짜변경선(±180°)을 넘는 상자로 보고 [west, 180] + [-180, east] 두 구간으로 나누어 찾는다."""
+        if west > east:
+            return self.bbox(south, west, north, 180.0) + self.bbox(south, -180.0, north, east)
+        row_min, col_min = self._cell(south, west)
+        row_max, col_max = self._cell(north, east)
+        cells = self.cells
+        if (row_max - row_min + 1) * (col_max - col_min + 1) > len(cells):
+            # 상자가 사용 중인 셀 수보다 넓으면 셀 목록을 직접 훑음
+            candidates = []
+            for key, members in cells.items():
+                row, col = self._unkey(key)
+                if row_min <= row <= row_max and col_min <= col <= col_max:
+                    candidates.append(members)
+        else:
+            span, half = self.span, self.span // 2
+            keys = (row * span + col + half for row in range(row_min, row_max + 1)
+                    for col in range(col_min, col_max + 1))
+            candidates = [cells[key] for key in keys if key in cells]
+        if not candidates:
+            return []
+        rows = []
+        for members in candidates:
+            if type(members) is set:
+                rows.extend(members)
+            else:
+                rows.append(members)
+        rows = np.array(rows, dtype=np.intp)
+        lat = self.columns["lat"][rows]
+        lon = self.columns["lon"][rows]
+        inside = (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+        return list(zip(self.columns["mmsi"][rows[inside]].tolist(), lat[inside].tolist(), lon[inside].tolist()))
+
+    def radius(self, lat, lon, radius_nm):
+        """(lat, lon)에서 radius_nm 이내의 [(거리 NM, mmsi, lat, lon), ...]"""
+        dlat = radius_nm / 60.0
+        dlon = radius_nm / (60.0 * max(math.cos(deg_to_rad(lat)), 0.01))
+        if dlon >= 180.0:
+            west, east = -180.0, 180.0
+        else:
+            # ±180°를 넘는 경도는 반대편으로 감음 (west > east가 되면 bbox가 두 구간으로 나눔)
+            west = (lon - dlon + 180.0) % 360.0 - 180.0
+            east = (lon + dlon + 180.0) % 360.0 - 180.0
+        found = []
+        for mmsi, tgt_lat, tgt_lon in self.bbox(lat - dlat, west, lat + dlat, east):
+            dist = calculate_distance((lat, lon), (tgt_lat, tgt_lon))
+            if dist <= radius_nm:
+                found.append((dist, mmsi, tgt_lat, tgt_lon))
+        return found
+
+# AIS 타겟 열(column) 정의: (이름, dtype, 빈 값). 없는 값(SOG/COG/HDG 미제공)은 NaN
+AIS_TARGET_COLUMNS = (
+    ("mmsi", np.uint32, 0),
+    ("lat", np.float64, np.nan), ("lon", np.float64, np.nan),
+    ("sog", np.float64, np.nan), ("cog", np.float64, np.nan), ("hdg", np.float64, np.nan),
+    ("status", np.uint8, 15), ("timestamp", np.float64, 0.0),
+    ("has_pos", np.bool_, False), # Msg 1/2/3을 한 번이라도 수신
+    ("static", object, None),     # AisStaticData (Msg 5)
+)
+AIS_TARGET_COLUMN_NAMES = tuple(name for name, _, _ in AIS_TARGET_COLUMNS)
+
+def _target_record(columns, row):
+    """열 배열의 한 행 -> 기존 target_data 형식의 dict (팝업 등 단일 타겟 표시용)"""
+    record = {"mmsi": int(columns["mmsi"][row]), "timestamp": float(columns["timestamp"][row])}
+    static = columns["static"][row]
+    if static is not None:
+        record["static"] = static
+    if columns["has_pos"][row]:
+        sog, cog, hdg = (float(columns[name][row]) for name in ("sog", "cog", "hdg"))
+        record["lat"] = float(columns["lat"][row])
+        record["lon"] = float(columns["lon"][row])
+        record["sog"] = None if math.isnan(sog) else sog
+        record["cog"] = None if math.isnan(cog) else cog
+        record["hdg"] = None if math.isnan(hdg) else int(hdg)
+        record["nav_status_str"] = NAV_STATUS_MAP.get(int(columns["status"][row]), "Not defined")
+        record["is_stopped"] = record["sog"] is not None and record["sog"] < 0.1
+    return record
+
+EXPIRY_ROW_BITS = 32 # 만료 힙 항목의 하위 비트 = 행 번호
+EXPIRY_ROW_MASK = (1 << EXPIRY_ROW_BITS) - 1
+
+class AisTargetShard:
+    """MMSI 샤드 1개의 타겟 테이블. 열마다 NumPy 배열 1개 + mmsi -> 행 번호.
+    삭제된 행은 free 목록으로 재사용하고, 가득 차면 용량을 2배로 늘린다 (모두 self.lock 안에서).
+    만료 예약은 (마감 ms << 32 | 행) 정수 최소 힙에 타겟당 1건만 두고, 꺼낼 때 실제 수신 시각으로 다시 확인한다."""
+    __slots__ = ("lock", "rows", "free", "size", "columns", "grid", "expiry_heap", "deadline", "tracks") + AIS_TARGET_COLUMN_NAMES
+
+    def __init__(self, capacity=64):
+        self.lock = threading.Lock()
+        self.rows = {} # mmsi -> 행 번호
+        self.free = [] # 재사용할 행 번호
+        self.size = 0  # 한 번이라도 사용된 행 수
+        self.expiry_heap = [] # (마감 ms << EXPIRY_ROW_BITS) | 행 번호 최소 힙
+        self.deadline = np.full(capacity, np.nan) # 행 -> 힙에 들어 있는 유효한 마감 ms (NaN = 예약 없음)
+        self.tracks = TrackHistory(capacity) # 행별 항적 링 버퍼
+        self.columns = {}
+        for name, dtype, fill in AIS_TARGET_COLUMNS:
+            self._set_column(name, np.full(capacity, fill, dtype=dtype))
+        self.grid = SpatialGrid(self.columns, capacity) # 이 샤드 타겟들의 위치 색인
+
+    def _set_column(self, name, array):
+        self.columns[name] = array
+        setattr(self, name, array)
+
+    def row_for(self, mmsi):
+        """mmsi의 행 번호 (없으면 새 행 할당). self.lock을 잡은 상태에서 호출"""
+        row = self.rows.get(mmsi)
+        if row is None:
+            if self.free:
+                row = self.free.pop()
+            else:
+                row = self.size
+                if row == len(self.mmsi):
+                    self._grow()
+                self.size += 1
+            for name, _, fill in AIS_TARGET_COLUMNS:
+                self.columns[name][row] = fill
+            self.tracks.reset(row)
+            self.deadline[row] = np.nan
+            self.mmsi[row] = mmsi
+            self.rows[mmsi] = row
+        return row
+
+    def stamp(self, row, now):
+        """행의 수신 시각 기록. 만료 예약이 없거나 새 마감이 더 이른 타겟(정박 -> 항해)만 힙에 넣음
+        (늦어진 마감은 꺼낼 때 다시 계산)"""
+        self.timestamp[row] = now
+        deadline = now + ais_expiry_delay(self.sog[row], self.status[row])
+        if not math.ceil(deadline * 1000.0) >= self.deadline[row]: # NaN(예약 없음)도 True
+            self._schedule(row, deadline)
+
+    def _schedule(self, row, deadline):
+        deadline_ms = math.ceil(deadline * 1000.0)
+        self.deadline[row] = deadline_ms
+        heapq.heappush(self.expiry_heap, (deadline_ms << EXPIRY_ROW_BITS) | row)
+
+    def expired_rows(self, now):
+        """마감이 지난 타겟의 행 번호 목록. 그 사이 다시 수신된 타겟은 새 마감으로 재예약"""
+        heap = self.expiry_heap
+        expired = []
+        now_ms = now * 1000.0
+        while heap and heap[0] >> EXPIRY_ROW_BITS < now_ms:
+            entry = heapq.heappop(heap)
+            row = entry & EXPIRY_ROW_MASK
+            if self.deadline[row] != entry >> EXPIRY_ROW_BITS:
+                continue # 삭제되었거나 재예약된 행의 지난 항목
+            actual = self.timestamp[row] + ais_expiry_delay(self.sog[row], self.status[row])
+            if actual < now:
+                expired.append(row)
+            else:
+                self._schedule(row, actual)
+        return expired
+
+    def _grow(self):
+        for name, dtype, fill in AIS_TARGET_COLUMNS:
+            old = self.columns[name]
+            new = np.full(len(old) * 2, fill, dtype=dtype)
+            new[:len(old)] = old
+            self._set_column(name, new)
+        capacity = len(self.mmsi)
+        deadline = np.full(capacity, np.nan)
+        deadline[:len(self.deadline)] = self.deadline
+        self.deadline = deadline
+        self.grid.grow(capacity)
+        self.tracks.grow(capacity)
+
+    def remove_rows(self, rows):
+        for row in rows:
+            mmsi = int(self.mmsi[row])
+            del self.rows[mmsi]
+            self.deadline[row] = np.nan
+            self.grid.remove(row)
+            self.static[row] = None
+            self.free.append(int(row))
+
+    def occupied(self):
+        """사용 중인 행 번호 배열"""
+        return np.fromiter(self.rows.values(), dtype=np.intp, count=len(self.rows))
+
+class AisTargetStore:
+    """MMSI로 샤딩된 열(column) 기반 AIS 타겟 테이블.
+    샤드마다 잠금이 따로 있어, 서로 다른 타겟을 갱신하는 수신 스레드끼리는 기다리지 않음."""
+    def __init__(self, shard_count=AIS_STORE_SHARDS):
+        self.shard_count = shard_count
+        self.shards = [AisTargetShard() for _ in range(shard_count)]
+
+    def shard(self, mmsi):
+        """mmsi가 속한 AisTargetShard. 호출 측에서 shard.lock을 잡고 수정"""
+        return self.shards[mmsi % self.shard_count]
+
+    def __len__(self):
+        return sum(len(shard.rows) for shard in self.shards)
+
+    def get(self, mmsi):
+        shard = self.shard(mmsi)
+        with shard.lock:
+            row = shard.rows.get(mmsi)
+            return _target_record(shard.columns, row) if row is not None else None
+
+    def remove(self, mmsi):
+        shard = self.shard(mmsi)
+        with shard.lock:
+            row = shard.rows.get(mmsi)
+            if row is not None:
+                shard.remove_rows([row])
+
+    def clear(self):
+        for shard in self.shards:
+            with shard.lock:
+                shard.remove_rows(shard.occupied())
+                shard.expiry_heap.clear()
+
+    def remove_expired(self, now):
+        """신호 유실(AIS_LOST_SEC) / 정지·정박·계류 후 오래된(AIS_STOPPED_LOST_SEC) 타겟을 삭제하고 삭제 수를 반환.
+        샤드별 만료 힙에서 마감이 지난 항목만 꺼내므로, 비용은 전체 타겟 수가 아니라 만료 후보 수에 비례"""
+        removed = 0
+        for shard in self.shards:
+            with shard.lock:
+                rows = shard.expired_rows(now)
+                shard.remove_rows(rows)
+                removed += len(rows)
+        return removed
+
+    def bbox(self, south, west, north, east):
+        """경계 상자 안 타겟의 [(mmsi, lat, lon), ...] (공간 색인 사용). west > east는 날짜변경선을 넘는 상자"""
+        found = []
+        for shard in self.shards:
+            with shard.lock:
+                found.extend(shard.grid.bbox(south, west, north, east))
+        return found
+
+    def radius(self, lat, lon, radius_nm):
+        """(lat, lon)에서 radius_nm 이내 타겟의 [(거리 NM, mmsi, lat, lon), ...] (가까운 순)"""
+        found = []
+        for shard in self.shards:
+            with shard.lock:
+                found.extend(shard.grid.radius(lat, lon, radius_nm))
+        found.sort()
+        return found
+
+    def track(self, mmsi):
+        """타겟 항적 (lat, lon, time) 복사본 (오래된 순). 타겟이 없으면 None"""
+        shard = self.shard(mmsi)
+        with shard.lock:
+            row = shard.rows.get(mmsi)
+            return shard.tracks.copy(row) if row is not None else None
+
+    def nearest(self, lat, lon, max_nm):
+        """max_nm 이내에서 가장 가까운 타겟의 (거리 NM, mmsi) 또는 None.
+        격자 1칸 반경부터 찾기 시작하여 못 찾으면 반경을 2배씩 넓힌다."""
+        search_nm = min(SPATIAL_CELL_DEG * 60.0, max_nm)
+        while True:
+            found = self.radius(lat, lon, search_nm)
+            if found:
+                return found[0][0], found[0][1]
+            if search_nm >= max_nm:
+                return None
+            search_nm = min(search_nm * 2, max_nm)
+
+    def snapshot(self):
+        """모든 타겟 열의 복사본 (AisTargetColumns). 샤드 잠금은 복사하는 동안만 잡음"""
+        parts = []
+        for shard in self.shards:
+            with shard.lock:
+                rows = shard.occupied()
+                parts.append([shard.columns[name][rows] for name in AIS_TARGET_COLUMN_NAMES])
+        return AisTargetColumns({
+            name: np.concatenate([part[i] for part in parts]) for i, name in enumerate(AIS_TARGET_COLUMN_NAMES)
+        })
+
+class AisTargetColumns:
+    """읽기 전용 타겟 열 스냅샷. 전체 선단 계산은 배열 연산으로, 단일 타겟은 get()으로 조회"""
+    __slots__ = ("columns",) + AIS_TARGET_COLUMN_NAMES
+
+    def __init__(self, columns):
+        self.columns = columns
+        for name, array in columns.items():
+            array.flags.writeable = False
+            setattr(self, name, array)
+
+    def __len__(self):
+        return len(self.mmsi)
+
+    def __contains__(self, mmsi):
+        return bool((self.mmsi == mmsi).any())
+
+    def get(self, mmsi):
+        rows = np.flatnonzero(self.mmsi == mmsi)
+        return _target_record(self.columns, rows[0]) if len(rows) else None
+
+    def positions(self):
+        """위치가 있는 타겟의 (mmsi, lat, lon, AisStaticData 또는 None) 목록"""
+        rows = np.flatnonzero(self.has_pos)
+        return list(zip(self.mmsi[rows].tolist(), self.lat[rows].tolist(),
+                        self.lon[rows].tolist(), self.static[rows].tolist()))
+
+class DisplaySnapshot:
+    """GUI가 읽는 불변 스냅샷. 갱신 주기마다 새로 만들어 App.snapshot을 통째로 교체한다."""
+    __slots__ = ("time", "own_ship", "targets")
+    def __init__(self, time, own_ship, targets):
+        self.time = time
+        self.own_ship = own_ship # 읽기 전용 OwnShipStore 값 {"lat", "lon", "sog", "cog", "hdg", ...}
+        self.targets = targets   # AisTargetColumns
+
+    @classmethod
+    def build(cls, own_ship_store, ais_target_store):
+        return cls(time.time(), own_ship_store.snapshot(), ais_target_store.snapshot())
+# --- 공유 데이터 저장소 종료 ---
+
+
+# --- 충돌 위험 (CPA/TCPA) 계산 ---
+EARTH_RADIUS_NM = 3440.065 # calculate_distance와 같은 값
+CPA_LIMIT_NM = 1.0    # CPA가 이 거리 이하이고
+TCPA_LIMIT_MIN = 12.0 # TCPA가 이 시간 이내이면 위험 타겟
+
+def cpa_broad_phase(os_data, lat, lon, sog, cpa_limit_nm, tcpa_limit_min):
+    """정밀 CPA/TCPA 계산이 필요한 타겟 마스크 (가벼운 선별 단계).
+    TCPA 한계 시간 안에 두 배가 가까워질 수 있는 최대 거리는 (본선 SOG + 타겟 SOG) x 시간이므로,
+    현재 거리에서 이를 빼도 CPA 한계보다 멀면 위험 타겟이 될 수 없어 제외한다.
+    현재 거리는 fleet_cpa_tcpa와 같은 대권(haversine) 거리. 정밀 단계의 상대 위치 벡터 길이가 바로 이 값이라
+    평면 근사(경도 축척을 한쪽 위도로만 잡으면 고위도 쪽에서 거리를 크게 잡음)와 달리 하한이 항상 맞다.
+    SOG가 없는 타겟은 정밀 계산에서도 CPA를 구할 수 없으므로 제외."""
+    lat1 = deg_to_rad(os_data["lat"])
+    lat2 = np.radians(lat)
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * np.cos(lat2) * np.sin((np.radians(lon) - deg_to_rad(os_data["lon"])) / 2) ** 2)
+    range_nm = EARTH_RADIUS_NM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    max_closing_nm = (os_data["sog"] + sog) * (tcpa_limit_min / 60.0)
+    return range_nm - max_closing_nm <= cpa_limit_nm # NaN(SOG 없음)은 False
+
+def fleet_cpa_tcpa(os_data, lat, lon, sog, cog):
+    """본선 대비 타겟 배열 전체의 (RNG NM, CPA NM, TCPA 분)을 한 번에 계산.
+    AisPopup.calculate_cpa_tcpa와 같은 식 (대권 거리/방위 -> 평면 상대 벡터).
+    SOG/COG가 없거나 상대 속도가 0.1kn 미만인 타겟은 CPA/TCPA가 NaN"""
+    lat1 = deg_to_rad(os_data["lat"])
+    lon1 = deg_to_rad(os_data["lon"])
+    lat2 = np.radians(lat)
+    d_lat = lat2 - lat1
+    d_lon = np.radians(lon) - lon1
+    cos_lat2 = np.cos(lat2)
+
+    # 1. 거리(calculate_distance)와 방위(calculate_bearing)
+    a = np.sin(d_lat / 2) ** 2 + math.cos(lat1) * cos_lat2 * np.sin(d_lon / 2) ** 2
+    rng_nm = EARTH_RADIUS_NM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    brg_rad = np.arctan2(np.sin(d_lon) * cos_lat2,
+                         math.cos(lat1) * np.sin(lat2) - math.sin(lat1) * cos_lat2 * np.cos(d_lon))
+    p_rel_x = rng_nm * np.sin(brg_rad)
+    p_rel_y = rng_nm * np.cos(brg_rad)
+
+    # 2. 상대 속도 벡터
+    os_cog = deg_to_rad(os_data["cog"])
+    cog_rad = np.radians(cog)
+    v_rel_x = sog * np.sin(cog_rad) - os_data["sog"] * math.sin(os_cog)
+    v_rel_y = sog * np.cos(cog_rad) - os_data["sog"] * math.cos(os_cog)
+    v_rel_sq = v_rel_x ** 2 + v_rel_y ** 2
+
+    # 3. CPA/TCPA (이미 CPA를 지났으면 TCPA 0, CPA = 현재 거리)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t_cpa_hours = np.where(v_rel_sq >= 0.01, -(v_rel_x * p_rel_x + v_rel_y * p_rel_y) / v_rel_sq, np.nan)
+    passed = t_cpa_hours < 0
+    t_cpa_hours = np.where(passed, 0.0, t_cpa_hours)
+    cpa_nm = np.where(passed, rng_nm, np.hypot(p_rel_x + v_rel_x * t_cpa_hours, p_rel_y + v_rel_y * t_cpa_hours))
+    return rng_nm, cpa_nm, t_cpa_hours * 60.0
+
+class CpaTcpaEngine:
+    """스냅샷마다 전체 타겟의 CPA/TCPA를 배열 연산 1회로 계산하고, 위험 타겟 목록(TCPA 순)을 유지.
+    broad_phase가 켜져 있으면 cpa_broad_phase를 통과한 후보만 정밀 계산한다 (결과 배열도 후보만 포함).
+    GUI 스레드에서 update()를 호출하며, 결과 배열은 다음 update()까지 읽기 전용으로 사용"""
+    def __init__(self, cpa_limit_nm=CPA_LIMIT_NM, tcpa_limit_min=TCPA_LIMIT_MIN, broad_phase=True):
+        self.cpa_limit_nm = cpa_limit_nm
+        self.tcpa_limit_min = tcpa_limit_min
+        self.broad_phase = broad_phase
+        self.stats = {"targets": 0, "candidates": 0, "pruned_ratio": 0.0, "elapsed_ms": 0.0}
+        self.mmsi = np.empty(0, dtype=np.uint32)
+        self.rng = self.cpa = self.tcpa = np.empty(0)
+        self.dangerous = []   # [(TCPA 분, CPA NM, mmsi), ...] TCPA가 짧은 순
+        self.new_alarms = []  # 이번 update()에서 새로 위험 목록에 들어온 mmsi
+
+    def update(self, snapshot):
+        """스냅샷으로 다시 계산하고 위험 타겟 목록을 반환. 본선 측위가 유효하지 않으면(has_fix 아님) 빈 목록"""
+        start = time.perf_counter()
+        targets = snapshot.targets
+        rows = np.flatnonzero(targets.has_pos)
+        if not snapshot.own_ship.get("has_fix"):
+            rows = rows[:0] # 초기 위치(가상 값)나 측위를 잃은 뒤의 옛 위치 기준으로는 경고하지 않음
+        total = len(rows)
+        if self.broad_phase:
+            rows = rows[cpa_broad_phase(snapshot.own_ship, targets.lat[rows], targets.lon[rows], targets.sog[rows],
+                                        self.cpa_limit_nm, self.tcpa_limit_min)]
+        self.mmsi = targets.mmsi[rows]
+        self.rng, self.cpa, self.tcpa = fleet_cpa_tcpa(
+            snapshot.own_ship, targets.lat[rows], targets.lon[rows], targets.sog[rows], targets.cog[rows])
+
+        danger = np.flatnonzero((self.cpa <= self.cpa_limit_nm) & (self.tcpa <= self.tcpa_limit_min)) # NaN은 False
+        order = danger[np.lexsort((self.cpa[danger], self.tcpa[danger]))]
+        previous = {mmsi for _, _, mmsi in self.dangerous}
+        self.dangerous = list(zip(self.tcpa[order].tolist(), self.cpa[order].tolist(), self.mmsi[order].tolist()))
+        self.new_alarms = [mmsi for _, _, mmsi in self.dangerous if mmsi not in previous]
+        self.stats = {
+            "targets": total, "candidates": len(rows),
+            "pruned_ratio": 1.0 - len(rows) / total if total else 0.0,
+            "elapsed_ms": (time.perf_counter() - start) * 1000.0,
+        }
+        return self.dangerous
 
-class ClientHandler(threading.Thread):
-    """개별 클라이언트 연결을 처리하는 스레드 (다중 AIS 수신)"""
-    def __init__(self, client_socket, client_address, server_name, app_state):
-        super().__init__(daemon=True)
-        self.client_conn = client_socket
+    def get(self, mmsi):
+        """마지막 update() 기준 타겟의 (CPA NM, TCPA 분). 계산할 수 없으면 NaN, 선별 단계에서 제외되었거나 없으면 None"""
+        index = np.flatnonzero(self.mmsi == mmsi)
+        if not len(index):
+            return None
+        return float(self.cpa[index[0]]), float(self.tcpa[index[0]])
+# --- 충돌 위험 (CPA/TCPA) 계산 종료 ---
+
+
+# --- 2. NMEA TCP 서버 스레드 ---
+DEFAULT_RECV_SIZE = 65536 # 수신 버퍼 크기: 스레드 모드는 연결당, asyncio 모드는 이벤트 루프당 1개 (app_state["recv_size"]로 변경 가능)
+UDPBC_HEADER = b"UdPbC\x00" # IEC 61162-450 데이터그램 헤더
+_NMEA_START_BYTES = (ord('$'), ord('!'))
+
+class NmeaSession:
+    """연결 1개의 수신 버퍼, AIVDM 재조립 상태와 문장 파서 (스레드/asyncio 수신에서 공용)
+    recv_buffer를 주면 새로 할당하지 않고 그 버퍼를 사용합니다 (asyncio: 이벤트 루프당 1개를 공유)."""
+    def __init__(self, client_address, server_name, app_state, recv_size=None, recv_buffer=None):
         self.client_address = client_address
         self.server_name = server_name # "T1", "T2"
         self.app_state = app_state
-        self.running = True
-        self.aivdm_cache = {}
+        self.own_ship = app_state["own_ship"]
+        self.ais_targets = app_state["ais_targets"]
+        self.aivdm_reassembler = AivdmReassembler()
+        if recv_buffer is None:
+            recv_size = app_state.get("recv_size", DEFAULT_RECV_SIZE) if recv_size is None else recv_size
+            recv_buffer = bytearray(recv_size)
+        self.recv_size = len(recv_buffer)
+        self.recv_buffer = recv_buffer
+        self.recv_view = memoryview(self.recv_buffer)
+        self.recv_end = 0 # recv_buffer[0:recv_end]가 아직 처리되지 않은 수신 데이터
         
-        self.sentence_parsers = {
-            "RMC": self.parse_rmc, "HDT": self.parse_hdt, "ROT": self.parse_rot,
-            "DPT": self.parse_dpt, "DBT": self.parse_dbt, "VDM": self.parse_aivdm,
-        }
         print(f"[{self.server_name}] 새 클라이언트 연결됨: {self.client_address}")
 
-    def stop(self):
-        self.running = False
-        if self.client_conn:
-            try: self.client_conn.close()
-            except: pass
-            
-    def run(self):
-        """클라이언트로부터 NMEA 데이터를 수신하고 파싱합니다."""
-        buffer = ""
-        while self.running:
-            try:
-                data = self.client_conn.recv(1024)
-                if not data:
-                    print(f"[{self.server_name}] 클라이언트 {self.client_address} 연결 끊김.")
-                    break
-                    
-                buffer += data.decode('ascii', errors='ignore')
-                
-                while '\r\n' in buffer:
-                    sentence, buffer = buffer.split('\r\n', 1)
-                    if sentence.startswith(('$', '!')):
-                        self.parse_nmea_sentence(sentence)
-                        
-            except (ConnectionResetError, BrokenPipeError):
-                print(f"[{self.server_name}] 클라이언트 {self.client_address} 연결 강제 종료됨.")
-                break
-            except Exception as e:
-                if self.running:
-                    print(f"[{self.server_name}] 클라이언트 {self.client_address} 소켓 오류: {e}")
-                break
+    def feed_received(self, received):
+        """recv_view[recv_end:]에 새로 받은 received 바이트를 처리합니다.
+        마지막 CRLF까지를 bytes 상태로 한 번에 잘라 파싱하고, 남은 미완성 문장은 버퍼 앞으로 이동합니다."""
+        buffer = self.recv_buffer
+        view = self.recv_view
+        end = self.recv_end + received
         
-        # 스레드 종료
-        self.stop()
-        print(f"[{self.server_name}] 핸들러 {self.client_address} 종료.")
-        if self in self.app_state["active_clients"]:
-            try:
-                self.app_state["active_clients"].remove(self)
-            except ValueError:
-                pass 
+        last = buffer.rfind(b'\r\n', 0, end)
+        if last < 0:
+            # 버퍼 전체에 CRLF가 없음 (쓰레기 데이터) -> 버림
+            self.recv_end = 0 if end == len(buffer) else end
+            return
+        
+        self.dispatch_sentences(bytes(view[:last]).split(b'\r\n'))
+        
+        consumed = last + 2
+        view[:end - consumed] = view[consumed:end]
+        self.recv_end = end - consumed
+
+    def feed_datagram(self, data):
+        """UDP 데이터그램 1개(bytes)를 처리합니다. IEC 61162-450 'UdPbC' 헤더가 있으면 제거합니다."""
+        if data.startswith(UDPBC_HEADER):
+            data = data[len(UDPBC_HEADER):]
+        self.dispatch_sentences(data.split(b'\r\n'))
+
+    def dispatch_sentences(self, sentences):
+        """CRLF가 제거된 문장 목록을 라우팅 테이블에 따라 파서로 보냅니다.
+        앞에 붙은 TAG 블록('\\s:...*hh\\')은 떼어내고, 이 포트로 라우팅되지 않은 문장은 체크섬/분할 전에 버립니다."""
+        recorder = self.app_state.get("recorder")
+        if recorder is not None:
+            recorder.record(self.server_name, sentences) # 큐에 넣기만 함 (디스크 쓰기는 녹화 스레드)
+        routes = self.app_state["routing_table"].get(self.server_name, _NO_ROUTES)
+        for sentence in sentences:
+            if sentence[:1] == b'\\':
+                tag_end = sentence.find(b'\\', 1)
+                if tag_end < 0:
+                    continue
+                sentence = sentence[tag_end + 1:]
+            parsers = routes.get(sentence[3:6])
+            if parsers and sentence[0] in _NMEA_START_BYTES:
+                self.parse_nmea_sentence(sentence, parsers)
 
     # --- 파서 헬퍼 함수 ---
-    def parse_rmc(self, parts, data_store, lock):
+    def parse_rmc(self, parts):
         try:
-            if parts[2] != 'A': 
-                data_store["GPS_Status"].set("V (Void)")
+            if parts[2] != 'A' or not parts[3] or not parts[5]:
+                self.own_ship.update(gps_status="V", has_fix=False)
                 return
-            data_store["GPS_Status"].set("A (Active)")
             utc_str = parts[1].split(".")[0]
-            if len(utc_str) == 6:
-                data_store["UTC"].set(f"{utc_str[0:2]}:{utc_str[2:4]}:{utc_str[4:6]} UTC")
             lat_val = safe_float(parts[3])
             lat_deg = int(lat_val / 100)
             lat_min = lat_val - (lat_deg * 100)
@@ -196,191 +971,199 @@ class ClientHandler(threading.Thread):
             if parts[6] == 'W': lon = -lon
             sog = safe_float(parts[7])
             cog = safe_float(parts[8])
-            with lock:
-                data_store["Lat"].set(f"{lat:.5f}° {parts[4]}")
-                data_store["Lon"].set(f"{lon:.5f}° {parts[6]}")
-                data_store["SOG"].set(f"{sog:.1f} kn")
-                data_store["COG"].set(f"{cog:.1f}°")
-                data_store["SPD"].set(f"{sog:.1f} kn")
-                data_store["_raw_lat"] = lat
-                data_store["_raw_lon"] = lon
-                # [신규] CPA/TCPA 계산을 위해 본선 벡터 저장
-                data_store["_os_vector"] = (lat, lon, sog, cog)
+            # CPA/TCPA 계산에도 이 raw 값을 그대로 사용
+            self.own_ship.update(
+                gps_status="A", has_fix=True, utc=utc_str if len(utc_str) == 6 else None,
+                lat=lat, lat_hemi=parts[4], lon=lon, lon_hemi=parts[6], sog=sog, cog=cog
+            )
+            self.own_ship.append_track(lat, lon, time.time())
         except Exception as e:
             print(f"[{self.server_name}] RMC 파싱 오류: {e}")
 
-    def parse_hdt(self, parts, data_store, lock):
+    def parse_hdt(self, parts):
         try:
-            hdg = safe_float(parts[1])
-            with lock:
-                data_store["HDG"].set(f"{hdg:.1f}°")
+            self.own_ship.update(hdg=safe_float(parts[1]))
         except Exception as e:
             print(f"[{self.server_name}] HDT 파싱 오류: {e}")
 
-    def parse_rot(self, parts, data_store, lock):
+    def parse_rot(self, parts):
         try:
-            rot = safe_float(parts[1]) # deg/min
-            with lock:
-                data_store["ROT"].set(f"{rot:.1f} °/m")
+            self.own_ship.update(rot=safe_float(parts[1])) # deg/min
         except Exception as e:
             print(f"[{self.server_name}] ROT 파싱 오류: {e}")
 
-    def parse_dpt(self, parts, data_store, lock):
+    def parse_dpt(self, parts):
         try:
-            depth = safe_float(parts[1])
-            with lock:
-                data_store["DPTH"].set(f"{depth:.1f} m")
+            self.own_ship.update(depth=safe_float(parts[1]))
         except Exception as e:
             print(f"[{self.server_name}] DPT 파싱 오류: {e}")
 
-    def parse_dbt(self, parts, data_store, lock):
+    def parse_dbt(self, parts):
         try:
-            depth_m = safe_float(parts[3])
-            with lock:
-                data_store["DPTH(SNDR)"].set(f"{depth_m:.1f} m")
+            self.own_ship.update(depth_sndr=safe_float(parts[3]))
         except Exception as e:
             print(f"[{self.server_name}] DBT 파싱 오류: {e}")
 
-    def parse_aivdm(self, parts, data_store, lock):
+    def parse_aivdm(self, parts):
         """!AIVDM 문장을 파싱합니다 (다중 패킷 지원)."""
         try:
             total_parts = int(parts[1])
             part_num = int(parts[2])
-            msg_id = parts[3] 
-            payload = parts[5]
-            if total_parts == 1:
-                self.aivdm_cache.pop(msg_id, None) 
-                bin_payload = _payload_to_bin(payload)
-                if bin_payload:
-                    self._parse_aivdm_payload(bin_payload, data_store, lock)
+            full_payload = self.aivdm_reassembler.add(parts[4], parts[3], total_parts, part_num, parts[5])
+            if full_payload is None:
                 return
-            if part_num == 1:
-                self.aivdm_cache[msg_id] = payload
-                return
-            if part_num == total_parts:
-                if msg_id in self.aivdm_cache:
-                    full_payload = self.aivdm_cache[msg_id] + payload
-                    bin_payload = _payload_to_bin(full_payload)
-                    if bin_payload:
-                        self._parse_aivdm_payload(bin_payload, data_store, lock)
-                    del self.aivdm_cache[msg_id] 
-                else:
-                    print(f"[{self.server_name}] AIVDM 오류: {msg_id}의 Part 1이 캐시에 없습니다.")
+            bits = _dearmor_payload(full_payload)
+            if bits:
+                self._parse_aivdm_payload(bits)
         except Exception as e:
             print(f"[{self.server_name}] AIVDM 파싱 오류: {e}")
 
-    def _parse_aivdm_payload(self, bin_payload, data_store, lock):
-        """이진 페이로드를 메시지 타입에 따라 분배"""
+    def _parse_aivdm_payload(self, bits):
+        """역아머링된 페이로드를 메시지 타입에 따라 분배"""
         try:
-            msg_type = int(bin_payload[0:6], 2)
-            mmsi = int(bin_payload[8:38], 2)
+            if bits.nbits < AIS_MSG_HEADER_BITS:
+                return
+            msg_type = bits.uint(0, 6)
+            if bits.nbits < AIS_MSG_MIN_BITS.get(msg_type, 0):
+                return
+            mmsi = bits.uint(8, 38)
+            shard = self.ais_targets.shard(mmsi)
+            # 필드 디코딩은 잠금 밖에서 끝내고, 잠금 안에서는 열/색인/항적에 기록만 함
+            dynamic = self._decode_aivdm_msg_1_2_3(bits) if msg_type in (1, 2, 3) else None
+            now = time.time()
             
-            with lock: 
-                target_data = data_store["AIS_Targets"].setdefault(mmsi, {"mmsi": mmsi})
-                
-                if msg_type in (1, 2, 3):
-                    self._parse_aivdm_msg_1_2_3(bin_payload, target_data)
-                elif msg_type == 5:
-                    self._parse_aivdm_msg_5(bin_payload, target_data)
-                
-                target_data["timestamp"] = time.time() 
+            with shard.lock: 
+                row = shard.row_for(mmsi)
+                try:
+                    if dynamic is not None:
+                        self._store_aivdm_msg_1_2_3(shard, row, dynamic)
+                        shard.tracks.append(row, dynamic[0], dynamic[1], now)
+                    elif msg_type == 5:
+                        self._parse_aivdm_msg_5(bits, shard, row, mmsi)
+                finally:
+                    # 파싱 도중 예외가 나도 만료 힙에 올려 두어야 행이 영구히 남지 않음
+                    shard.stamp(row, now)
                 
         except Exception as e:
             print(f"[{self.server_name}] AIVDM 페이로드 처리 오류: {e}")
 
-    def _parse_aivdm_msg_1_2_3(self, bin_payload, target_data):
-        """동적 데이터 (Msg 1, 2, 3) 파싱"""
-        lon_raw = _signed_int_from_bin(bin_payload[61:89])
-        target_data["lon"] = lon_raw / 600000.0
-        lat_raw = _signed_int_from_bin(bin_payload[89:116])
-        target_data["lat"] = lat_raw / 600000.0
-        sog_raw = int(bin_payload[50:60], 2)
-        target_data["sog"] = sog_raw / 10.0 if sog_raw != 1023 else None
-        cog_raw = int(bin_payload[116:128], 2)
-        target_data["cog"] = cog_raw / 10.0 if cog_raw != 3600 else None
-        hdg_raw = int(bin_payload[128:137], 2)
-        target_data["hdg"] = hdg_raw if hdg_raw != 511 else None
-        nav_status_code = int(bin_payload[38:42], 2)
-        target_data["nav_status_str"] = NAV_STATUS_MAP.get(nav_status_code, "Not defined")
-        target_data["is_stopped"] = (target_data["sog"] is not None and target_data["sog"] < 0.1)
-
-    def _parse_aivdm_msg_5(self, bin_payload, target_data):
-        """[수정] 정적/항해 데이터 (Msg 5) 파싱 (모든 필드)"""
-        target_data["call_sign"] = _bin_to_ais_str(bin_payload[70:112])
-        target_data["ship_name"] = _bin_to_ais_str(bin_payload[112:232])
-        ship_type_code = int(bin_payload[232:240], 2)
-        target_data["ship_type_str"] = SHIP_TYPE_MAP.get(ship_type_code, "Unknown")
-        
-        # [신규] Dimensions
-        dim_a = int(bin_payload[240:249], 2)
-        dim_b = int(bin_payload[249:258], 2)
-        dim_c = int(bin_payload[258:264], 2)
-        dim_d = int(bin_payload[264:270], 2)
-        target_data["length"] = dim_a + dim_b
-        target_data["beam"] = dim_c + dim_d
-        
-        # [신규] ETA
-        eta_mon = int(bin_payload[270:274], 2)
-        eta_day = int(bin_payload[274:279], 2)
-        eta_hr = int(bin_payload[279:284], 2)
-        eta_min = int(bin_payload[284:290], 2)
-        if eta_mon > 0 and eta_day > 0 and eta_hr < 24 and eta_min < 60:
-             target_data["eta"] = f"{eta_day:02d}-{eta_mon:02d} {eta_hr:02d}:{eta_min:02d} UTC"
-        else:
-             target_data["eta"] = "N/A"
-             
-        # [신규] Draught
-        draught_raw = int(bin_payload[290:298], 2)
-        target_data["draught"] = draught_raw / 10.0 # 1/10 m
-        
-        # [신규] Destination
-        target_data["destination"] = _bin_to_ais_str(bin_payload[298:418])
-        
-        print(f"[{self.server_name}] AIS Msg 5 수신: {target_data['ship_name']} (MMSI: {target_data['mmsi']})")
-
-    def parse_nmea_sentence(self, sentence):
-        """수신된 NMEA 문장을 '프로필'에 따라 파싱합니다."""
-        if not validate_checksum(sentence):
+    def _decode_aivdm_msg_1_2_3(self, bits):
+        """동적 데이터 (Msg 1, 2, 3) 디코딩 -> (lat, lon, sog, cog, hdg, status).
+        없는 값(SOG 1023, COG 3600, HDG 511)은 NaN. 저장소를 건드리지 않으므로 샤드 잠금 밖에서 호출"""
+        sog_raw = bits.uint(50, 60)
+        cog_raw = bits.uint(116, 128)
+        hdg_raw = bits.uint(128, 137)
+        return (
+            bits.sint(89, 116) / 600000.0,
+            bits.sint(61, 89) / 600000.0,
+            sog_raw / 10.0 if sog_raw != 1023 else math.nan,
+            cog_raw / 10.0 if cog_raw != 3600 else math.nan,
+            hdg_raw if hdg_raw != 511 else math.nan,
+            bits.uint(38, 42),
+        )
+
+    def _store_aivdm_msg_1_2_3(self, shard, row, dynamic):
+        """디코딩된 동적 데이터를 샤드 열과 공간 색인에 기록 (shard.lock 안에서 호출)"""
+        lat, lon, shard.sog[row], shard.cog[row], shard.hdg[row], shard.status[row] = dynamic
+        shard.lat[row] = lat
+        shard.lon[row] = lon
+        shard.grid.update(row, lat, lon)
+        shard.has_pos[row] = True
+
+    def _parse_aivdm_msg_5(self, bits, shard, row, mmsi):
+        """정적/항해 데이터 (Msg 5): 1단계에서는 비트만 보관 (필드는 AisStaticData가 지연 디코딩)"""
+        # Msg 5는 주기적으로 같은 내용이 반복되므로, 내용이 같으면 기존 객체(디코딩 결과)를 유지
+        static = shard.static[row]
+        if static is None or (static.bits.value, static.bits.nbits) != (bits.value, bits.nbits):
+            shard.static[row] = AisStaticData(bits)
+            print(f"[{self.server_name}] AIS Msg 5 수신 (MMSI: {mmsi})")
+
+    def parse_nmea_sentence(self, sentence, parsers):
+        """수신된 NMEA 문장(bytes, CRLF 제외)을 라우팅 테이블에서 찾은 파서들로 파싱합니다."""
+        star = validate_checksum_bytes(sentence)
+        if star < 0:
             return
         try:
-            sentence_body = sentence.split('*')[0][1:]
-            parts = sentence_body.split(',')
-            talker_id = parts[0][2:] 
-            
-            parser_func = self.sentence_parsers.get(talker_id)
-            if not parser_func:
-                return 
-            
-            profile = self.app_state["profile_config"]
-            data_store = self.app_state["data_store"]
-            lock = self.app_state["lock"]
-            
-            if talker_id in ("RMC", "GGA") and profile["EPFS1"] == self.server_name:
-                parser_func(parts, data_store, lock)
-            elif talker_id == "HDT" and profile["Heading"] == self.server_name:
-                parser_func(parts, data_store, lock)
-            elif talker_id == "ROT" and profile["ROT"] == self.server_name:
-                parser_func(parts, data_store, lock)
-            elif talker_id in ("DPT", "DBT") and profile["Sounder"] == self.server_name:
-                parser_func(parts, data_store, lock)
-            elif talker_id == "VDM":
-                if profile["AIS 1"] == self.server_name:
-                    parser_func(parts, data_store, lock)
-                if profile["AIS 2"] == self.server_name:
-                    parser_func(parts, data_store, lock)
-            
+            parts = sentence[1:star].decode('ascii').split(',')
+            for parser_func in parsers:
+                parser_func(self, parts)
         except Exception as e:
             print(f"[{self.server_name}] 파싱 중 오류: {e} (문장: {sentence})")
 
+class ClientHandler(threading.Thread, NmeaSession):
+    """개별 TCP 클라이언트 연결을 처리하는 스레드 (다중 AIS 수신)"""
+    def __init__(self, client_socket, client_address, server_name, app_state):
+        threading.Thread.__init__(self, daemon=True)
+        NmeaSession.__init__(self, client_address, server_name, app_state)
+        self.client_conn = client_socket
+        self.running = True
+
+    def stop(self):
+        self.running = False
+        if self.client_conn:
+            try: self.client_conn.close()
+            except: pass
+            
+    def run(self):
+        """클라이언트로부터 NMEA 데이터를 recv_into로 수신하고 파싱합니다."""
+        while self.running:
+            try:
+                received = self.client_conn.recv_into(self.recv_view[self.recv_end:])
+                if not received:
+                    print(f"[{self.server_name}] 클라이언트 {self.client_address} 연결 끊김.")
+                    break
+                self.feed_received(received)
+                        
+            except (ConnectionResetError, BrokenPipeError):
+                print(f"[{self.server_name}] 클라이언트 {self.client_address} 연결 강제 종료됨.")
+                break
+            except Exception as e:
+                if self.running:
+                    print(f"[{self.server_name}] 클라이언트 {self.client_address} 소켓 오류: {e}")
+                break
+        
+        # 스레드 종료
+        self.stop()
+        print(f"[{self.server_name}] 핸들러 {self.client_address} 종료. AIVDM 재조립: {self.aivdm_reassembler.stats()}")
+        if self in self.app_state["active_clients"]:
+            try:
+                self.app_state["active_clients"].remove(self)
+            except ValueError:
+                pass 
+
+# 프로필 센서 항목 -> (문장 종류, 파서) 목록
+PROFILE_SENSOR_ROUTES = {
+    "EPFS1": ((b"RMC", NmeaSession.parse_rmc),),
+    "Heading": ((b"HDT", NmeaSession.parse_hdt),),
+    "ROT": ((b"ROT", NmeaSession.parse_rot),),
+    "Sounder": ((b"DPT", NmeaSession.parse_dpt), (b"DBT", NmeaSession.parse_dbt)),
+    "AIS 1": ((b"VDM", NmeaSession.parse_aivdm),),
+    "AIS 2": ((b"VDM", NmeaSession.parse_aivdm),),
+}
+_NO_ROUTES = {}
+
+def compile_routing_table(profile_config):
+    """프로필 설정을 포트별 디스패치 테이블 {포트 이름: {문장 종류: (파서, ...)}}로 변환합니다.
+    같은 포트에 같은 파서가 여러 번 지정되어도 (예: AIS 1 / AIS 2) 한 번만 호출됩니다."""
+    table = {}
+    for sensor, routes in PROFILE_SENSOR_ROUTES.items():
+        port_name = profile_config.get(sensor)
+        for sentence_type, parser_func in routes:
+            parsers = table.setdefault(port_name, {}).setdefault(sentence_type, ())
+            if parser_func not in parsers:
+                table[port_name][sentence_type] = parsers + (parser_func,)
+    return table
+
 class NmeaServer(threading.Thread):
     """[수정] 이 스레드는 이제 포트를 열고 클라이언트 핸들러만 생성합니다."""
     def __init__(self, port, config_name, app_state):
         super().__init__(daemon=True)
-        self.port = port
+        self.port = port # 0이면 OS가 고른 임시 포트 (바인딩 후 실제 포트로 바뀜)
         self.config_name = config_name
         self.app_state = app_state     
         self.running = True
         self.sock = None
+        self.ready = threading.Event() # 바인딩 시도가 끝나면 set (성공 여부는 self.sock)
         
     def stop(self):
         self.running = False
@@ -400,10 +1183,14 @@ class NmeaServer(threading.Thread):
             self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
             self.sock.bind(('', self.port))
             self.sock.listen(5) 
+            self.port = self.sock.getsockname()[1]
             print(f"[{self.config_name}] 리스너가 포트 {self.port}에서 시작됩니다.")
         except Exception as e:
             print(f"[{self.config_name}] 리스너 바인딩 실패: {e}")
+            self.sock = None
             return
+        finally:
+            self.ready.set()
 
         while self.running:
             try:
@@ -428,27 +1215,245 @@ class NmeaServer(threading.Thread):
         
         print(f"[{self.config_name}] 리스너 루프 종료.")
 
+UDP_RCVBUF_SIZE = 4 * 1024 * 1024 # 버스트 수신용 커널 소켓 버퍼
+UDP_DRAIN_MAX = 1024 # 한 번 깨어날 때 읽을 최대 데이터그램 수
+UDP_SESSION_MAX = 1024 # 송신자 주소별 세션(재조립 상태) 상한. 넘으면 가장 오래 조용했던 송신자부터 버림
+UDP_SESSION_TTL_SEC = 60.0 # 이 시간 동안 데이터그램이 없던 송신자의 세션은 버림
+
+class UdpNmeaServer(threading.Thread):
+    """UDP (브로드캐스트/멀티캐스트) NMEA 리스너. 연결이 없으므로 송신자 수와 무관하게 스레드 1개.
+    깨어날 때마다 쌓인 데이터그램을 최대 UDP_DRAIN_MAX개까지 한 번에 읽습니다."""
+    def __init__(self, port, config_name, app_state, group="",
+                 max_sessions=UDP_SESSION_MAX, session_ttl_sec=UDP_SESSION_TTL_SEC, clock=time.monotonic):
+        super().__init__(daemon=True)
+        self.port = port
+        self.config_name = config_name
+        self.app_state = app_state
+        self.group = group # 멀티캐스트 그룹 주소 (빈 문자열이면 유니캐스트/브로드캐스트)
+        self.running = True
+        self.sock = None
+        # 송신자 주소 -> [마지막 수신 시각, NmeaSession] (AIVDM 재조립 상태 분리) / 오래 조용했던 순서
+        self.sessions = OrderedDict()
+        self.max_sessions = max_sessions
+        self.session_ttl_sec = session_ttl_sec
+        self.clock = clock
+        self.sessions_expired = 0 # TTL 동안 조용해서 버린 세션
+        self.sessions_evicted = 0 # 상한 때문에 밀려난 세션
+
+    def stop(self):
+        self.running = False
+        if self.sock:
+            try: self.sock.close()
+            except: pass
+        print(f"[{self.config_name}] UDP 리스너 (Port {self.port})가 중지되었습니다.")
+
+    def _open_socket(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, UDP_RCVBUF_SIZE)
+        except OSError:
+            pass
+        sock.bind(('', self.port))
+        if self.group:
+            mreq = socket.inet_aton(self.group) + socket.inet_aton("0.0.0.0")
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+        sock.setblocking(False)
+        return sock
+
+    def _get_session(self, addr, now):
+        sessions = self.sessions
+        entry = sessions.get(addr)
+        if entry is not None:
+            entry[0] = now
+            sessions.move_to_end(addr)
+            return entry[1]
+        self._expire_sessions(now)
+        session = NmeaSession(addr, self.config_name, self.app_state, recv_size=0)
+        sessions[addr] = [now, session]
+        while len(sessions) > self.max_sessions:
+            sessions.popitem(last=False)
+            self.sessions_evicted += 1
+        return session
+
+    def _expire_sessions(self, now):
+        sessions = self.sessions
+        deadline = now - self.session_ttl_sec
+        while sessions:
+            first_addr = next(iter(sessions))
+            if sessions[first_addr][0] >= deadline:
+                break
+            del sessions[first_addr]
+            self.sessions_expired += 1
+
+    def session_stats(self):
+        return {"sessions": len(self.sessions), "expired": self.sessions_expired, "evicted": self.sessions_evicted}
+
+    def run(self):
+        """UDP 수신 메인 루프"""
+        try:
+            self.sock = self._open_socket()
+            print(f"[{self.config_name}] UDP 리스너가 포트 {self.port}에서 시작됩니다."
+                  + (f" (멀티캐스트 {self.group})" if self.group else ""))
+        except Exception as e:
+            print(f"[{self.config_name}] UDP 리스너 바인딩 실패: {e}")
+            return
+
+        buffer = bytearray(65535)
+        view = memoryview(buffer)
+        while self.running:
+            try:
+                readable, _, _ = select.select([self.sock], [], [], 0.5)
+                now = self.clock()
+                if not readable:
+                    self._expire_sessions(now)
+                    continue
+                for _ in range(UDP_DRAIN_MAX):
+                    try:
+                        nbytes, addr = self.sock.recvfrom_into(buffer)
+                    except BlockingIOError:
+                        break
+                    self._get_session(addr, now).feed_datagram(bytes(view[:nbytes]))
+            except (OSError, ValueError):
+                if self.running:
+                    print(f"[{self.config_name}] UDP 리스너 소켓 오류.")
+                break
+            except Exception as e:
+                if self.running:
+                    print(f"[{self.config_name}] UDP 리스너 오류: {e}")
+        
+        print(f"[{self.config_name}] UDP 리스너 루프 종료. 송신자 세션: {self.session_stats()}")
+
+ASYNC_LISTEN_BACKLOG = 4096 # asyncio 모드 listen backlog (AIS 타겟 수천 척의 동시 연결 대비)
+
+class AsyncNmeaProtocol(asyncio.BufferedProtocol):
+    """asyncio 연결 1개. 이벤트 루프가 공유 수신 버퍼에 직접 읽어 넣습니다.
+    get_buffer()와 buffer_updated()는 루프 스레드에서 연달아 호출되므로 연결마다 버퍼를 둘 필요가 없고,
+    연결별로는 버퍼 끝의 미완성 문장(pending, 보통 100바이트 미만)만 보관합니다."""
+    def __init__(self, server_name, app_state, connections, recv_buffer):
+        self.server_name = server_name
+        self.app_state = app_state
+        self.connections = connections # AsyncNmeaServer가 관리하는 열린 transport 집합
+        self.recv_buffer = recv_buffer # AsyncNmeaServer(이벤트 루프)당 1개
+        self.pending = b""
+        self.session = None
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.connections.add(transport)
+        self.session = NmeaSession(transport.get_extra_info("peername"), self.server_name, self.app_state,
+                                   recv_buffer=self.recv_buffer)
+
+    def get_buffer(self, sizehint):
+        session = self.session
+        pending = self.pending
+        session.recv_end = len(pending)
+        if pending:
+            session.recv_view[:session.recv_end] = pending
+        return session.recv_view[session.recv_end:]
+
+    def buffer_updated(self, nbytes):
+        session = self.session
+        try:
+            session.feed_received(nbytes)
+            self.pending = bytes(session.recv_view[:session.recv_end]) if session.recv_end else b""
+        except Exception as e:
+            print(f"[{self.server_name}] 클라이언트 {session.client_address} 처리 오류: {e}")
+            self.pending = b""
+            self.transport.close()
+
+    def connection_lost(self, exc):
+        self.connections.discard(self.transport)
+        print(f"[{self.server_name}] 클라이언트 {self.session.client_address} 연결 끊김. "
+              f"AIVDM 재조립: {self.session.aivdm_reassembler.stats()}")
+
+class AsyncNmeaServer(threading.Thread):
+    """T1~T5 포트를 하나의 asyncio 이벤트 루프(스레드 1개)에서 처리하는 리스너.
+    연결 수가 늘어도 스레드 수는 늘지 않습니다."""
+    def __init__(self, ports, app_state):
+        super().__init__(daemon=True)
+        self.ports = ports # {"T1": 10110, ...} (0이면 바인딩 후 실제 포트로 바뀜)
+        self.app_state = app_state
+        self.loop = None
+        self.servers = []
+        self.connections = set()
+        self.ready = threading.Event() # 모든 포트의 바인딩 시도가 끝나면 set
+        # 모든 연결이 함께 쓰는 수신 버퍼 (연결 수와 무관하게 루프당 1개)
+        self.recv_buffer = bytearray(app_state.get("recv_size", DEFAULT_RECV_SIZE))
+
+    def stop(self):
+        if self.loop and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self._shutdown)
+        print(f"[asyncio] 리스너 {self.ports}가 중지되었습니다.")
+
+    def _shutdown(self):
+        for server in self.servers:
+            server.close()
+        for transport in list(self.connections):
+            transport.close()
+        self.loop.stop()
+
+    def run(self):
+        """이벤트 루프 메인"""
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        for name, port in self.ports.items():
+            try:
+                server = self.loop.run_until_complete(self.loop.create_server(
+                    lambda name=name: AsyncNmeaProtocol(name, self.app_state, self.connections, self.recv_buffer),
+                    port=port, reuse_address=True, backlog=ASYNC_LISTEN_BACKLOG
+                ))
+                self.servers.append(server)
+                # 포트 0이면 주소 계열마다 다른 임시 포트가 잡힐 수 있으므로 IPv4 쪽을 기록
+                sock = next((sock for sock in server.sockets if sock.family == socket.AF_INET), server.sockets[0])
+                self.ports[name] = sock.getsockname()[1]
+                print(f"[{name}] asyncio 리스너가 포트 {self.ports[name]}에서 시작됩니다.")
+            except Exception as e:
+                print(f"[{name}] 리스너 바인딩 실패: {e}")
+        self.ready.set()
+        
+        if self.servers:
+            self.loop.run_forever()
+        self.loop.run_until_complete(asyncio.sleep(0)) # 닫힌 transport의 connection_lost 처리
+        self.loop.close()
+        print("[asyncio] 리스너 루프 종료.")
+
 # --- 3. 설정 팝업창 ---
 class PortSettingsWindow(tkinter.Toplevel):
     def __init__(self, master, port_config):
         super().__init__(master)
         self.title("Port Settings (Sensors)")
-        self.geometry("250x250") 
+        self.geometry("420x290") 
         self.transient(master) 
         self.port_config = port_config
         self.temp_vars = {} 
+        self.mode_vars = {}
+        self.group_vars = {}
         frame = ttk.Frame(self, padding="10")
         frame.pack(expand=True, fill="both")
-        ttk.Label(frame, text="TCP Port Settings", font=("Arial", 12, "bold")).grid(row=0, column=0, columnspan=2, pady=5)
+        ttk.Label(frame, text="TCP/UDP Port Settings", font=("Arial", 12, "bold")).grid(row=0, column=0, columnspan=4, pady=5)
         row_index = 1
         for name in ["T1", "T2", "T3", "T4", "T5"]:
+            config = self.port_config.get(name, {"port": 0})
             ttk.Label(frame, text=f"{name}:").grid(row=row_index, column=0, padx=5, pady=5, sticky="w")
-            current_port = self.port_config.get(name, {"port": 0})["port"]
-            var = tkinter.StringVar(value=str(current_port))
+            var = tkinter.StringVar(value=str(config["port"]))
             entry = ttk.Entry(frame, textvariable=var, width=10)
             entry.grid(row=row_index, column=1, padx=5, pady=5)
+            mode_var = tkinter.StringVar(value=config.get("mode", "tcp").upper())
+            ttk.OptionMenu(frame, mode_var, mode_var.get(), "TCP", "UDP").grid(row=row_index, column=2, padx=5, pady=5)
+            group_var = tkinter.StringVar(value=config.get("group", ""))
+            ttk.Entry(frame, textvariable=group_var, width=15).grid(row=row_index, column=3, padx=5, pady=5)
             self.temp_vars[name] = var
+            self.mode_vars[name] = mode_var
+            self.group_vars[name] = group_var
             row_index += 1
+        ttk.Label(frame, text="* UDP 멀티캐스트: 그룹 주소 입력 (예: 239.192.0.1)").grid(
+            row=row_index, column=0, columnspan=4, padx=5, sticky="w")
+        row_index += 1
+        self.asyncio_var = tkinter.BooleanVar(value=(master.server_mode == "asyncio"))
+        ttk.Checkbutton(frame, text="asyncio (단일 이벤트 루프)", variable=self.asyncio_var).grid(
+            row=row_index, column=0, columnspan=4, padx=5, pady=5, sticky="w")
         btn_frame = ttk.Frame(self)
         btn_frame.pack(fill="x", pady=5)
         ttk.Button(btn_frame, text="Apply & Restart Servers", command=self.apply).pack(side="right", padx=10)
@@ -460,7 +1465,10 @@ class PortSettingsWindow(tkinter.Toplevel):
                 if name not in self.port_config:
                     self.port_config[name] = {} 
                 self.port_config[name]["port"] = new_port
-            print(f"[설정] 포트 설정이 변경되었습니다: {self.port_config}")
+                self.port_config[name]["mode"] = self.mode_vars[name].get().lower()
+                self.port_config[name]["group"] = self.group_vars[name].get().strip()
+            self.master.server_mode = "asyncio" if self.asyncio_var.get() else "thread"
+            print(f"[설정] 포트 설정이 변경되었습니다: {self.port_config} (모드: {self.master.server_mode})")
             self.master.restart_all_servers()
             self.destroy()
         except ValueError:
@@ -506,6 +1514,7 @@ class ProfileSettingsWindow(tkinter.Toplevel):
             for name, var in self.temp_vars.items():
                 self.profile_config[name] = var.get()
             print(f"[설정] 프로필 설정이 변경되었습니다: {self.profile_config}")
+            self.master.rebuild_routing_table()
             self.destroy()
         except Exception as e:
             print(f"[오류] 프로필 적용 실패: {e}")
@@ -515,11 +1524,9 @@ class ProfileSettingsWindow(tkinter.Toplevel):
 # --- 4. AIS 타겟 팝업창 (CPA/TCPA 및 Msg 5 데이터 추가) ---
 class AisPopup(tkinter.Toplevel):
     """[수정] 사진 2.jpg의 모든 항목을 표시하는 팝업창"""
-    def __init__(self, master, mmsi, data_store, lock):
+    def __init__(self, master, mmsi):
         super().__init__(master)
         self.mmsi = mmsi
-        self.data_store = data_store
-        self.data_lock = lock
         self.master_app = master # 메인 App 참조
         
         self.title(f"Target Info: {mmsi}")
@@ -625,10 +1632,10 @@ class AisPopup(tkinter.Toplevel):
         """[신규] CPA/TCPA 계산 로직"""
         try:
             # 1. 본선(OS) 데이터
-            os_lat = os_data["_raw_lat"]
-            os_lon = os_data["_raw_lon"]
-            os_sog = safe_float(os_data["SOG"].get().split(" ")[0])
-            os_cog = safe_float(os_data["COG"].get().split("°")[0])
+            os_lat = os_data["lat"]
+            os_lon = os_data["lon"]
+            os_sog = os_data["sog"]
+            os_cog = os_data["cog"]
             
             # 2. 타겟(TGT) 데이터
             tgt_lat = tgt_data.get("lat")
@@ -682,19 +1689,13 @@ class AisPopup(tkinter.Toplevel):
     def update_popup_data(self):
         """[수정] 팝업창의 모든 데이터를 1초마다 갱신"""
         try:
-            with self.data_lock:
-                target_data = self.data_store["AIS_Targets"].get(self.mmsi)
-                os_data_copy = {
-                    "_raw_lat": self.data_store["_raw_lat"],
-                    "_raw_lon": self.data_store["_raw_lon"],
-                    "SOG": self.data_store["SOG"], # StringVar
-                    "COG": self.data_store["COG"]  # StringVar
-                }
+            snapshot = self.master_app.snapshot # 잠금 없이 최신 스냅샷을 읽음
+            target_data = snapshot.targets.get(self.mmsi)
             
             if target_data:
-                cpa_str, tcpa_str = self.calculate_cpa_tcpa(os_data_copy, target_data)
+                cpa_str, tcpa_str = self.calculate_cpa_tcpa(snapshot.own_ship, target_data)
                 
-                os_pos = (os_data_copy["_raw_lat"], os_data_copy["_raw_lon"])
+                os_pos = (snapshot.own_ship["lat"], snapshot.own_ship["lon"])
                 target_pos = (target_data.get('lat', 0), target_data.get('lon', 0))
                 if os_pos[0] != 35.10 and target_pos[0] != 0:
                     brg = calculate_bearing(os_pos, target_pos)
@@ -702,14 +1703,15 @@ class AisPopup(tkinter.Toplevel):
                     self.display_vars["BRG"].set(f"{brg:.1f}°")
                     self.display_vars["RNG"].set(f"{rng:.2f} NM")
                 
-                self.display_vars["ShipName"].set(target_data.get("ship_name", "--"))
-                self.display_vars["CallSign"].set(target_data.get("call_sign", "--"))
-                self.display_vars["ShipType"].set(target_data.get("ship_type_str", "Unknown"))
-                self.display_vars["Length"].set(f"{target_data.get('length', 0)} m")
-                self.display_vars["Beam"].set(f"{target_data.get('beam', 0)} m")
-                self.display_vars["Draught"].set(f"{target_data.get('draught', 0.0):.1f} m")
-                self.display_vars["Destination"].set(target_data.get("destination", "--"))
-                self.display_vars["ETA"].set(target_data.get("eta", "--"))
+                static = target_data.get("static", EMPTY_STATIC_DATA) # 처음 읽을 때 디코딩됨
+                self.display_vars["ShipName"].set(static.get("ship_name", "--"))
+                self.display_vars["CallSign"].set(static.get("call_sign", "--"))
+                self.display_vars["ShipType"].set(static.get("ship_type_str", "Unknown"))
+                self.display_vars["Length"].set(f"{static.get('length', 0)} m")
+                self.display_vars["Beam"].set(f"{static.get('beam', 0)} m")
+                self.display_vars["Draught"].set(f"{static.get('draught', 0.0):.1f} m")
+                self.display_vars["Destination"].set(static.get("destination", "--"))
+                self.display_vars["ETA"].set(static.get("eta", "--"))
                 
                 self.display_vars["Lat"].set(f"{target_data.get('lat', 0.0):.5f}")
                 self.display_vars["Lon"].set(f"{target_data.get('lon', 0.0):.5f}")
@@ -731,6 +1733,270 @@ class AisPopup(tkinter.Toplevel):
 
 
 # --- 5. 메인 ECDIS 애플리케이션 (수정됨) ---
+OWN_SHIP_REFRESH_MS = 200 # 본선 데이터 패널 표시 주기 (센서 수신 주기와 무관)
+CAPTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "captures") # 수신 문장 녹화 위치
+
+def format_own_ship_display(values):
+    """본선 raw 값 -> {data_store 키: 표시 문자열}. 아직 수신되지 않은 값은 제외 (초기 표시 유지)"""
+    text = {}
+    gps_status = values.get("gps_status")
+    if gps_status == "V":
+        text["GPS_Status"] = "V (Void)"
+    elif gps_status == "A":
+        text["GPS_Status"] = "A (Active)"
+        utc = values.get("utc")
+        if utc:
+            text["UTC"] = f"{utc[0:2]}:{utc[2:4]}:{utc[4:6]} UTC"
+        # RMC 유효(A)일 때만 위치/속도 갱신 (V 수신 시 마지막 값 유지)
+        text["Lat"] = f"{values['lat']:.5f}° {values['lat_hemi']}"
+        text["Lon"] = f"{values['lon']:.5f}° {values['lon_hemi']}"
+        text["SOG"] = f"{values['sog']:.1f} kn"
+        text["COG"] = f"{values['cog']:.1f}°"
+        text["SPD"] = f"{values['sog']:.1f} kn"
+    for key, field, fmt in (
+        ("HDG", "hdg", "{:.1f}°"), ("ROT", "rot", "{:.1f} °/m"),
+        ("DPTH", "depth", "{:.1f} m"), ("DPTH(SNDR)", "depth_sndr", "{:.1f} m"),
+    ):
+        value = values.get(field)
+        if value is not None:
+            text[key] = fmt.format(value)
+    return text
+
+DR_FRAME_HZ = 5                # 지도 타겟 표시 주기 (AIS 보고 6초 / 스냅샷 1초와 무관, 5~10 권장)
+DR_MAX_EXTRAPOLATE_SEC = 30.0  # 마지막 보고 후 이 시간까지만 외삽 (수신이 끊긴 타겟이 계속 흘러가지 않도록)
+DR_BLEND_SEC = 1.0             # 새 보고 수신 시 직전 표시 위치에서 새 예측 위치로 옮겨 가는 시간
+DR_BLEND_MAX_NM = 0.5          # 차이가 이보다 크면 섞지 않고 바로 이동 (위치 보정 등)
+DR_SNAPSHOT_SEC = 1.0          # 스냅샷 주기 (update_map_markers). 저장소 위치가 DR 기준 보고보다 이만큼 새로울 수 있음
+
+class DeadReckoner:
+    """표시 전용 추정 항법 예측기. 마지막 보고(lat, lon, SOG, COG, 수신 시각)에서 평면 근사로 외삽한다.
+    새 보고가 들어오면 직전 표시 위치와의 차이를 오프셋으로 두고 DR_BLEND_SEC 동안 0으로 줄여 순간 이동을 없앤다.
+    배열은 mmsi 정렬 순서로 보관하며, 스냅샷 간 대응은 searchsorted로 한 번에 찾는다."""
+    def __init__(self, max_extrapolate_sec=DR_MAX_EXTRAPOLATE_SEC, blend_sec=DR_BLEND_SEC, blend_max_nm=DR_BLEND_MAX_NM):
+        self.max_extrapolate_sec = max_extrapolate_sec
+        self.blend_sec = blend_sec
+        self.blend_max_nm = blend_max_nm
+        self.columns = None
+        self.offset_lat = self.offset_lon = self.blend_start = np.empty(0)
+        self.frame = None # 마지막 predict() 결과 (지도에 그려진 위치, 클릭 판정용)
+        self.max_drift_nm = 0.0 # 표시 위치가 저장소의 보고 위치에서 벗어날 수 있는 최대 거리 (스냅샷마다 갱신)
+
+    def _extrapolate(self, c, now):
+        """열 c의 오프셋 없는 외삽 위치 (lat, lon)"""
+        dt = np.clip(now - c["timestamp"], 0.0, self.max_extrapolate_sec)
+        moving = (c["sog"] >= 0.1) & np.isfinite(c["cog"]) # NaN SOG/COG는 제자리
+        dist_deg = np.where(moving, c["sog"] * dt / 3600.0 / 60.0, 0.0)
+        cog_rad = np.radians(np.nan_to_num(c["cog"]))
+        lat = c["lat"] + dist_deg * np.cos(cog_rad)
+        lon = c["lon"] + dist_deg * np.sin(cog_rad) / np.cos(np.radians(c["lat"]))
+        return lat, lon
+
+    def _positions(self, now):
+        lat, lon = self._extrapolate(self.columns, now)
+        weight = np.clip(1.0 - (now - self.blend_start) / self.blend_sec, 0.0, 1.0)
+        return lat + self.offset_lat * weight, lon + self.offset_lon * weight
+
+    def set_snapshot(self, targets, now):
+        """새 스냅샷(AisTargetColumns) 적용. 수신 시각이 바뀐 타겟은 지금 표시 중인 위치에서 출발하도록 오프셋 설정"""
+        order = np.argsort(targets.mmsi, kind="stable")
+        columns = {name: array[order] for name, array in targets.columns.items()}
+        count = len(order)
+        offset_lat = np.zeros(count)
+        offset_lon = np.zeros(count)
+        blend_start = np.full(count, -np.inf)
+
+        if self.columns is not None and len(self.columns["mmsi"]) and count:
+            shown_lat, shown_lon = self._positions(now)
+            prev_mmsi = self.columns["mmsi"]
+            index = np.minimum(np.searchsorted(prev_mmsi, columns["mmsi"]), len(prev_mmsi) - 1)
+            matched = prev_mmsi[index] == columns["mmsi"]
+            prev = index[matched]
+            # 보고가 바뀌지 않은 타겟은 진행 중인 섞기를 그대로 이어감
+            offset_lat[matched] = self.offset_lat[prev]
+            offset_lon[matched] = self.offset_lon[prev]
+            blend_start[matched] = self.blend_start[prev]
+
+            fresh = np.flatnonzero(matched)[columns["timestamp"][matched] != self.columns["timestamp"][prev]]
+            if len(fresh):
+                base_lat, base_lon = self._extrapolate(columns, now)
+                fresh_prev = index[fresh]
+                d_lat = shown_lat[fresh_prev] - base_lat[fresh]
+                d_lon = shown_lon[fresh_prev] - base_lon[fresh]
+                jump_nm = np.hypot(d_lat * 60.0, d_lon * 60.0 * np.cos(np.radians(base_lat[fresh])))
+                blend = np.isfinite(jump_nm) & (jump_nm <= self.blend_max_nm)
+                offset_lat[fresh] = np.where(blend, d_lat, 0.0)
+                offset_lon[fresh] = np.where(blend, d_lon, 0.0)
+                blend_start[fresh] = now
+
+        self.columns = columns
+        self.offset_lat, self.offset_lon, self.blend_start = offset_lat, offset_lon, blend_start
+        # 외삽 거리(최대 SOG x (외삽 상한 + 스냅샷 주기)) + 섞기 오프셋 상한
+        sog = columns["sog"][np.isfinite(columns["sog"])]
+        max_sog = float(sog.max()) if len(sog) else 0.0
+        self.max_drift_nm = max_sog * (self.max_extrapolate_sec + DR_SNAPSHOT_SEC) / 3600.0 + self.blend_max_nm
+
+    def predict(self, now):
+        """now 시점의 표시용 타겟 열 (lat/lon만 예측 위치로 바꾼 AisTargetColumns). 스냅샷 전이면 None"""
+        if self.columns is None:
+            return None
+        lat, lon = self._positions(now)
+        self.frame = AisTargetColumns({**self.columns, "lat": lat, "lon": lon})
+        return self.frame
+
+    def hit_test(self, store, lat, lon, max_nm):
+        """마지막으로 그린 프레임(예측 위치)에서 (lat, lon)으로부터 max_nm 이내 가장 가까운 타겟의 (거리 NM, mmsi) 또는 None.
+        후보는 저장소 공간 색인(store.radius)에서 max_nm + max_drift_nm 이내의 보고 위치로 좁히고,
+        그 후보만 프레임 위치로 판정한다. 클릭 반경은 수십 m이므로 평면 근사 거리로 충분하다"""
+        frame = self.frame
+        if frame is None or not len(frame.mmsi):
+            return None
+        candidates = store.radius(lat, lon, max_nm + self.max_drift_nm)
+        if not candidates:
+            return None
+        mmsi = np.array([m for _, m, _, _ in candidates], dtype=frame.mmsi.dtype)
+        index = np.minimum(np.searchsorted(frame.mmsi, mmsi), len(frame.mmsi) - 1) # 프레임은 mmsi 정렬 순서
+        index = index[frame.mmsi[index] == mmsi] # 스냅샷 이후 새로 나타난 타겟은 아직 그려지지 않음
+        d_lat_nm = (frame.lat[index] - lat) * 60.0
+        d_lon_nm = ((frame.lon[index] - lon + 180.0) % 360.0 - 180.0) * 60.0 * math.cos(deg_to_rad(lat))
+        dist = np.hypot(d_lat_nm, d_lon_nm) # 위치 없는 타겟은 NaN -> 후보 아님
+        if not len(dist):
+            return None
+        dist[~(dist <= max_nm)] = np.inf
+        best = int(np.argmin(dist))
+        if not np.isfinite(dist[best]):
+            return None
+        return float(dist[best]), int(frame.mmsi[index[best]])
+
+MARKER_VIEW_MARGIN = 0.25     # 화면 밖 여유 범위 (화면 폭/높이 대비). 약간의 이동에는 마커를 다시 만들지 않음
+CLUSTER_MAX_ZOOM = 11         # 이 줌 이하에서는 가까운 타겟을 클러스터 마커로 묶음
+CLUSTER_CELLS_PER_TILE = 2    # 클러스터 격자 크기: 지도 타일(256px) 1장당 칸 수
+MAX_TARGET_MARKERS = 300      # 화면 안 타겟이 이보다 많으면 줌과 무관하게 클러스터링
+MARKER_MOVE_THRESHOLD_PX = 2.0 # 마지막으로 그린 위치에서 이 픽셀 이상 움직였을 때만 마커 위치 갱신
+TRACK_TRAIL_MAX_POINTS = 300   # 지도에 그리는 항적 선의 점 수 상한 (넘으면 솎아서 그림)
+
+class AisMarkerLayer:
+    """지도 위 AIS 타겟 마커 관리.
+    화면 경계(+여유) 안의 타겟만 마커로 그리고, 낮은 줌에서는 격자 칸별로 묶어 척수를 표시한다.
+    화면을 벗어난 마커는 삭제하므로 마커 수(Tk 캔버스 작업량)는 선단 크기와 무관하게 화면 크기로 제한된다.
+    기존 마커는 마지막으로 그린 위치/라벨을 기억해 두고, move_threshold_px 이상 움직였거나 라벨이 바뀐 경우에만 갱신한다."""
+    def __init__(self, map_widget, move_threshold_px=MARKER_MOVE_THRESHOLD_PX):
+        self.map_widget = map_widget
+        self.move_threshold_px = move_threshold_px
+        self.markers = {}  # mmsi 또는 ("cluster", 격자 키) -> 마커
+        self.rendered = {} # 같은 키 -> 마지막으로 그린 (lat, lon, 라벨)
+        self.stats = {"drawn": 0, "created": 0, "moved": 0, "relabeled": 0, "deleted": 0, "saved": 0}
+        self.saved_total = 0 # 시작 이후 생략한 캔버스 갱신 누적
+
+    def view_bounds(self):
+        """현재 화면 경계에 여유를 더한 (south, west, north, east, zoom). 지도가 아직 그려지지 않았으면 None"""
+        try:
+            zoom = round(self.map_widget.zoom)
+            north, west = tile_to_latlon(*self.map_widget.upper_left_tile_pos, zoom)
+            south, east = tile_to_latlon(*self.map_widget.lower_right_tile_pos, zoom)
+        except (AttributeError, TypeError, ValueError):
+            return None
+        margin_lat = (north - south) * MARKER_VIEW_MARGIN
+        margin_lon = ((east - west) % 360.0) * MARKER_VIEW_MARGIN
+        return (max(south - margin_lat, -90.0), (west - margin_lon + 180.0) % 360.0 - 180.0,
+                min(north + margin_lat, 90.0), (east + margin_lon + 180.0) % 360.0 - 180.0, zoom)
+
+    def plan(self, targets, bounds):
+        """그릴 마커 목록 {키: (lat, lon, 라벨, 클러스터 여부)}"""
+        rows = np.flatnonzero(targets.has_pos)
+        if bounds is None:
+            zoom = None
+        else:
+            south, west, north, east, zoom = bounds
+            lat = targets.lat[rows]
+            lon = targets.lon[rows]
+            if west <= east:
+                in_lon = (lon >= west) & (lon <= east)
+            else: # 날짜변경선을 걸친 화면
+                in_lon = (lon >= west) | (lon <= east)
+            rows = rows[(lat >= south) & (lat <= north) & in_lon]
+
+        if zoom is not None and (zoom <= CLUSTER_MAX_ZOOM or len(rows) > MAX_TARGET_MARKERS):
+            return self._plan_clusters(targets, rows, zoom)
+        return {mmsi: (lat, lon, (static or EMPTY_STATIC_DATA).get("ship_name", str(mmsi)), False)
+                for mmsi, lat, lon, static in zip(targets.mmsi[rows].tolist(), targets.lat[rows].tolist(),
+                                                  targets.lon[rows].tolist(), targets.static[rows].tolist())}
+
+    def _plan_clusters(self, targets, rows, zoom):
+        """타겟을 줌별 고정 격자 칸으로 묶음. 1척뿐인 칸은 일반 타겟 마커로 표시"""
+        cell_deg = 360.0 / (2 ** zoom) / CLUSTER_CELLS_PER_TILE
+        lat = targets.lat[rows]
+        lon = targets.lon[rows]
+        cell_row = np.floor(lat / cell_deg).astype(np.int64)
+        cell_col = np.floor(lon / cell_deg).astype(np.int64)
+        keys, inverse, counts = np.unique((cell_row << 32) | (cell_col & 0xFFFFFFFF),
+                                          return_inverse=True, return_counts=True)
+        inverse = inverse.reshape(-1)
+        mean_lat = np.bincount(inverse, weights=lat) / counts
+        mean_lon = np.bincount(inverse, weights=lon) / counts
+
+        plan = {}
+        for index in np.flatnonzero(counts > 1).tolist():
+            count = int(counts[index])
+            plan[("cluster", int(keys[index]))] = (float(mean_lat[index]), float(mean_lon[index]), f"{count}척", True)
+        singles = rows[counts[inverse] == 1]
+        for mmsi, lat, lon, static in zip(targets.mmsi[singles].tolist(), targets.lat[singles].tolist(),
+                                          targets.lon[singles].tolist(), targets.static[singles].tolist()):
+            plan[mmsi] = (lat, lon, (static or EMPTY_STATIC_DATA).get("ship_name", str(mmsi)), False)
+        return plan
+
+    def update(self, targets):
+        """스냅샷(AisTargetColumns)으로 마커 갱신. 이번 주기의 집계(self.stats)를 반환.
+        stats["saved"]: 모든 마커를 매번 set_position 하던 방식 대비 생략한 캔버스 갱신 수"""
+        bounds = self.view_bounds()
+        plan = self.plan(targets, bounds)
+        zoom = None if bounds is None else bounds[4] # 지도 준비 전에는 조금이라도 움직이면 갱신
+        # 임계값을 픽셀 -> 타일 단위로 환산해 두고, 타일 좌표 차이로 비교
+        threshold_tile = self.move_threshold_px / 256.0
+        stats = {"drawn": len(plan), "created": 0, "moved": 0, "relabeled": 0, "deleted": 0, "saved": 0}
+
+        removed = [key for key in self.markers if key not in plan]
+        for key in removed:
+            self.markers.pop(key).delete()
+            del self.rendered[key]
+        stats["deleted"] = len(removed)
+
+        for key, (lat, lon, text, is_cluster) in plan.items():
+            marker = self.markers.get(key)
+            if marker is None:
+                color = "orange" if is_cluster else "green"
+                self.markers[key] = self.map_widget.set_marker(
+                    lat, lon,
+                    text=text,
+                    marker_color_circle=color,
+                    marker_color_outside=color
+                )
+                self.rendered[key] = (lat, lon, text)
+                stats["created"] += 1
+                continue
+
+            drawn_lat, drawn_lon, drawn_text = self.rendered[key]
+            if zoom is None:
+                moved = (lat, lon) != (drawn_lat, drawn_lon)
+            else:
+                x, y = latlon_to_tile(lat, lon, zoom)
+                drawn_x, drawn_y = latlon_to_tile(drawn_lat, drawn_lon, zoom)
+                moved = math.hypot(x - drawn_x, y - drawn_y) >= threshold_tile
+            if moved:
+                marker.set_position(lat, lon)
+                drawn_lat, drawn_lon = lat, lon
+                stats["moved"] += 1
+            else:
+                stats["saved"] += 1
+            if text != drawn_text:
+                marker.set_text(text)
+                drawn_text = text
+                stats["relabeled"] += 1
+            self.rendered[key] = (drawn_lat, drawn_lon, drawn_text)
+
+        self.saved_total += stats["saved"]
+        self.stats = stats
+        return stats
+
 class App(tkinter.Tk):
     def __init__(self):
         super().__init__()
@@ -750,11 +2016,14 @@ class App(tkinter.Tk):
             "ROT": tkinter.StringVar(value="-.- °/m"),
             "DPTH": tkinter.StringVar(value="--.- m"),
             "DPTH(SNDR)": tkinter.StringVar(value="--.- m"),
-            "_raw_lat": 35.10,
-            "_raw_lon": 129.04,
-            "_os_vector": (35.10, 129.04, 0.0, 0.0), # (lat, lon, sog, cog)
-            "AIS_Targets": {}, 
+            "Markers": tkinter.StringVar(value="0"),
+            "CPA_Stats": tkinter.StringVar(value="--"),
         }
+        # 본선 raw 값과 AIS 타겟은 각각 별도 잠금의 저장소에 보관하고, GUI는 스냅샷만 읽음
+        self.own_ship = OwnShipStore(lat=35.10, lon=129.04, sog=0.0, cog=0.0)
+        self.ais_targets = AisTargetStore()
+        self.snapshot = DisplaySnapshot.build(self.own_ship, self.ais_targets)
+        self.cpa_engine = CpaTcpaEngine()
         
         self.port_config = {
             "T1": {"port": 10110}, "T2": {"port": 10120},
@@ -768,9 +2037,11 @@ class App(tkinter.Tk):
             "AIS 1": "T2", "AIS 2": "0 (Off)",
         }
         
+        self.server_mode = "asyncio" # "asyncio": 단일 이벤트 루프 / "thread": 연결당 스레드
         self.server_listeners = {} 
         self.active_clients = []   
-        self.data_lock = threading.Lock()
+        self.recorder = None # 녹화 중이면 CaptureWriter
+        self.recording = tkinter.BooleanVar(value=False)
         
         self.setup_gui_frames()
         self.setup_data_panel()
@@ -779,7 +2050,10 @@ class App(tkinter.Tk):
         self.map_widget.set_position(35.10, 129.04)
         self.map_widget.set_zoom(14)
         self.ship_marker = self.map_widget.set_marker(35.10, 129.04, text="SHIP")
-        self.ais_markers = {} 
+        self.marker_layer = AisMarkerLayer(self.map_widget)
+        self.dead_reckoner = DeadReckoner()
+        self.dr_frame_hz = DR_FRAME_HZ
+        self.track_paths = {} # "own" / "target" -> (지도 경로, 마지막으로 그린 항적의 (점 수, 마지막 시각))
         
         self.map_mode = tkinter.StringVar(value="VIEW")
         self.active_ais_popup = None 
@@ -792,9 +2066,14 @@ class App(tkinter.Tk):
         
         self.map_widget.add_left_click_map_command(self.on_map_click)
         
+        self.own_ship_display_version = 0
+        self.displayed_text = {} # data_store 키 -> 마지막으로 set한 문자열
+        
         self.start_all_servers()
+        self.refresh_own_ship_display()
         self.update_gui_clock()
         self.update_map_markers() 
+        self.animate_targets()
         
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
         
@@ -813,20 +2092,14 @@ class App(tkinter.Tk):
             
         click_lat, click_lon = pos
         
-        closest_mmsi = None
-        min_dist = float('inf')
-        
-        for mmsi, marker in self.ais_markers.items():
-            dist = calculate_distance((click_lat, click_lon), marker.position)
-            
-            # [수정] 클릭 반경을 0.05NM (약 90m)로 늘림
-            if dist < 0.05 and dist < min_dist:
-                min_dist = dist
-                closest_mmsi = mmsi
+        # [수정] 클릭 반경을 0.05NM (약 90m)로 늘림
+        # 마커는 추정 항법 위치에 그려지므로, 보고 위치가 아니라 마지막으로 그린 프레임의 위치로 판정
+        hit = self.dead_reckoner.hit_test(self.ais_targets, click_lat, click_lon, 0.05)
+        closest_mmsi = hit[1] if hit else None
                 
         if closest_mmsi:
             print(f"[GUI] 타겟 {closest_mmsi} 클릭됨.")
-            self.active_ais_popup = AisPopup(self, closest_mmsi, self.data_store, self.data_lock)
+            self.active_ais_popup = AisPopup(self, closest_mmsi)
 
 
     def setup_gui_frames(self):
@@ -849,6 +2122,10 @@ class App(tkinter.Tk):
         vec_frame.pack(fill="x", padx=5, pady=5)
         ttk.Label(vec_frame, text="Vector").pack(anchor="w", padx=5)
         ttk.Label(vec_frame, textvariable=self.data_store["Vector"], font=value_font).pack(anchor="w", padx=5, pady=(0, 5))
+        marker_frame = tkinter.Frame(self.data_frame_container, relief="ridge", borderwidth=1)
+        marker_frame.pack(fill="x", padx=5, pady=5)
+        ttk.Label(marker_frame, text="AIS Markers (drawn / moved / saved)").pack(anchor="w", padx=5)
+        ttk.Label(marker_frame, textvariable=self.data_store["Markers"], font=value_font).pack(anchor="w", padx=5, pady=(0, 5))
         nav_frame = tkinter.Frame(self.data_frame_container, relief="ridge", borderwidth=1)
         nav_frame.pack(fill="x", padx=5, pady=5)
         nav_items = [
@@ -873,6 +2150,12 @@ class App(tkinter.Tk):
                 val_lbl = ttk.Label(nav_frame, textvariable=var, font=value_font)
                 val_lbl.grid(row=i, column=0, columnspan=2, sticky="e", padx=5, pady=(0,0))
         nav_frame.grid_columnconfigure(1, weight=1) 
+        alarm_frame = tkinter.Frame(self.data_frame_container, relief="ridge", borderwidth=1)
+        alarm_frame.pack(fill="x", padx=5, pady=5)
+        ttk.Label(alarm_frame, text=f"Dangerous Targets (CPA ≤ {CPA_LIMIT_NM} NM, TCPA ≤ {TCPA_LIMIT_MIN:.0f} min)").pack(anchor="w", padx=5)
+        self.alarm_listbox = tkinter.Listbox(alarm_frame, height=6, font=label_font, fg="red")
+        self.alarm_listbox.pack(fill="x", padx=5, pady=(0, 5))
+        ttk.Label(alarm_frame, textvariable=self.data_store["CPA_Stats"], font=label_font).pack(anchor="w", padx=5, pady=(0, 5))
 
     def setup_menu(self):
         self.menubar = tkinter.Menu(self)
@@ -883,6 +2166,7 @@ class App(tkinter.Tk):
         ship_menu.add_cascade(label="Sensors", menu=sensors_menu)
         sensors_menu.add_command(label="Port Settings...", command=self.open_port_settings)
         sensors_menu.add_command(label="Profile...", command=self.open_profile_settings)
+        ship_menu.add_checkbutton(label="Record Raw Sentences", variable=self.recording, command=self.toggle_recording)
 
     def open_port_settings(self):
         PortSettingsWindow(self, self.port_config)
@@ -896,18 +2180,50 @@ class App(tkinter.Tk):
         self.stop_all_servers() 
         
         self.app_state = {
-            "data_store": self.data_store,
             "profile_config": self.profile_config,
-            "lock": self.data_lock,
-            "active_clients": self.active_clients 
+            "own_ship": self.own_ship,
+            "ais_targets": self.ais_targets,
+            "active_clients": self.active_clients,
+            "recv_size": DEFAULT_RECV_SIZE,
+            "routing_table": compile_routing_table(self.profile_config),
+            "recorder": self.recorder,
         }
         
+        tcp_ports = {}
         for name, config in self.port_config.items():
             port = config["port"]
-            if port > 0: 
+            if port <= 0:
+                continue
+            if config.get("mode", "tcp") == "udp":
+                listener_thread = UdpNmeaServer(port, name, self.app_state, config.get("group", ""))
+            elif self.server_mode == "asyncio":
+                tcp_ports[name] = port
+                continue
+            else:
                 listener_thread = NmeaServer(port, name, self.app_state)
-                listener_thread.start()
-                self.server_listeners[name] = listener_thread
+            listener_thread.start()
+            self.server_listeners[name] = listener_thread
+        
+        if tcp_ports:
+            listener_thread = AsyncNmeaServer(tcp_ports, self.app_state)
+            listener_thread.start()
+            self.server_listeners["asyncio"] = listener_thread
+
+    def toggle_recording(self):
+        """수신 문장 녹화 시작/중지. 세션은 문장을 받을 때마다 app_state["recorder"]를 확인하므로 재시작 불필요"""
+        recorder = self.recorder
+        if self.recording.get() and recorder is None:
+            self.recorder = CaptureWriter(CAPTURE_DIR)
+            self.recorder.start()
+        elif not self.recording.get():
+            self.recorder = None
+        self.app_state["recorder"] = self.recorder
+        if recorder is not None and self.recorder is None:
+            recorder.stop() # 세션이 더 이상 넣지 않게 된 뒤 남은 큐를 기록하고 닫음
+
+    def rebuild_routing_table(self):
+        """프로필 변경 시 라우팅 테이블을 새로 만들어 한 번에 교체합니다 (핸들러는 다음 수신부터 적용)."""
+        self.app_state["routing_table"] = compile_routing_table(self.profile_config)
 
     def stop_all_servers(self):
         """[수정] 모든 리스너와 활성 클라이언트 핸들러를 중지합니다."""
@@ -926,6 +2242,17 @@ class App(tkinter.Tk):
         print("[메인] NMEA 서버를 재시작합니다...")
         self.start_all_servers()
 
+    def refresh_own_ship_display(self):
+        """본선 raw 값을 표시 문자열로 변환하여, 바뀐 StringVar만 set (GUI 스레드에서만 호출)"""
+        version = self.own_ship.version
+        if version != self.own_ship_display_version:
+            self.own_ship_display_version = version
+            for key, text in format_own_ship_display(self.own_ship.snapshot()).items():
+                if self.displayed_text.get(key) != text:
+                    self.displayed_text[key] = text
+                    self.data_store[key].set(text)
+        self.after(OWN_SHIP_REFRESH_MS, self.refresh_own_ship_display)
+
     def update_gui_clock(self):
         if self.data_store["GPS_Status"].get() == "No Fix":
             now = time.gmtime()
@@ -933,71 +2260,95 @@ class App(tkinter.Tk):
         self.after(1000, self.update_gui_clock)
 
     def update_map_markers(self):
-        """[수정] 1초마다 본선 및 AIS 타겟 마커를 모두 업데이트 (AIS 실시간 업데이트 버그 수정)"""
-        
-        gui_update_list = []
-        mmsi_in_data = set()
-        os_lat, os_lon = None, None
+        """1초마다 만료 타겟을 정리하고 표시 스냅샷을 새로 만들어 본선 마커, 항적 선, CPA/TCPA 위험 목록을 갱신.
+        AIS 타겟 마커는 여기서 그리지 않고, 스냅샷을 DeadReckoner에 넘기기만 한다.
+        실제 그리기는 animate_targets가 dr_frame_hz 주기로 AisMarkerLayer(화면 밖 제외, 낮은 줌 클러스터링)를 통해 수행"""
         
         try:
-            with self.data_lock:
-                os_lat = self.data_store["_raw_lat"]
-                os_lon = self.data_store["_raw_lon"]
-                
-                mmsi_to_delete_from_store = []
-                for mmsi, data in self.data_store["AIS_Targets"].items():
-                    is_lost = (time.time() - data.get("timestamp", 0)) > 300 
-                    is_stopped_and_old = data.get("is_stopped", False) and (time.time() - data.get("timestamp", 0)) > 900
-                    
-                    if is_lost or is_stopped_and_old:
-                        mmsi_to_delete_from_store.append(mmsi)
-                    elif "lat" in data and "lon" in data:
-                        gui_update_list.append((mmsi, data.copy()))
-                        mmsi_in_data.add(mmsi)
-                
-                for mmsi in mmsi_to_delete_from_store:
-                    if mmsi in self.data_store["AIS_Targets"]:
-                        del self.data_store["AIS_Targets"][mmsi]
+            # 만료 타겟 정리 후 새 스냅샷으로 교체 (저장소 잠금은 복사하는 동안만 잡힘)
+            self.ais_targets.remove_expired(time.time())
+            self.snapshot = snapshot = DisplaySnapshot.build(self.own_ship, self.ais_targets)
+            os_lat = snapshot.own_ship["lat"]
+            os_lon = snapshot.own_ship["lon"]
             
-            # --- 락(Lock) 없이 GUI 객체 업데이트 수행 ---
+            # --- 스냅샷으로 GUI 객체 업데이트 수행 ---
             
             if os_lat != 35.10 or os_lon != 129.04:
                 self.ship_marker.set_position(os_lat, os_lon)
 
-            for mmsi, data in gui_update_list:
-                marker_text = data.get("ship_name", str(mmsi))
-                
-                if mmsi not in self.ais_markers:
-                    print(f"[지도] 새 AIS 타겟 {mmsi} 발견. 지도에 추가.")
-                    self.ais_markers[mmsi] = self.map_widget.set_marker(
-                        data["lat"], data["lon"], 
-                        text=marker_text,
-                        marker_color_circle="green",
-                        marker_color_outside="green"
-                    )
-                else:
-                    self.ais_markers[mmsi].set_position(data["lat"], data["lon"])
-                    if self.ais_markers[mmsi].text != marker_text:
-                         self.ais_markers[mmsi].set_text(marker_text)
-
-            mmsi_on_map = set(self.ais_markers.keys())
-            mmsi_to_remove_from_map = mmsi_on_map - mmsi_in_data
-            
-            for mmsi in mmsi_to_remove_from_map:
-                 print(f"[지도] AIS 타겟 {mmsi} 정리 (신호 유실).")
-                 if mmsi in self.ais_markers: 
-                    self.ais_markers[mmsi].delete()
-                    del self.ais_markers[mmsi]
+            # 타겟 마커는 animate_targets가 추정 항법 위치로 더 자주 그림
+            self.dead_reckoner.set_snapshot(snapshot.targets, time.time())
+
+            # 본선 / 팝업 타겟 항적
+            self.update_track_paths()
+
+            # 전체 타겟 CPA/TCPA -> 위험 타겟 목록
+            self.update_alarm_list(snapshot)
 
         except Exception as e:
             print(f"[지도 오류] 마커 업데이트 실패: {e}")
         
         self.after(1000, self.update_map_markers) 
 
+    def animate_targets(self):
+        """dr_frame_hz 주기로 추정 항법 위치를 계산하여 타겟 마커를 갱신.
+        화면(+여유) 안의 타겟만 그리고, 낮은 줌에서는 클러스터로 묶음"""
+        try:
+            predicted = self.dead_reckoner.predict(time.time())
+            if predicted is not None:
+                stats = self.marker_layer.update(predicted)
+                self.data_store["Markers"].set(f"{stats['drawn']} / {stats['moved']} / {stats['saved']}")
+        except Exception as e:
+            print(f"[지도 오류] 타겟 표시 실패: {e}")
+        self.after(int(1000 / self.dr_frame_hz), self.animate_targets)
+
+    def update_track_paths(self):
+        """본선과 팝업이 열린 타겟의 항적 선을 갱신 (항적이 바뀌지 않았으면 다시 그리지 않음)"""
+        tracks = {"own": self.own_ship.track_copy()}
+        popup = self.active_ais_popup
+        if popup is not None and popup.winfo_exists():
+            tracks["target"] = self.ais_targets.track(popup.mmsi)
+
+        for key, color in (("own", "blue"), ("target", "green")):
+            track = tracks.get(key)
+            path, drawn = self.track_paths.get(key, (None, None))
+            if track is None or len(track[0]) < 2:
+                if path is not None:
+                    path.delete()
+                    del self.track_paths[key]
+                continue
+            lat, lon, times = track
+            version = (len(times), float(times[-1]))
+            if version == drawn:
+                continue
+            step = -(-len(lat) // TRACK_TRAIL_MAX_POINTS) # 올림 나눗셈
+            positions = list(zip(lat[::-step][::-1].tolist(), lon[::-step][::-1].tolist())) # 최신 점은 항상 포함
+            if path is None:
+                path = self.map_widget.set_path(positions, color=color, width=2)
+            else:
+                path.set_position_list(positions)
+            self.track_paths[key] = (path, version)
+
+    def update_alarm_list(self, snapshot):
+        """CPA/TCPA 엔진을 갱신하고 위험 타겟 목록(Listbox)을 다시 채움"""
+        dangerous = self.cpa_engine.update(snapshot)
+        stats = self.cpa_engine.stats
+        self.data_store["CPA_Stats"].set(
+            f"정밀 계산 {stats['candidates']} / {stats['targets']}척 "
+            f"(선별 제외 {stats['pruned_ratio']:.0%}), {stats['elapsed_ms']:.1f} ms")
+        for mmsi in self.cpa_engine.new_alarms:
+            print(f"[충돌 경고] 타겟 {mmsi}: CPA/TCPA 한계 이내 진입.")
+        self.alarm_listbox.delete(0, "end")
+        for tcpa_min, cpa_nm, mmsi in dangerous:
+            static = snapshot.targets.get(mmsi).get("static", EMPTY_STATIC_DATA)
+            self.alarm_listbox.insert("end", f"{static.get('ship_name', mmsi)}  CPA {cpa_nm:.2f} NM  TCPA {tcpa_min:.1f} min")
+
     def on_closing(self):
         """프로그램 종료 시"""
         print("[메인] 프로그램을 종료합니다...")
         self.stop_all_servers()
+        if self.recorder is not None:
+            self.recorder.stop()
         self.destroy()
 
 # --- 5. 메인 프로그램 실행 ---
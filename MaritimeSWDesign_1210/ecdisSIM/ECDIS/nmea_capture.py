@@ -0,0 +1,337 @@
+# nmea_capture.py
+# ECDIS 수신 문장 녹화 (순환 캡처 파일 + 희소 시간 색인) 및 읽기
+#
+# 캡처 파일 (*.nmea)
+#   1행: #ECDISCAP 2 wall=<time.time()> mono=<time.monotonic()>   (파일을 연 시점, 두 시계 대응용)
+#   이후: <수신 monotonic 시각> <포트 이름> <수신한 문장 (CRLF 제외, '%' -> %25, LF -> %0A)>
+#   (버전 1 파일은 이스케이프 없음)
+# 색인 파일 (*.nmea.idx)
+#   <monotonic 시각> <캡처 파일 안 바이트 위치>   (CAPTURE_INDEX_INTERVAL_SEC / _BYTES마다 1행)
+#
+# 읽을 때는 헤더의 wall/mono 쌍으로 monotonic 시각을 UNIX 시각으로 바꾸므로,
+# 재부팅/다른 세션의 파일이 한 디렉터리에 섞여 있어도 같은 시간 축으로 정렬/탐색된다.
+
+import os
+import mmap
+import time
+import queue
+import bisect
+import threading
+
+CAPTURE_MAGIC = b"#ECDISCAP"
+CAPTURE_VERSION = 2
+CAPTURE_SUFFIX = ".nmea"
+INDEX_SUFFIX = ".idx"
+CAPTURE_ROTATE_BYTES = 256 * 1024 * 1024 # 파일 1개 최대 크기 (넘으면 다음 파일로)
+CAPTURE_INDEX_INTERVAL_SEC = 1.0         # 색인 항목 간격 (시간 기준)
+CAPTURE_INDEX_INTERVAL_BYTES = 1 << 20   # 색인 항목 간격 (바이트 기준, 트래픽이 많을 때)
+CAPTURE_QUEUE_MAX = 10000                # 쓰기 대기 묶음 수 상한 (넘으면 버림 -> 수신 루프는 막히지 않음)
+CAPTURE_FLUSH_SEC = 0.5                  # 디스크 flush 주기
+CAPTURE_MAX_FILES = 64                   # 디렉터리에 남길 최대 캡처 파일 수 (넘으면 오래된 것부터 삭제)
+CAPTURE_MAX_TOTAL_BYTES = 4 * 1024 ** 3  # 디렉터리 캡처 파일 총 크기 상한 (새 파일 1개 분량 포함)
+
+# --- 1. 녹화 ---
+class CaptureWriter(threading.Thread):
+    """수신 문장 녹화 스레드.
+    수신 스레드는 record()로 문장 목록을 큐에 넣기만 하고, 파일 쓰기/색인/순환은 이 스레드가 묶어서 처리한다."""
+    def __init__(self, directory, prefix="ecdis", rotate_bytes=CAPTURE_ROTATE_BYTES,
+                 index_interval_sec=CAPTURE_INDEX_INTERVAL_SEC, index_interval_bytes=CAPTURE_INDEX_INTERVAL_BYTES,
+                 max_files=CAPTURE_MAX_FILES, max_total_bytes=CAPTURE_MAX_TOTAL_BYTES):
+        super().__init__(daemon=True)
+        self.directory = directory
+        self.prefix = prefix
+        self.rotate_bytes = rotate_bytes
+        self.max_files = max_files
+        self.max_total_bytes = max_total_bytes
+        self.index_interval_sec = index_interval_sec
+        self.index_interval_bytes = index_interval_bytes
+        self.queue = queue.Queue(CAPTURE_QUEUE_MAX)
+        self.running = True
+
+        self.file = None
+        self.index_file = None
+        self.offset = 0          # 현재 파일에 쓴 바이트 수
+        self.file_seq = 0
+        self.last_index = None   # 마지막 색인 항목의 (시각, 바이트 위치)
+        self.paths = []          # 만든 캡처 파일 목록
+        self.written = 0         # 기록한 문장 수
+        self.dropped = 0         # 큐가 가득 차서 버린 문장 수
+        self.deleted = 0         # 보관 한도를 넘어 삭제한 캡처 파일 수
+
+    def record(self, port_name, sentences, t=None):
+        """수신 스레드에서 호출. 문장(bytes) 목록을 수신 시각과 함께 큐에 넣는다 (막히지 않음)"""
+        try:
+            self.queue.put_nowait((time.monotonic() if t is None else t, port_name, sentences))
+        except queue.Full:
+            self.dropped += len(sentences)
+
+    def stop(self):
+        """남은 큐를 모두 기록하고 파일을 닫은 뒤 종료"""
+        self.running = False
+        self.queue.put(None)
+        self.join(timeout=5.0)
+
+    def stats(self):
+        return {"written": self.written, "dropped": self.dropped, "files": len(self.paths),
+                "deleted": self.deleted, "queued": self.queue.qsize()}
+
+    def _open_next_file(self):
+        self._close_file()
+        os.makedirs(self.directory, exist_ok=True)
+        self._enforce_retention()
+        self.file_seq += 1
+        name = f"{self.prefix}_{time.strftime('%Y%m%d_%H%M%S')}_{self.file_seq:04d}{CAPTURE_SUFFIX}"
+        path = os.path.join(self.directory, name)
+        self.file = open(path, "wb", buffering=1 << 20)
+        self.index_file = open(path + INDEX_SUFFIX, "wb")
+        header = b"%s %d wall=%.6f mono=%.6f\n" % (CAPTURE_MAGIC, CAPTURE_VERSION, time.time(), time.monotonic())
+        self.file.write(header)
+        self.offset = len(header)
+        self.last_index = None
+        self.paths.append(path)
+        print(f"[녹화] 캡처 파일: {path}")
+
+    def _enforce_retention(self):
+        """새 파일(최대 rotate_bytes)을 열기 전에, 디렉터리의 캡처 파일이 max_files / max_total_bytes 안에
+        들어오도록 오래된 파일(수정 시각 순)부터 색인과 함께 삭제"""
+        files = []
+        for path in list_capture_files(self.directory):
+            try:
+                files.append((os.path.getmtime(path), os.path.getsize(path), path))
+            except OSError:
+                continue
+        files.sort()
+        total = sum(size for _, size, _ in files) + self.rotate_bytes
+        while files and (len(files) + 1 > self.max_files or total > self.max_total_bytes):
+            _, size, path = files.pop(0)
+            for victim in (path, path + INDEX_SUFFIX):
+                try:
+                    os.remove(victim)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    print(f"[녹화] 오래된 캡처 삭제 실패: {victim} ({e})")
+            total -= size
+            self.deleted += 1
+            print(f"[녹화] 보관 한도 초과 -> 삭제: {path}")
+
+    def _close_file(self):
+        for f in (self.file, self.index_file):
+            if f:
+                f.close()
+        self.file = self.index_file = None
+
+    def _write_item(self, t, port_name, sentences):
+        if self.file is None or self.offset >= self.rotate_bytes:
+            self._open_next_file()
+        last = self.last_index
+        if last is None or t - last[0] >= self.index_interval_sec or self.offset - last[1] >= self.index_interval_bytes:
+            self.index_file.write(b"%.6f %d\n" % (t, self.offset))
+            self.last_index = (t, self.offset)
+        prefix = b"%.6f %s " % (t, port_name.encode("ascii"))
+        sentences = [sentence for sentence in sentences if sentence]
+        chunk = b"".join(prefix + sentence + b"\n" for sentence in sentences)
+        if chunk.count(b"\n") != len(sentences) or b"%" in chunk:
+            # 문장 안에 LF(또는 이스케이프 문자 '%')가 있으면 행이 깨지지 않도록 이스케이프 (드문 경우만)
+            chunk = b"".join(prefix + escape_sentence(sentence) + b"\n" for sentence in sentences)
+        self.file.write(chunk)
+        self.offset += len(chunk)
+        self.written += len(sentences)
+
+    def _flush(self):
+        if self.file:
+            self.file.flush()
+            self.index_file.flush()
+
+    def run(self):
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self.queue.get(timeout=CAPTURE_FLUSH_SEC)
+            except queue.Empty:
+                item = ()
+            # 쌓여 있는 묶음을 한 번에 기록
+            done = item is None
+            while item is not None:
+                if item:
+                    self._write_item(*item)
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    done = True
+            now = time.monotonic()
+            if done or now - last_flush >= CAPTURE_FLUSH_SEC:
+                self._flush()
+                last_flush = now
+            if done:
+                break
+        self._close_file()
+        print(f"[녹화] 종료: {self.stats()}")
+# --- 1. 녹화 종료 ---
+
+
+def escape_sentence(sentence):
+    return sentence.replace(b"%", b"%25").replace(b"\n", b"%0A")
+
+def unescape_sentence(sentence):
+    # 인코딩 결과의 '%'는 모두 이스케이프의 시작이므로 %0A를 먼저 풀어도 안전
+    return sentence.replace(b"%0A", b"\n").replace(b"%25", b"%")
+
+
+# --- 2. 읽기 ---
+def iter_file_lines(path, offset=0, use_mmap=False):
+    """파일의 offset부터 줄(bytes, 끝의 b"\n" 포함)을 차례로 생성.
+    줄 단위 버퍼 읽기 또는 mmap 중 선택하며, 어느 쪽이든 파일 크기와 무관하게 메모리가 일정하다."""
+    with open(path, "rb") as f:
+        if not use_mmap:
+            f.seek(offset)
+            yield from f
+            return
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            size = len(m)
+            while offset < size:
+                end = m.find(b"\n", offset)
+                end = size if end < 0 else end + 1
+                yield m[offset:end]
+                offset = end
+
+def is_capture(path):
+    """ECDIS 캡처(디렉터리 또는 CAPTURE_MAGIC으로 시작하는 파일)인지 여부"""
+    if isinstance(path, (list, tuple)) or os.path.isdir(path):
+        return True
+    with open(path, "rb") as f:
+        return f.read(len(CAPTURE_MAGIC) + 1) == CAPTURE_MAGIC + b" "
+
+def parse_time_field(line):
+    """레코드 행의 첫 필드(시각). 형식이 깨진 행이면 None"""
+    t_field, _, _ = line.partition(b" ")
+    try:
+        return float(t_field)
+    except ValueError:
+        return None
+
+def list_capture_files(path):
+    """캡처 파일 1개, 디렉터리(안의 *.nmea), 또는 경로 목록 -> 이름순 캡처 파일 목록"""
+    if isinstance(path, (list, tuple)):
+        return sorted(path)
+    if os.path.isdir(path):
+        return sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith(CAPTURE_SUFFIX))
+    return [path]
+
+class CaptureFile:
+    """캡처 파일 1개와 그 희소 색인. 색인 파일이 없으면 한 번 훑어서 메모리에 만든다.
+    색인 시각과 first_time은 헤더의 wall/mono 쌍으로 바꾼 UNIX 시각이다."""
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            header = f.readline()
+            fields = header.split()
+            if len(fields) < 2 or fields[0] != CAPTURE_MAGIC or not fields[1].isdigit():
+                raise ValueError(f"캡처 파일 형식이 아님: {path}")
+            self.version = int(fields[1])
+            self.data_offset = f.tell()
+            self.wall_start = self.mono_start = None
+            for field in fields[2:]:
+                key, _, value = field.partition(b"=")
+                if key == b"wall":
+                    self.wall_start = float(value)
+                elif key == b"mono":
+                    self.mono_start = float(value)
+        # monotonic -> UNIX 시각 보정값 (부팅마다 monotonic 기준점이 다름)
+        if self.wall_start is not None and self.mono_start is not None:
+            self.clock_offset = self.wall_start - self.mono_start
+        else:
+            self.clock_offset = 0.0
+        self.index_times, self.index_offsets = self._load_index()
+
+    def _load_index(self):
+        times, offsets = [], []
+        try:
+            with open(self.path + INDEX_SUFFIX, "rb") as f:
+                for line in f:
+                    t, _, offset = line.partition(b" ")
+                    if offset.endswith(b"\n"): # 녹화 중 잘린 마지막 행은 무시
+                        times.append(float(t) + self.clock_offset)
+                        offsets.append(int(offset))
+        except FileNotFoundError:
+            last_t = None
+            with open(self.path, "rb") as f:
+                f.seek(self.data_offset)
+                offset = self.data_offset
+                for line in f:
+                    t = parse_time_field(line)
+                    if t is None:
+                        offset += len(line)
+                        continue
+                    t += self.clock_offset
+                    if last_t is None or t - last_t >= CAPTURE_INDEX_INTERVAL_SEC:
+                        times.append(t)
+                        offsets.append(offset)
+                        last_t = t
+                    offset += len(line)
+        return times, offsets
+
+    @property
+    def first_time(self):
+        return self.index_times[0] if self.index_times else None
+
+    def seek_offset(self, t):
+        """시각 t 이전의 마지막 색인 위치 (여기서부터 읽으면 t 이후 레코드를 모두 만남)"""
+        i = bisect.bisect_right(self.index_times, t) - 1
+        return self.index_offsets[i] if i >= 0 else self.data_offset
+
+class CaptureReader:
+    """순환된 캡처 파일 묶음을 하나의 시간순 레코드 흐름으로 읽는다 (시각은 UNIX 시각).
+    파일은 이름이 아니라 첫 레코드 시각 순으로 이어 읽고 (세션끼리 시간이 겹치지 않는다고 가정),
+    start 시각은 희소 색인으로 바로 찾아간다. 파일은 줄 단위로 읽으므로 크기와 무관하게 메모리가 일정하다.
+    형식이 깨진 행은 건너뛰고 skipped에 센다."""
+    def __init__(self, path):
+        self.files = []
+        for p in list_capture_files(path):
+            try:
+                capture = CaptureFile(p)
+            except (OSError, ValueError) as e:
+                print(f"[캡처] 읽기 제외: {e}")
+                continue
+            if capture.first_time is not None:
+                self.files.append(capture)
+        self.files.sort(key=lambda capture: capture.first_time)
+        self.skipped = 0
+
+    @property
+    def start_time(self):
+        return self.files[0].first_time if self.files else None
+
+    def records(self, start=None, end=None, use_mmap=False):
+        """(수신 UNIX 시각, 포트 이름, 문장 bytes)를 start <= 시각 < end 범위에서 차례로 생성"""
+        files = self.files
+        first = 0
+        if start is not None:
+            first = max(bisect.bisect_right([f.first_time for f in files], start) - 1, 0)
+        for capture in files[first:]:
+            if end is not None and capture.first_time >= end:
+                return
+            offset = capture.seek_offset(start) if start is not None else capture.data_offset
+            for line in iter_file_lines(capture.path, offset, use_mmap):
+                if not line.endswith(b"\n"):
+                    break # 녹화 중인 파일의 마지막 미완성 행
+                fields = line[:-1].split(b" ", 2)
+                try:
+                    t = float(fields[0]) + capture.clock_offset
+                    port = fields[1].decode("ascii")
+                    sentence = fields[2]
+                except (IndexError, ValueError):
+                    self.skipped += 1
+                    continue
+                if start is not None and t < start:
+                    continue
+                if end is not None and t >= end:
+                    return
+                if capture.version >= 2 and b"%" in sentence:
+                    sentence = unescape_sentence(sentence)
+                yield t, port, sentence
+# --- 2. 읽기 종료 ---
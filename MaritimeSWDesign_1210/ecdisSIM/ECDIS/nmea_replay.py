@@ -0,0 +1,196 @@
+# nmea_replay.py
+# 녹화한 ECDIS 캡처(nmea_capture) 또는 일반 NMEA 로그를 ECDIS 수신 포트(TCP/UDP)로 다시 보냅니다.
+# 실행: python nmea_replay.py <캡처 파일/디렉터리 또는 NMEA 로그> [--port 10110] [--udp]
+#                             [--speed 4 | --flat-out] [--route T1=10110 --route T2=10120] [--mmap]
+#
+# 시각 정보
+#   ECDIS 캡처: 각 행의 수신 시각 (포트 이름은 --route로 목적지 포트를 고름)
+#   일반 로그: TAG 블록의 c: (UNIX 시각, 초 또는 밀리초). 시각이 없는 행은 직전 시각으로 보내고,
+#              로그 전체에 시각이 없으면 --rate (문장/s) 또는 flat-out으로 보낸다.
+#
+# flat-out + TCP에서는 마지막에 송신 측을 닫고 수신 측(ClientHandler)이 연결을 닫을 때까지 기다리므로,
+# 출력되는 처리량은 ECDIS가 문장을 모두 받아 파싱한 시점까지의 수신 처리량이다.
+
+import re
+import sys
+import time
+import socket
+import argparse
+
+from nmea_capture import CaptureReader, iter_file_lines, is_capture
+
+REPLAY_TCP_BATCH_BYTES = 64 * 1024 # TCP: 보낼 시각이 된 문장을 이만큼 모아서 sendall
+REPLAY_UDP_MAX_DATAGRAM = 1400     # UDP: 데이터그램 1개에 이어 붙일 최대 크기 (MTU 이하)
+REPLAY_MIN_SLEEP_SEC = 0.001       # 이보다 짧은 대기는 건너뛰고 다음 문장과 묶어서 보냄
+REPLAY_DRAIN_TIMEOUT_SEC = 60.0    # flat-out TCP: 수신 측이 처리를 끝내고 연결을 닫기까지 기다릴 최대 시간
+DEFAULT_ROUTES = {"T1": 10110, "T2": 10120}
+
+# TAG 블록 (\s:xxx,c:1700000000*hh\!AIVDM...)의 c: 필드
+TAG_TIME_PATTERN = re.compile(rb"\\(?:[^\\]*?[,\\])?c:(\d+)")
+
+# --- 1. 입력 ---
+def log_records(path, use_mmap=False, rate=None):
+    """일반 NMEA 로그 -> (시각 또는 None, 포트 이름 None, 문장 bytes).
+    rate가 있으면 TAG 시각 대신 rate 문장/s 간격의 시각을 붙인다."""
+    count = 0
+    last_t = None
+    for line in iter_file_lines(path, use_mmap=use_mmap):
+        sentence = line.rstrip(b"\r\n")
+        if not sentence:
+            continue
+        if rate:
+            t = count / rate
+        else:
+            t = last_t
+            if sentence[:1] == b"\\":
+                match = TAG_TIME_PATTERN.match(sentence)
+                if match:
+                    value = int(match.group(1))
+                    t = last_t = value / 1000.0 if value > 10 ** 11 else float(value)
+        count += 1
+        yield t, None, sentence
+
+def open_records(path, use_mmap=False, start=None, rate=None):
+    """경로 형식에 맞는 레코드 생성기. start는 캡처 시작 시각부터의 초 (ECDIS 캡처만)"""
+    if is_capture(path):
+        reader = CaptureReader(path)
+        if reader.start_time is None:
+            return iter(())
+        return reader.records(start=reader.start_time + start if start else None, use_mmap=use_mmap)
+    return log_records(path, use_mmap=use_mmap, rate=rate)
+# --- 1. 입력 종료 ---
+
+
+# --- 2. 송신 ---
+class ReplaySender:
+    """목적지 1곳. 문장을 모아 두었다가 flush()에서 TCP sendall / UDP 데이터그램으로 보낸다."""
+    def __init__(self, host, port, udp=False):
+        self.address = (host, port)
+        self.udp = udp
+        self.buffer = bytearray()
+        self.sentences = 0
+        self.bytes = 0
+        if udp:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        else:
+            self.sock = socket.create_connection(self.address, timeout=5.0)
+            self.sock.settimeout(None)
+
+    def add(self, sentence):
+        packet = sentence + b"\r\n"
+        if self.udp and len(self.buffer) + len(packet) > REPLAY_UDP_MAX_DATAGRAM:
+            self.flush()
+        self.buffer += packet
+        self.sentences += 1
+        if not self.udp and len(self.buffer) >= REPLAY_TCP_BATCH_BYTES:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        if self.udp:
+            self.sock.sendto(self.buffer, self.address)
+        else:
+            self.sock.sendall(self.buffer)
+        self.bytes += len(self.buffer)
+        self.buffer.clear()
+
+    def close(self, drain=False):
+        """남은 문장을 보내고 닫는다. drain이면 (TCP) 수신 측이 연결을 닫을 때까지 기다린다."""
+        self.flush()
+        if drain and not self.udp:
+            self.sock.shutdown(socket.SHUT_WR)
+            self.sock.settimeout(REPLAY_DRAIN_TIMEOUT_SEC)
+            try:
+                while self.sock.recv(4096):
+                    pass
+            except (socket.timeout, ConnectionResetError):
+                pass
+        self.sock.close()
+
+def replay(records, senders, speed=1.0, flat_out=False):
+    """records의 (시각, 포트 이름, 문장)을 senders {포트 이름: ReplaySender} (None 키는 기본 목적지)로 보낸다.
+    원래 수신 간격을 speed배로 줄여 보내거나, flat_out이면 쉬지 않고 보낸다. 결과 통계 dict 반환"""
+    default = senders.get(None)
+    active = list({id(s): s for s in senders.values()}.values())
+    skipped = 0
+    t0 = None
+    clock = time.perf_counter
+    wall_start = clock()
+    for t, port_name, sentence in records:
+        sender = senders.get(port_name, default)
+        if sender is None:
+            skipped += 1
+            continue
+        if not flat_out and t is not None:
+            if t0 is None:
+                t0 = t
+            delay = wall_start + (t - t0) / speed - clock()
+            if delay > REPLAY_MIN_SLEEP_SEC:
+                for s in active:
+                    s.flush()
+                time.sleep(delay)
+        sender.add(sentence)
+    for s in active:
+        s.close(drain=flat_out)
+    elapsed = clock() - wall_start
+    sentences = sum(s.sentences for s in active)
+    return {"sentences": sentences, "bytes": sum(s.bytes for s in active), "skipped": skipped,
+            "elapsed_sec": elapsed, "rate": sentences / elapsed if elapsed > 0 else 0.0}
+# --- 2. 송신 종료 ---
+
+
+def parse_route(text):
+    name, _, port = text.partition("=")
+    if not name or not port.isdigit():
+        raise argparse.ArgumentTypeError(f"--route 형식은 이름=포트 (예: T1=10110): {text}")
+    return name, int(port)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ECDIS 캡처 / NMEA 로그 재생")
+    parser.add_argument("path", help="ECDIS 캡처 파일/디렉터리 또는 일반 NMEA 로그")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="모든 문장을 보낼 포트 (지정하면 --route 무시)")
+    parser.add_argument("--route", type=parse_route, action="append", default=[],
+                        help="캡처의 포트 이름별 목적지 포트 (기본 T1=10110, T2=10120)")
+    parser.add_argument("--udp", action="store_true", help="UDP 데이터그램으로 전송")
+    parser.add_argument("--speed", type=float, default=1.0, help="재생 배속 (기본 1 = 실시간)")
+    parser.add_argument("--flat-out", action="store_true", help="시각 무시, 최대 속도로 전송 (수신 처리량 측정)")
+    parser.add_argument("--start", type=float, help="캡처 시작부터 건너뛸 초 (ECDIS 캡처만)")
+    parser.add_argument("--rate", type=float, help="시각 정보가 없는 로그의 전송 속도 (문장/s)")
+    parser.add_argument("--mmap", action="store_true", help="파일을 mmap으로 읽기")
+    args = parser.parse_args(argv)
+    if args.speed <= 0:
+        parser.error("--speed는 0보다 커야 합니다.")
+
+    if args.port:
+        routes = {None: args.port}
+    else:
+        routes = dict(args.route) or dict(DEFAULT_ROUTES)
+        if not is_capture(args.path):
+            routes = {None: next(iter(routes.values()))}
+    # 같은 포트로 가는 이름은 연결 1개를 함께 사용
+    try:
+        by_port = {port: ReplaySender(args.host, port, args.udp) for port in set(routes.values())}
+    except OSError as e:
+        print(f"[재생] ECDIS 연결 실패 ({args.host}): {e}")
+        return 1
+    senders = {name: by_port[port] for name, port in routes.items()}
+
+    mode = "flat-out" if args.flat_out else f"{args.speed:g}배속"
+    print(f"[재생] {args.path} -> {args.host} {sorted(by_port)} ({'UDP' if args.udp else 'TCP'}, {mode})")
+    records = open_records(args.path, use_mmap=args.mmap, start=args.start, rate=args.rate)
+    try:
+        stats = replay(records, senders, speed=args.speed, flat_out=args.flat_out)
+    except KeyboardInterrupt:
+        print("[재생] 중단")
+        return 1
+    except OSError as e:
+        print(f"[재생] 전송 오류: {e}")
+        return 1
+    print(f"[재생] {stats['sentences']}문장, {stats['bytes'] / 1e6:.1f} MB, {stats['elapsed_sec']:.2f} s, "
+          f"{stats['rate']:.0f} 문장/s (목적지 없는 포트 건너뜀: {stats['skipped']})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
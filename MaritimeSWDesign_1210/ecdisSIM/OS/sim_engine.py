@@ -34,6 +34,7 @@ class NmeaSimulator:
             self.target_heading_deg = self.current_heading_deg
         self.current_pos = waypoints[0]
         self.pos_lock = threading.Lock()
+        self.sentence_builder = NmeaSentenceBuilder() # 전송 스레드 전용 문장 빌더
 
     def _connect_tcp(self):
         try:
@@ -47,13 +48,13 @@ class NmeaSimulator:
             print(f"[본선] TCP 연결 실패: {e}")
             return False
 
-    def _send_nmea(self, sentence_body):
+    def _send_nmea(self, prefix, body=b"", suffix=b""):
+        """고정 머리말/꼬리말 + 가변 본문(bytes)으로 문장을 조립하여 전송"""
         if not self.sock:
             return False
-        checksum = calculate_checksum(sentence_body)
-        final_sentence = f"{sentence_body}*{checksum}\r\n"
+        packet = self.sentence_builder.frame(prefix, body, suffix)
         try:
-            self.sock.sendall(final_sentence.encode('utf-8'))
+            self.sock.sendall(packet)
             return True
         except Exception as e:
             if self.running or self.is_holding:
@@ -89,18 +90,13 @@ class NmeaSimulator:
         lon_str = format_lon_nmea(self.current_pos[1])
         lat_dir = 'N' if self.current_pos[0] >= 0 else 'S'
         lon_dir = 'E' if self.current_pos[1] >= 0 else 'W'
-        rmc_body = f"$GPRMC,{time_str},A,{lat_str},{lat_dir},{lon_str},{lon_dir},0.0,{self.current_heading_deg:.1f},{date_str},,"
-        if not self._send_nmea(rmc_body): return False
-        hdt_body = f"$HEHDT,{self.current_heading_deg:.1f},T"
-        if not self._send_nmea(hdt_body): return False
-        rot_body = f"$GPROT,0.0,A" 
-        if not self._send_nmea(rot_body): return False
-        dpt_body = "$SDDPT,21.5,,"
-        if not self._send_nmea(dpt_body): return False
-        dbt_body = "$SDDBT,,f,20.0,M,,F"
-        if not self._send_nmea(dbt_body): return False
-        mwv_body = "$WIMWV,030.0,R,8.5,N,A"
-        if not self._send_nmea(mwv_body): return False
+        rmc_fields = f"{time_str},A,{lat_str},{lat_dir},{lon_str},{lon_dir},0.0,{self.current_heading_deg:.1f},{date_str}"
+        if not self._send_nmea(b"$GPRMC,", rmc_fields.encode('ascii'), b",,"): return False
+        if not self._send_nmea(b"$HEHDT,", b"%.1f" % self.current_heading_deg, b",T"): return False
+        if not self._send_nmea(b"$GPROT,0.0,A"): return False
+        if not self._send_nmea(b"$SDDPT,21.5,,"): return False
+        if not self._send_nmea(b"$SDDBT,,f,20.0,M,,F"): return False
+        if not self._send_nmea(b"$WIMWV,030.0,R,8.5,N,A"): return False
         return True
 
     def run_simulation(self):
@@ -199,19 +195,14 @@ class NmeaSimulator:
             lon_str = format_lon_nmea(self.current_pos[1])
             lat_dir = 'N' if self.current_pos[0] >= 0 else 'S'
             lon_dir = 'E' if self.current_pos[1] >= 0 else 'W'
-            rmc_body = f"$GPRMC,{time_str},A,{lat_str},{lat_dir},{lon_str},{lon_dir},{self.current_speed_kn:.1f},{self.current_heading_deg:.1f},{date_str},,"
-            if not self._send_nmea(rmc_body): break
-            hdt_body = f"$HEHDT,{self.current_heading_deg:.1f},T"
-            if not self._send_nmea(hdt_body): break
+            rmc_fields = f"{time_str},A,{lat_str},{lat_dir},{lon_str},{lon_dir},{self.current_speed_kn:.1f},{self.current_heading_deg:.1f},{date_str}"
+            if not self._send_nmea(b"$GPRMC,", rmc_fields.encode('ascii'), b",,"): break
+            if not self._send_nmea(b"$HEHDT,", b"%.1f" % self.current_heading_deg, b",T"): break
             rot_deg_per_min = current_rot_deg_per_sec * 60.0 
-            rot_body = f"$GPROT,{rot_deg_per_min:.1f},A"
-            if not self._send_nmea(rot_body): break
-            dpt_body = "$SDDPT,21.5,,"
-            if not self._send_nmea(dpt_body): break
-            dbt_body = "$SDDBT,,f,20.0,M,,F"
-            if not self._send_nmea(dbt_body): break
-            mwv_body = "$WIMWV,030.0,R,8.5,N,A"
-            if not self._send_nmea(mwv_body): break
+            if not self._send_nmea(b"$GPROT,", b"%.1f" % rot_deg_per_min, b",A"): break
+            if not self._send_nmea(b"$SDDPT,21.5,,"): break
+            if not self._send_nmea(b"$SDDBT,,f,20.0,M,,F"): break
+            if not self._send_nmea(b"$WIMWV,030.0,R,8.5,N,A"): break
             if time.gmtime().tm_sec % 6 == 0:
                 print(f"[본선] 전송 (현재 속도: {self.current_speed_kn:.1f}Kn, 목표 속도: {self.target_speed_kn:.1f}Kn)")
             time.sleep(1) 
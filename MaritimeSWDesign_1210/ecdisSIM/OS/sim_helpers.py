@@ -1,19 +1,13 @@
+import os
+import sys
 import math
 import time
-import functools
 import datetime
-import operator 
 
-# --- 1. NMEA 유틸리티 (체크섬) ---
-def calculate_checksum(sentence):
-    """NMEA 0183 문장의 체크섬을 검사합니다."""
-    if '$' in sentence or '!' in sentence:
-        sentence = sentence.split('$', 1)[-1].split('!', 1)[-1]
-    if '*' in sentence:
-        sentence = sentence.split('*', 1)[0]
-    nmeadata = bytes(sentence, 'utf-8')
-    checksum = functools.reduce(operator.xor, nmeadata, 0) # 'operator' 사용
-    return f"{checksum:02X}"
+# --- 1. NMEA 유틸리티 (체크섬, 문장 빌더) ---
+# AIS 시뮬레이터(AIS/ais_helpers.py)와 같은 구현을 함께 사용
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "AIS"))
+from ais_helpers import calculate_checksum, xor_checksum, NmeaSentenceBuilder
 
 # --- 2. 좌표 계산 유틸리티 ---
 def deg_to_rad(deg):